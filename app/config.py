@@ -1,5 +1,6 @@
 import os
 from enum import Enum
+from typing import Optional
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -9,6 +10,7 @@ class LLMProvider(Enum):
     GOOGLE = "google"
     OPENAI = "openai"
     MISTRAL = "mistral"
+    FAKE = "fake"  # Offline record/replay provider for benchmarks and load tests
 
 class ModelType(Enum):
     REASONING = "reasoning"
@@ -27,7 +29,108 @@ class Config:
     
     # Temperature setting
     TEMPERATURE = 0.0
+
+    # Uploads: per-file size and page limits checked while the file streams to disk
+    UPLOAD_MAX_FILE_BYTES = int(os.getenv('UPLOAD_MAX_FILE_BYTES', 50 * 1024 * 1024))
+    UPLOAD_MAX_PAGES = int(os.getenv('UPLOAD_MAX_PAGES', 1000))
+
+    # Extracted PDF text cache
+    PDF_TEXT_CACHE_DIR = os.getenv('PDF_TEXT_CACHE_DIR', os.path.join('.cache', 'pdf_text'))
+    PDF_TEXT_CACHE_MAX_BYTES = int(os.getenv('PDF_TEXT_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+    
+    # Local heuristic pre-classification; the LLM is only called below this confidence
+    HEURISTIC_CLASSIFIER_PAGES = int(os.getenv('HEURISTIC_CLASSIFIER_PAGES', 3))
+    HEURISTIC_CLASSIFIER_MIN_CONFIDENCE = float(os.getenv('HEURISTIC_CLASSIFIER_MIN_CONFIDENCE', 0.8))
+    
+    # Persistent document classification cache
+    CLASSIFICATION_CACHE_PATH = os.getenv('CLASSIFICATION_CACHE_PATH', os.path.join('.cache', 'classifications.db'))
+    CLASSIFICATION_CACHE_TTL_SECONDS = int(os.getenv('CLASSIFICATION_CACHE_TTL_SECONDS', 30 * 24 * 60 * 60))
+    
+    # Registry of PDFs already uploaded to Mistral, keyed by content hash
+    MISTRAL_FILE_REGISTRY_PATH = os.getenv('MISTRAL_FILE_REGISTRY_PATH', os.path.join('.cache', 'mistral_files.db'))
+    MISTRAL_FILE_TTL_SECONDS = int(os.getenv('MISTRAL_FILE_TTL_SECONDS', 24 * 60 * 60))
+    
+    # Deterministic LLM response cache for stateless requests; requests may bypass it per run
+    RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+    RESPONSE_CACHE_PATH = os.getenv('RESPONSE_CACHE_PATH', os.path.join('.cache', 'responses.db'))
+    RESPONSE_CACHE_MAX_BYTES = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 20000))
+    
+    # Append every LLM response to this JSONL file so the fake provider can replay it
+    LLM_RECORD_PATH = os.getenv('LLM_RECORD_PATH', '')
+    
+    # Fake provider: replayed or generated responses with injected latency and faults
+    FAKE_LLM_SEED = int(os.getenv('FAKE_LLM_SEED', 0))
+    FAKE_LLM_RECORDINGS_PATH = os.getenv('FAKE_LLM_RECORDINGS_PATH', '')
+    FAKE_LLM_LATENCY_DISTRIBUTION = os.getenv('FAKE_LLM_LATENCY_DISTRIBUTION', 'lognormal').lower()  # fixed, uniform or lognormal
+    FAKE_LLM_LATENCY_MEAN_SECONDS = float(os.getenv('FAKE_LLM_LATENCY_MEAN_SECONDS', 0.5))
+    FAKE_LLM_LATENCY_SIGMA = float(os.getenv('FAKE_LLM_LATENCY_SIGMA', 0.5))
+    FAKE_LLM_TOKENS_PER_SECOND = float(os.getenv('FAKE_LLM_TOKENS_PER_SECOND', 0))  # 0 returns output instantly
+    FAKE_LLM_RATE_LIMIT_PROBABILITY = float(os.getenv('FAKE_LLM_RATE_LIMIT_PROBABILITY', 0))
+    FAKE_LLM_RETRY_AFTER_SECONDS = float(os.getenv('FAKE_LLM_RETRY_AFTER_SECONDS', 1))
+    FAKE_LLM_TRUNCATION_PROBABILITY = float(os.getenv('FAKE_LLM_TRUNCATION_PROBABILITY', 0))
+    FAKE_LLM_REQUESTS_PER_MINUTE = int(os.getenv('FAKE_LLM_REQUESTS_PER_MINUTE', 600))
+    FAKE_LLM_TOKENS_PER_MINUTE = int(os.getenv('FAKE_LLM_TOKENS_PER_MINUTE', 2000000))
     
+    # Maximum concurrent in-flight requests per provider
+    PROVIDER_MAX_CONCURRENCY = {
+        LLMProvider.ANTHROPIC: int(os.getenv('ANTHROPIC_MAX_CONCURRENCY', 2)),
+        LLMProvider.GOOGLE: int(os.getenv('GOOGLE_MAX_CONCURRENCY', 4)),
+        LLMProvider.OPENAI: int(os.getenv('OPENAI_MAX_CONCURRENCY', 8)),
+        LLMProvider.MISTRAL: int(os.getenv('MISTRAL_MAX_CONCURRENCY', 4)),
+        LLMProvider.FAKE: int(os.getenv('FAKE_MAX_CONCURRENCY', 8))
+    }
+
+    # Daily balance extraction: statement periods per LLM call and concurrent calls
+    DAILY_BALANCE_CHUNK_PERIODS = int(os.getenv('DAILY_BALANCE_CHUNK_PERIODS', 2))
+    DAILY_BALANCE_MAX_CONCURRENCY = int(os.getenv('DAILY_BALANCE_MAX_CONCURRENCY', 4))
+
+    # Single-pass transaction ledger; when enabled, bank analyses are computed locally from it
+    USE_TRANSACTION_LEDGER = os.getenv('USE_TRANSACTION_LEDGER', 'true').lower() == 'true'
+    LEDGER_CHUNK_PERIODS = int(os.getenv('LEDGER_CHUNK_PERIODS', 1))
+    LEDGER_MAX_CONCURRENCY = int(os.getenv('LEDGER_MAX_CONCURRENCY', 4))
+
+    # Background underwriting jobs
+    UNDERWRITING_WORKERS = int(os.getenv('UNDERWRITING_WORKERS', 4))
+    JOB_RETENTION_SECONDS = int(os.getenv('JOB_RETENTION_SECONDS', 60 * 60))
+
+    # Status event streaming
+    STATUS_HISTORY_SIZE = int(os.getenv('STATUS_HISTORY_SIZE', 200))
+    STATUS_CHANNEL_TTL_SECONDS = int(os.getenv('STATUS_CHANNEL_TTL_SECONDS', 60 * 60))
+    STATUS_HEARTBEAT_SECONDS = float(os.getenv('STATUS_HEARTBEAT_SECONDS', 15))
+    # Stream tool responses so completed JSON array elements reach the status stream early
+    STREAM_RESPONSES = os.getenv('STREAM_RESPONSES', 'true').lower() == 'true'
+
+    # Rate limiter backend: "memory" (per process) or "sqlite" (shared by all processes on the host)
+    RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'memory').lower()
+    RATE_LIMIT_DB_PATH = os.getenv('RATE_LIMIT_DB_PATH', os.path.join('.cache', 'rate_limits.db'))
+
+    # Adaptive (AIMD) per-provider concurrency; PROVIDER_MAX_CONCURRENCY is the starting limit
+    ADAPTIVE_CONCURRENCY = os.getenv('ADAPTIVE_CONCURRENCY', 'true').lower() == 'true'
+    ADAPTIVE_CONCURRENCY_MAX = int(os.getenv('ADAPTIVE_CONCURRENCY_MAX', 16))
+    ADAPTIVE_DECREASE_FACTOR = float(os.getenv('ADAPTIVE_DECREASE_FACTOR', 0.5))
+    ADAPTIVE_DECREASE_COOLDOWN_SECONDS = float(os.getenv('ADAPTIVE_DECREASE_COOLDOWN_SECONDS', 5))
+    ADAPTIVE_LATENCY_WINDOW = int(os.getenv('ADAPTIVE_LATENCY_WINDOW', 50))
+    # Also back off when a request class's p95 latency exceeds TOLERANCE x its best p50
+    ADAPTIVE_LATENCY_CONTROL = os.getenv('ADAPTIVE_LATENCY_CONTROL', 'true').lower() == 'true'
+    ADAPTIVE_LATENCY_TOLERANCE = float(os.getenv('ADAPTIVE_LATENCY_TOLERANCE', 3.0))
+    LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', 3))
+
+    # Context window budgeting: image tokens billed per page for natively read PDFs, and
+    # the provider to route to when a request exceeds every model of the current provider
+    PDF_PAGE_IMAGE_TOKENS = int(os.getenv('PDF_PAGE_IMAGE_TOKENS', 1600))
+    CONTEXT_OVERFLOW_PROVIDER = os.getenv('CONTEXT_OVERFLOW_PROVIDER', '').lower()
+
+    # Mark attached documents and shared context as cacheable prompt prefixes (Anthropic)
+    ANTHROPIC_PROMPT_CACHING = os.getenv('ANTHROPIC_PROMPT_CACHING', 'true').lower() == 'true'
+
+    # Shared provider HTTP clients: connection pool sizes and timeouts
+    PROVIDER_HTTP_MAX_CONNECTIONS = int(os.getenv('PROVIDER_HTTP_MAX_CONNECTIONS', 32))
+    PROVIDER_HTTP_MAX_KEEPALIVE = int(os.getenv('PROVIDER_HTTP_MAX_KEEPALIVE', 16))
+    PROVIDER_HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv('PROVIDER_HTTP_KEEPALIVE_EXPIRY_SECONDS', 60))
+    PROVIDER_CONNECT_TIMEOUT_SECONDS = float(os.getenv('PROVIDER_CONNECT_TIMEOUT_SECONDS', 10))
+    PROVIDER_REQUEST_TIMEOUT_SECONDS = float(os.getenv('PROVIDER_REQUEST_TIMEOUT_SECONDS', 300))
+
     # Model configurations
     MODEL_CONFIGS = {
         LLMProvider.ANTHROPIC: {
@@ -77,6 +180,18 @@ class Config:
                 "max_tokens": 4096,
                 "context_limit": 32768
             }
+        },
+        LLMProvider.FAKE: {
+            ModelType.REASONING: {
+                "name": "fake-reasoning",
+                "max_tokens": 4096,
+                "context_limit": 200000
+            },
+            ModelType.ANALYSIS: {
+                "name": "fake-analysis",
+                "max_tokens": 4096,
+                "context_limit": 200000
+            }
         }
     }
 
@@ -84,4 +199,21 @@ class Config:
     def get_model_config(cls, provider: LLMProvider, model_type: ModelType = None):
         """Get model configuration for given provider and type"""
         model_type = model_type or cls.DEFAULT_MODEL_TYPE
-        return cls.MODEL_CONFIGS[provider][model_type] 
\ No newline at end of file
+        return cls.MODEL_CONFIGS[provider][model_type]
+
+    @classmethod
+    def get_context_overflow_provider(cls) -> Optional[LLMProvider]:
+        """Provider used for requests too large for the current provider's models, if configured"""
+        if not cls.CONTEXT_OVERFLOW_PROVIDER:
+            return None
+        return LLMProvider(cls.CONTEXT_OVERFLOW_PROVIDER)
+
+    @classmethod
+    def get_max_concurrency(cls, provider: LLMProvider = None) -> int:
+        """Get the maximum number of concurrent requests allowed for a provider"""
+        provider = provider or cls.DEFAULT_PROVIDER
+        limit = cls.PROVIDER_MAX_CONCURRENCY.get(provider, 1)
+        if cls.ADAPTIVE_CONCURRENCY:
+            # Size worker pools for the adaptive ceiling; the controller gates actual in-flight calls
+            limit = max(limit, cls.ADAPTIVE_CONCURRENCY_MAX)
+        return max(1, limit)
@@ -0,0 +1,99 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+class ClassificationCache:
+    """
+    SQLite-backed store of document classification results keyed by
+    content hash and provider. Entries expire after ttl_seconds.
+    """
+    def __init__(self, db_path: str, ttl_seconds: int):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS classifications (
+                    content_hash TEXT NOT NULL,
+                    provider TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (content_hash, provider)
+                )
+            """)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, content_hash: str, provider: str) -> Optional[Dict]:
+        """Return a cached classification, or None if missing or expired"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT result, created_at FROM classifications WHERE content_hash = ? AND provider = ?",
+                (content_hash, provider)
+            ).fetchone()
+            if row and time.time() - row[1] > self.ttl_seconds:
+                conn.execute(
+                    "DELETE FROM classifications WHERE content_hash = ? AND provider = ?",
+                    (content_hash, provider)
+                )
+                row = None
+
+        with self._lock:
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return json.loads(row[0]) if row else None
+
+    def put(self, content_hash: str, provider: str, result: Dict) -> None:
+        """Store a classification result"""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO classifications (content_hash, provider, result, created_at) VALUES (?, ?, ?, ?)",
+                (content_hash, provider, json.dumps(result), time.time())
+            )
+
+    def purge_expired(self) -> int:
+        """Delete expired entries, returning the number removed"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "DELETE FROM classifications WHERE created_at < ?",
+                (time.time() - self.ttl_seconds,)
+            )
+            return cursor.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters for the cache"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
+
+# Shared classification cache used by ContentService
+CLASSIFICATION_CACHE = ClassificationCache(
+    db_path=Config.CLASSIFICATION_CACHE_PATH,
+    ttl_seconds=Config.CLASSIFICATION_CACHE_TTL_SECONDS
+)
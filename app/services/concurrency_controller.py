@@ -0,0 +1,177 @@
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+import numpy as np
+from app.config import Config, LLMProvider
+
+logger = logging.getLogger(__name__)
+
+class AdaptiveConcurrencyController:
+    """
+    AIMD limit on in-flight requests to one provider.
+
+    The limit grows by one after each full round of successful requests (one success
+    per slot) and is cut multiplicatively when the provider returns 429 or, with
+    ADAPTIVE_LATENCY_CONTROL, when a request class's p95 latency drifts well above the
+    best p50 seen for that class, which signals queueing upstream. Latency is compared
+    within a class only, since short classifications and long ledger extractions are
+    not comparable. A 429 with a retry-after header also pauses new requests until it
+    has elapsed.
+    """
+    def __init__(self, name: str, initial_limit: int, min_limit: int, max_limit: int):
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self._limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self.in_flight = 0
+        self.rate_limited_count = 0
+        self._successes_since_change = 0
+        self._last_decrease = 0.0
+        self._paused_until = 0.0
+        self._latencies = deque(maxlen=Config.ADAPTIVE_LATENCY_WINDOW)
+        # Per request class: recent latencies and the lowest full-window p50 seen
+        self._class_latencies: Dict[str, deque] = {}
+        self._baseline_latency: Dict[str, float] = {}
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @contextmanager
+    def slot(self):
+        """Hold one in-flight slot for the duration of a provider call"""
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def acquire(self) -> None:
+        with self._condition:
+            while True:
+                wait = self._paused_until - time.monotonic()
+                if wait <= 0 and self.in_flight < self.limit:
+                    self.in_flight += 1
+                    return
+                self._condition.wait(wait if wait > 0 else None)
+
+    def release(self) -> None:
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self, latency: float, request_class: Optional[str] = None) -> None:
+        """
+        Record a completed request and its latency in seconds. request_class groups requests
+        of comparable size (see LLMWrapper._request_class) for the latency signal.
+        """
+        with self._condition:
+            self._latencies.append(latency)
+            if request_class is not None and Config.ADAPTIVE_LATENCY_CONTROL:
+                if self._latency_congested(request_class, latency):
+                    self._decrease(f"{request_class} p95 latency above baseline")
+                    return
+
+            self._successes_since_change += 1
+            if self._successes_since_change >= self.limit and self._limit < self.max_limit:
+                self._limit = min(self._limit + 1, self.max_limit)
+                self._successes_since_change = 0
+                logger.debug(f"{self.name}: concurrency raised to {self.limit}")
+                self._condition.notify_all()
+
+    def on_rate_limited(self, retry_after: Optional[float] = None) -> None:
+        """Record a 429 from the provider, optionally honouring its retry-after delay"""
+        with self._condition:
+            self.rate_limited_count += 1
+            if retry_after:
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            self._decrease("rate limited by provider")
+
+    def _latency_congested(self, request_class: str, latency: float) -> bool:
+        """Caller must hold self._condition"""
+        latencies = self._class_latencies.get(request_class)
+        if latencies is None:
+            latencies = self._class_latencies[request_class] = deque(maxlen=Config.ADAPTIVE_LATENCY_WINDOW)
+        latencies.append(latency)
+        if len(latencies) < latencies.maxlen:
+            return False
+        p50, p95 = np.percentile(np.fromiter(latencies, dtype=np.float64), [50, 95])
+        baseline = self._baseline_latency.get(request_class)
+        if baseline is None or p50 < baseline:
+            baseline = self._baseline_latency[request_class] = p50
+        if p95 > baseline * Config.ADAPTIVE_LATENCY_TOLERANCE:
+            # Judge the lowered limit on fresh samples
+            latencies.clear()
+            return True
+        return False
+
+    def _decrease(self, reason: str) -> None:
+        """Multiplicative decrease, at most once per cooldown. Caller must hold self._condition"""
+        now = time.monotonic()
+        if now - self._last_decrease < Config.ADAPTIVE_DECREASE_COOLDOWN_SECONDS:
+            return
+        self._limit = max(self.min_limit, self._limit * Config.ADAPTIVE_DECREASE_FACTOR)
+        self._last_decrease = now
+        self._successes_since_change = 0
+        logger.warning(f"🐢 {self.name}: concurrency lowered to {self.limit} ({reason})")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            latencies = np.fromiter(self._latencies, dtype=np.float64)
+            p50, p95 = np.percentile(latencies, [50, 95]) if len(latencies) else (None, None)
+            return {
+                "limit": self.limit,
+                "in_flight": self.in_flight,
+                "rate_limited": self.rate_limited_count,
+                "latency_p50": None if p50 is None else round(float(p50), 3),
+                "latency_p95": None if p95 is None else round(float(p95), 3)
+            }
+
+def get_status_code(error: Exception) -> Optional[int]:
+    """HTTP status of a provider SDK error, if it carries one"""
+    for attribute in ("status_code", "code"):
+        value = getattr(error, attribute, None)
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+def is_rate_limit_error(error: Exception) -> bool:
+    return get_status_code(error) == 429 or type(error).__name__ in ("RateLimitError", "ResourceExhausted")
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """Seconds to wait from the retry-after headers of a provider error, if present"""
+    response = getattr(error, "response", None) or getattr(error, "raw_response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+# Shared per-provider controllers; the configured provider concurrency is the starting point
+CONCURRENCY_CONTROLLERS: Dict[LLMProvider, AdaptiveConcurrencyController] = {
+    provider: AdaptiveConcurrencyController(
+        name=provider.value,
+        initial_limit=initial_limit,
+        min_limit=1,
+        max_limit=max(initial_limit, Config.ADAPTIVE_CONCURRENCY_MAX)
+    )
+    for provider, initial_limit in Config.PROVIDER_MAX_CONCURRENCY.items()
+}
+
+def get_concurrency_controller(provider: LLMProvider) -> Optional[AdaptiveConcurrencyController]:
+    """Get the shared adaptive concurrency controller for a provider"""
+    if not Config.ADAPTIVE_CONCURRENCY:
+        return None
+    return CONCURRENCY_CONTROLLERS.get(provider)
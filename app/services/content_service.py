@@ -1,26 +1,98 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 import logging
 import traceback
-from PyPDF2 import PdfMerger
-import uuid
+from concurrent.futures import ThreadPoolExecutor
 from app.services.llm_factory import LLMFactory
-from app.tools.analysis_tools import classify_document_type, set_llm
-from app.config import LLMProvider
+from app.services.pdf_text_cache import PDF_TEXT_CACHE
+from app.services.heuristic_classifier import classify_by_heuristics
+from app.services.classification_cache import CLASSIFICATION_CACHE
+from app.services.file_hash import compute_file_hash
+from app.services.document_set import DocumentSet
+from app.tools.analysis_tools import classify_document_type
+from app.config import Config, LLMProvider
 
 logger = logging.getLogger(__name__)
 
 class ContentService:
-    def merge_pdfs_by_type(self, file_paths: List[str], doc_type: str = None, provider: LLMProvider = None) -> Dict[str, str]:
+    def _classify_file(self, path: str, provider: LLMProvider = None, content_hash: str = None) -> Dict:
+        """Classify a single PDF locally, falling back to an isolated LLM context when ambiguous"""
+        logger.info(f"Classifying document: {path}")
+        content_hash = content_hash or compute_file_hash(path)
+        provider_key = (provider or Config.DEFAULT_PROVIDER).value
+        
+        cached = self._cached_classification(path, content_hash, provider_key)
+        if cached:
+            logger.info(f"Using cached classification for {path}: {cached['document_type']}")
+            return cached
+        
+        try:
+            pages = PDF_TEXT_CACHE.get_pages(path, content_hash)[:Config.HEURISTIC_CLASSIFIER_PAGES]
+            result = classify_by_heuristics(pages)
+            if result["confidence_score"] >= Config.HEURISTIC_CLASSIFIER_MIN_CONFIDENCE:
+                logger.info(f"Heuristically classified {path} as {result['document_type']} with {result['confidence_score']} confidence")
+                self._cache_classification(path, content_hash, provider_key, result)
+                return result
+            logger.info(f"Heuristic classification ambiguous for {path} ({result['confidence_score']}), falling back to LLM")
+        except Exception as e:
+            logger.warning(f"Heuristic classification failed for {path}: {str(e)}")
+        
+        classification_llm = LLMFactory.create_llm(provider=provider)
+        classification_llm.add_documents(DocumentSet.from_paths([path], content_hashes={path: content_hash}))
+        result = classify_document_type(llm=classification_llm)
+        
+        # Errors come back as "unknown" and should be retried on the next upload
+        if result["document_type"] in ("bank_statement", "tax_return"):
+            self._cache_classification(path, content_hash, provider_key, result)
+        return result
+
+    def _cached_classification(self, path: str, content_hash: str, provider_key: str) -> Optional[Dict]:
+        """Look up a cached classification; a cache failure only costs a fresh classification"""
+        try:
+            return CLASSIFICATION_CACHE.get(content_hash, provider_key)
+        except Exception as e:
+            logger.error(f"Classification cache lookup failed for {path}: {str(e)}")
+            return None
+
+    def _cache_classification(self, path: str, content_hash: str, provider_key: str, result: Dict) -> None:
+        """Store a classification; a cache failure must not fail the upload"""
+        try:
+            CLASSIFICATION_CACHE.put(content_hash, provider_key, result)
+        except Exception as e:
+            logger.error(f"Failed to cache classification for {path}: {str(e)}")
+
+    def classify_files(self, file_paths: List[str], provider: LLMProvider = None,
+                       content_hashes: Optional[Dict[str, str]] = None) -> List[Dict]:
         """
-        Merge PDFs by document type. If doc_type is not specified, uses AI classification.
+        Classify PDFs concurrently, bounded by the provider's concurrency limit.
+        content_hashes maps paths to hashes already computed, e.g. while streaming the upload.
+        
+        Returns:
+            Classification results in the same order as file_paths
+        """
+        content_hashes = content_hashes or {}
+        max_workers = min(len(file_paths), Config.get_max_concurrency(provider))
+        logger.info(f"Classifying {len(file_paths)} documents with {max_workers} workers")
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="classify") as executor:
+            results = list(executor.map(
+                lambda path: self._classify_file(path, provider, content_hashes.get(path)), file_paths
+            ))
+        logger.info(f"Classification cache stats: {CLASSIFICATION_CACHE.stats()}")
+        return results
+
+    def merge_pdfs_by_type(self, file_paths: List[str], doc_type: str = None, provider: LLMProvider = None,
+                           content_hashes: Optional[Dict[str, str]] = None) -> Dict[str, DocumentSet]:
+        """
+        Group PDFs by document type. If doc_type is not specified, uses AI classification.
+        No merged PDF is written: each group is a document set referencing the uploaded files.
         
         Args:
             file_paths: List of paths to PDF files
-            doc_type: Optional, specific document type to merge as
+            doc_type: Optional, specific document type to group as
             provider: Optional, LLM provider to use for classification
+            content_hashes: Optional, content hashes of file_paths computed during upload
             
         Returns:
-            Dict mapping document types to merged PDF paths
+            Dict mapping document types to document sets
         """
         logger.info(f"🔄 Processing {len(file_paths)} PDFs...")
         
@@ -30,30 +102,18 @@ class ContentService:
             
         try:
             if doc_type:
-                # If type is specified, merge into single file
-                output_path = f"merged_{doc_type}_{uuid.uuid4()}.pdf"
-                merger = PdfMerger()
-                for path in file_paths:
-                    logger.info(f"Adding file to {doc_type} merger: {path}")
-                    merger.append(path)
-                merger.write(output_path)
-                merger.close()
-                logger.info(f"Created merged {doc_type} file: {output_path}")
-                return {doc_type: output_path}
+                # If type is specified, group every file under it
+                documents = DocumentSet.from_paths(file_paths, doc_type, content_hashes)
+                logger.info(f"Created {doc_type} document set: {documents}")
+                return {doc_type: documents}
             else:
-                # If no type specified, classify and merge separately
-                classification_llm = LLMFactory.create_llm(provider=provider)
-                set_llm(classification_llm)
-                
+                # If no type specified, classify and group separately
                 bank_paths = []
                 tax_paths = []
                 
                 # Classify each document
-                for path in file_paths:
-                    logger.info(f"Classifying document: {path}")
-                    classification_llm.add_pdf(path)
-                    result = classify_document_type()
-                    
+                results = self.classify_files(file_paths, provider=provider, content_hashes=content_hashes)
+                for path, result in zip(file_paths, results):
                     if result["document_type"] == "bank_statement":
                         logger.info(f"Classified as bank statement: {path}")
                         bank_paths.append(path)
@@ -65,27 +125,13 @@ class ContentService:
                 
                 merged_files = {}
                 
-                # Merge bank statements if any found
                 if bank_paths:
-                    bank_output = f"merged_bank_{uuid.uuid4()}.pdf"
-                    merger = PdfMerger()
-                    for path in bank_paths:
-                        merger.append(path)
-                    merger.write(bank_output)
-                    merger.close()
-                    merged_files["bank_statements"] = bank_output
-                    logger.info(f"Created merged bank statements file: {bank_output}")
+                    merged_files["bank_statements"] = DocumentSet.from_paths(bank_paths, "bank_statements", content_hashes)
+                    logger.info(f"Created bank statements document set: {merged_files['bank_statements']}")
                 
-                # Merge tax returns if any found
                 if tax_paths:
-                    tax_output = f"merged_tax_{uuid.uuid4()}.pdf"
-                    merger = PdfMerger()
-                    for path in tax_paths:
-                        merger.append(path)
-                    merger.write(tax_output)
-                    merger.close()
-                    merged_files["tax_returns"] = tax_output
-                    logger.info(f"Created merged tax returns file: {tax_output}")
+                    merged_files["tax_returns"] = DocumentSet.from_paths(tax_paths, "tax_returns", content_hashes)
+                    logger.info(f"Created tax returns document set: {merged_files['tax_returns']}")
                 
                 return merged_files
                 
@@ -0,0 +1,151 @@
+import re
+import logging
+from typing import List, Dict, Any, Optional
+import numpy as np
+from app.services.transaction_ledger import TransactionLedger, BALANCE_TOLERANCE, parse_amount, parse_date
+
+logger = logging.getLogger(__name__)
+
+CLOSING_BALANCE_PATTERN = re.compile(r"\b(?:ending|closing)\s+balance\b", re.IGNORECASE)
+
+def build_daily_balance_series(
+    dates: np.ndarray,
+    balances: np.ndarray,
+    is_direct: np.ndarray,
+    start_date: str = None,
+    end_date: str = None,
+    opening_balance: Optional[float] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Expand sparse end-of-day balances into a dense calendar-day series.
+
+    Days without an observation carry the previous day's balance forward and are
+    marked as calculated. Days before the first observation use opening_balance
+    when given, otherwise they are dropped.
+
+    Args:
+        dates: datetime64[D] dates of observed end-of-day balances (sorted, unique)
+        balances: Balance at the end of each observed date
+        is_direct: Whether each observed balance is stated on the statement
+        start_date: Optional first day of the series (YYYY-MM-DD)
+        end_date: Optional last day of the series (YYYY-MM-DD)
+        opening_balance: Balance before the first observation
+
+    Returns:
+        Dict of dense arrays: dates, balances, is_direct, is_business_day
+    """
+    dates = np.asarray(dates, dtype="datetime64[D]")
+    if len(dates) == 0:
+        empty = np.zeros(0)
+        return {
+            "dates": np.zeros(0, dtype="datetime64[D]"),
+            "balances": empty,
+            "is_direct": empty.astype(bool),
+            "is_business_day": empty.astype(bool)
+        }
+
+    start = np.datetime64(start_date, "D") if start_date else dates[0]
+    end = np.datetime64(end_date, "D") if end_date else dates[-1]
+    start, end = min(start, dates[0]), max(end, dates[-1])
+    if opening_balance is None:
+        start = dates[0]
+
+    dense_dates = np.arange(start, end + 1, dtype="datetime64[D]")
+    positions = (dates - start).astype(np.int64)
+
+    dense_balances = np.full(len(dense_dates), np.nan)
+    dense_direct = np.zeros(len(dense_dates), dtype=bool)
+    dense_balances[positions] = balances
+    dense_direct[positions] = is_direct
+
+    # Forward-fill: index of the most recent observation at or before each day
+    observed = np.where(np.isnan(dense_balances), -1, np.arange(len(dense_dates)))
+    last_observed = np.maximum.accumulate(observed)
+    fallback = np.nan if opening_balance is None else opening_balance
+    filled = np.where(last_observed >= 0, dense_balances[np.maximum(last_observed, 0)], fallback)
+
+    return {
+        "dates": dense_dates,
+        "balances": filled,
+        "is_direct": dense_direct,
+        "is_business_day": np.is_busday(dense_dates)
+    }
+
+def series_to_daily_balances(series: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+    """Convert a dense series to the extract_daily_balances JSON entries"""
+    return [
+        {
+            "date": str(series["dates"][i]),
+            "balance": round(float(series["balances"][i]), 2),
+            "is_business_day": bool(series["is_business_day"][i]),
+            "balance_type": "direct" if series["is_direct"][i] else "calculated"
+        }
+        for i in range(len(series["dates"]))
+    ]
+
+def reconcile_stated_closing_balances(ledger: TransactionLedger) -> List[Dict[str, Any]]:
+    """
+    Compare every stated ending/closing balance with the balance carried forward from
+    the previous row plus the row's amount, flagging missed or misread transactions.
+    """
+    balances, _ = ledger.running_balances()
+    discrepancies = []
+    for i in range(1, len(ledger)):
+        if np.isnan(ledger.balances[i]) or not CLOSING_BALANCE_PATTERN.search(ledger.descriptions[i]):
+            continue
+        expected = balances[i - 1] + ledger.amounts[i]
+        difference = ledger.balances[i] - expected
+        if abs(difference) > BALANCE_TOLERANCE:
+            discrepancies.append({
+                "date": str(ledger.dates[i]),
+                "stated_balance": round(float(ledger.balances[i]), 2),
+                "calculated_balance": round(float(expected), 2),
+                "difference": round(float(difference), 2)
+            })
+    return discrepancies
+
+def build_daily_balances_from_ledger(ledger: TransactionLedger, start_date: str = None, end_date: str = None) -> Dict[str, Any]:
+    """Build the full daily balance series from a transaction ledger in the extract_daily_balances shape"""
+    dates, balances, is_direct = ledger.end_of_day_balances()
+    opening_balance = None
+    if len(ledger):
+        first_balances, _ = ledger.running_balances()
+        opening_balance = float(first_balances[0] - ledger.amounts[0])
+
+    series = build_daily_balance_series(dates, balances, is_direct, start_date, end_date, opening_balance)
+    discrepancies = reconcile_stated_closing_balances(ledger)
+    if discrepancies:
+        logger.warning(f"Found {len(discrepancies)} stated closing balances that do not reconcile with transactions")
+
+    return {
+        "daily_balances": series_to_daily_balances(series),
+        "reconciliation": {
+            "is_reconciled": not discrepancies,
+            "discrepancies": discrepancies
+        }
+    }
+
+def densify_daily_balances(daily_balances: List[Dict[str, Any]], start_date: str = None, end_date: str = None) -> List[Dict[str, Any]]:
+    """
+    Fill calendar days missing from extracted daily balances by forward-filling the previous
+    balance. Rows without a readable date or numeric balance are skipped.
+    """
+    rows = []
+    for b in daily_balances:
+        date = parse_date(b.get("date")) if isinstance(b, dict) else None
+        balance = parse_amount(b.get("balance")) if date else None
+        if balance is None:
+            logger.debug(f"Skipping daily balance without a readable date or balance: {b}")
+            continue
+        rows.append((date, balance, b.get("balance_type") == "direct"))
+    if not rows:
+        return []
+    rows.sort(key=lambda row: row[0])
+    series = build_daily_balance_series(
+        np.array([date for date, _, _ in rows], dtype="datetime64[D]"),
+        np.array([balance for _, balance, _ in rows], dtype=np.float64),
+        np.array([is_direct for _, _, is_direct in rows], dtype=bool),
+        start_date,
+        end_date
+    )
+    return series_to_daily_balances(series)
@@ -0,0 +1,116 @@
+import os
+import logging
+from typing import Any, Dict, List, Optional
+from app.services.pdf_text_cache import PDF_TEXT_CACHE
+from app.services.file_hash import compute_file_hash
+from app.services.response_cache import compute_text_hash
+
+logger = logging.getLogger(__name__)
+
+class DocumentPart:
+    """
+    One uploaded PDF, or a page range of it, within a document set. Pages are
+    1-based and inclusive; first_page/last_page of None mean the start/end of the file.
+    """
+    def __init__(self, path: str, first_page: Optional[int] = None, last_page: Optional[int] = None,
+                 content_hash: Optional[str] = None):
+        self.path = path
+        self.first_page = first_page
+        self.last_page = last_page
+        self._content_hash = content_hash
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.path)
+
+    @property
+    def whole_file(self) -> bool:
+        return self.first_page is None and self.last_page is None
+
+    @property
+    def content_hash(self) -> str:
+        # Hashed at most once per part; upload passes in the hash computed while streaming
+        if self._content_hash is None:
+            self._content_hash = compute_file_hash(self.path)
+        return self._content_hash
+
+    @property
+    def label(self) -> str:
+        if self.whole_file:
+            return self.name
+        return f"{self.name} pages {self.first_page or 1}-{self.last_page or 'end'}"
+
+    def get_pages(self) -> List[str]:
+        """Extracted text of the pages in this part"""
+        pages = PDF_TEXT_CACHE.get_pages(self.path, self.content_hash)
+        start = (self.first_page or 1) - 1
+        return pages[start:self.last_page]
+
+    def get_text(self) -> str:
+        return "".join(page + "\n\n" for page in self.get_pages())
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {"path": self.path}
+        if not self.whole_file:
+            data["first_page"] = self.first_page
+            data["last_page"] = self.last_page
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DocumentPart":
+        return cls(data["path"], data.get("first_page"), data.get("last_page"))
+
+class DocumentSet:
+    """
+    Ordered references to uploaded PDFs (or page ranges of them) that are analyzed as
+    one document. Replaces writing a merged PDF: wrappers read the original files, as
+    native per-file documents or as extracted text concatenated on demand.
+    """
+    def __init__(self, parts: List[DocumentPart], document_type: Optional[str] = None):
+        self.parts = parts
+        self.document_type = document_type
+
+    @classmethod
+    def from_paths(cls, paths: List[str], document_type: Optional[str] = None,
+                   content_hashes: Optional[Dict[str, str]] = None) -> "DocumentSet":
+        content_hashes = content_hashes or {}
+        return cls([DocumentPart(path, content_hash=content_hashes.get(path)) for path in paths], document_type)
+
+    @classmethod
+    def from_value(cls, value: Any) -> "DocumentSet":
+        """Build a document set from its to_dict form, or from a single PDF path as sent by older clients"""
+        if isinstance(value, DocumentSet):
+            return value
+        if isinstance(value, str):
+            return cls([DocumentPart(value)])
+        return cls([DocumentPart.from_dict(part) for part in value["files"]], value.get("document_type"))
+
+    @property
+    def paths(self) -> List[str]:
+        return [part.path for part in self.parts]
+
+    def get_pages(self) -> List[str]:
+        """Extracted text of every page, in order across the files"""
+        return [page for part in self.parts for page in part.get_pages()]
+
+    def get_text(self) -> str:
+        """Full extracted text, pages separated by blank lines as for a single merged PDF"""
+        return "".join(part.get_text() for part in self.parts)
+
+    def fingerprint(self) -> str:
+        """Digest of the referenced content and page ranges"""
+        return compute_text_hash("\n".join(
+            f"{part.content_hash}:{part.first_page}:{part.last_page}" for part in self.parts
+        ))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "document_type": self.document_type,
+            "files": [part.to_dict() for part in self.parts]
+        }
+
+    def __len__(self) -> int:
+        return len(self.parts)
+
+    def __repr__(self) -> str:
+        return f"DocumentSet({self.document_type}, {[part.label for part in self.parts]})"
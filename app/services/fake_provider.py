@@ -0,0 +1,346 @@
+import re
+import json
+import time
+import random
+import hashlib
+import logging
+import threading
+import calendar
+from datetime import date, timedelta
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from app.config import Config
+from app.services.token_estimator import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+ISO_DATE_PATTERN = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b")
+US_DATE_PATTERN = re.compile(r"\b(\d{1,2})/(\d{1,2})/(\d{4})\b")
+PERIOD_PATTERN = re.compile(r"from (\d{4}-\d{2}-\d{2}) to (\d{4}-\d{2}-\d{2})")
+TAX_PATTERN = re.compile(r"\b(IRS|Form 1040|Form 1120|Form 1065|Schedule [A-Z]|Tax Year)\b")
+# Used when the context carries no recognizable dates
+DEFAULT_MONTHS = [(2024, 1), (2024, 2), (2024, 3)]
+STREAM_CHUNK_CHARS = 16
+
+def _prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+def _recording_key(context_fingerprint: Optional[str], prompt_hash: str) -> str:
+    return f"{context_fingerprint or ''}:{prompt_hash}"
+
+class ResponseRecorder:
+    """
+    Append-only JSONL log of prompts and the responses a real provider returned, for
+    replay by the fake provider. Each line holds provider, model, the fingerprint of the
+    wrapper's documents and JSON context, prompt_hash and response.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def record(self, provider: str, model: str, prompt: str, response: str, context_fingerprint: str) -> None:
+        line = json.dumps({
+            "provider": provider,
+            "model": model,
+            "context_fingerprint": context_fingerprint,
+            "prompt_hash": _prompt_hash(prompt),
+            "response": response
+        })
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as file:
+                file.write(line + "\n")
+
+def load_recordings(path: str) -> Dict[str, str]:
+    """
+    Map context fingerprint and prompt hash to the latest recorded response, so constant
+    prompts replay the answer recorded for the same documents
+    """
+    recordings = {}
+    with open(path, 'r', encoding='utf-8') as file:
+        for line in file:
+            if line.strip():
+                entry = json.loads(line)
+                key = _recording_key(entry.get("context_fingerprint"), entry["prompt_hash"])
+                recordings[key] = entry["response"]
+    logger.info(f"📼 Loaded {len(recordings)} recorded responses from {path}")
+    return recordings
+
+# Records real provider responses when LLM_RECORD_PATH is set
+RESPONSE_RECORDER = ResponseRecorder(Config.LLM_RECORD_PATH) if Config.LLM_RECORD_PATH else None
+
+@dataclass
+class FakeCompletion:
+    """A completion, or one streamed delta of it, returned by FakeLLMClient"""
+    text: str
+    finish_reason: Optional[str] = None  # "stop" or "length" on the last delta
+    total_tokens: Optional[int] = None
+
+class FakeRateLimitError(Exception):
+    """Injected 429, shaped like provider SDK errors so the retry logic treats it the same"""
+    status_code = 429
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Fake provider rate limit, retry after {retry_after}s")
+        self.response = type("Response", (), {"headers": {"retry-after-ms": str(int(retry_after * 1000))}})()
+
+class FakeLLMClient:
+    """
+    Offline stand-in for a provider SDK client. Answers with a recorded response for the
+    prompt when one exists, otherwise with schema-valid JSON generated for the analysis
+    tool the prompt belongs to, using dates found in the context. Latency, 429s and
+    truncated outputs are injected as configured. Everything is derived from the seed
+    and the request, so runs are reproducible regardless of thread scheduling.
+    """
+    def __init__(self, seed: int = 0, recordings: Optional[Dict[str, str]] = None):
+        self.seed = seed
+        self.recordings = recordings or {}
+        self.requests = 0
+        self.total_tokens = 0
+        self._attempts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def complete(self, model: str, messages: List[Dict], max_tokens: int,
+                 context_fingerprint: Optional[str] = None) -> FakeCompletion:
+        text, truncated, total_tokens, pacing = self._prepare(model, messages, max_tokens, context_fingerprint)
+        time.sleep(pacing * len(text))
+        return FakeCompletion(text, "length" if truncated else "stop", total_tokens)
+
+    def stream(self, model: str, messages: List[Dict], max_tokens: int,
+               context_fingerprint: Optional[str] = None) -> Iterator[FakeCompletion]:
+        text, truncated, total_tokens, pacing = self._prepare(model, messages, max_tokens, context_fingerprint)
+        for start in range(0, len(text), STREAM_CHUNK_CHARS):
+            delta = text[start:start + STREAM_CHUNK_CHARS]
+            time.sleep(pacing * len(delta))
+            yield FakeCompletion(delta)
+        yield FakeCompletion("", "length" if truncated else "stop", total_tokens)
+
+    def _prepare(self, model: str, messages: List[Dict], max_tokens: int,
+                 context_fingerprint: Optional[str] = None) -> Tuple[str, bool, int, float]:
+        """
+        Wait out the first-token latency and return (text, truncated, total tokens, seconds per output char).
+        context_fingerprint identifies the caller's documents and JSON context for replaying recordings.
+        """
+        prompt = _message_text(messages[-1])
+        context = "\n".join(_message_text(message) for message in messages[:-1])
+        request_key = _prompt_hash(f"{model}\n{context}\n{prompt}")
+        with self._lock:
+            attempt = self._attempts.get(request_key, 0)
+            self._attempts[request_key] = attempt + 1
+            self.requests += 1
+        faults = random.Random(f"{self.seed}:{request_key}:{attempt}")
+
+        time.sleep(self._sample_latency(faults))
+        if faults.random() < Config.FAKE_LLM_RATE_LIMIT_PROBABILITY:
+            raise FakeRateLimitError(Config.FAKE_LLM_RETRY_AFTER_SECONDS)
+        # Attempts only matter while a request is being retried; forget it once answered
+        with self._lock:
+            self._attempts.pop(request_key, None)
+
+        text = self.recordings.get(_recording_key(context_fingerprint, _prompt_hash(prompt)))
+        if text is None:
+            text = json.dumps(generate_response(prompt, context, random.Random(f"{self.seed}:{request_key}")), indent=2)
+        truncated = faults.random() < Config.FAKE_LLM_TRUNCATION_PROBABILITY
+        if truncated:
+            text = text[:len(text) // 2]
+
+        output_tokens = estimate_tokens(text)
+        total_tokens = estimate_tokens(context) + estimate_tokens(prompt) + output_tokens
+        with self._lock:
+            self.total_tokens += total_tokens
+        pacing = 0.0
+        if Config.FAKE_LLM_TOKENS_PER_SECOND > 0 and text:
+            pacing = output_tokens / Config.FAKE_LLM_TOKENS_PER_SECOND / len(text)
+        return text, truncated, total_tokens, pacing
+
+    def _sample_latency(self, rng: random.Random) -> float:
+        """Seconds until the first token, drawn from the configured distribution around the mean"""
+        mean = Config.FAKE_LLM_LATENCY_MEAN_SECONDS
+        distribution = Config.FAKE_LLM_LATENCY_DISTRIBUTION
+        if mean <= 0 or distribution == "fixed":
+            return max(mean, 0.0)
+        if distribution == "uniform":
+            return rng.uniform(0, 2 * mean)
+        sigma = Config.FAKE_LLM_LATENCY_SIGMA
+        # Lognormal with the configured mean: long right tail like real provider latency
+        return mean * rng.lognormvariate(-sigma ** 2 / 2, sigma)
+
+def _message_text(message: Dict) -> str:
+    content = message.get("content", "")
+    if isinstance(content, list):
+        return "\n".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return str(content)
+
+def _statement_months(context: str) -> List[Tuple[int, int]]:
+    """Months covered by the dates found in the context"""
+    months = set()
+    for year, month, day in ISO_DATE_PATTERN.findall(context):
+        if 1 <= int(month) <= 12:
+            months.add((int(year), int(month)))
+    for month, day, year in US_DATE_PATTERN.findall(context):
+        if 1 <= int(month) <= 12:
+            months.add((int(year), int(month)))
+    return sorted(months) or list(DEFAULT_MONTHS)
+
+def _month_bounds(year: int, month: int) -> Tuple[date, date]:
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+def _days(start: date, end: date) -> Iterator[date]:
+    day = start
+    while day <= end:
+        yield day
+        day += timedelta(days=1)
+
+def _money(rng: random.Random, low: float, high: float) -> float:
+    return round(rng.uniform(low, high), 2)
+
+def _transactions(start: date, end: date, rng: random.Random) -> List[Dict]:
+    balance = _money(rng, 5000, 50000)
+    rows = [{"date": start.isoformat(), "description": "Beginning Balance", "amount": 0,
+             "running_balance": balance, "page": 1}]
+    for day in _days(start, end):
+        if day.weekday() >= 5:
+            continue
+        for _ in range(rng.randint(0, 3)):
+            if rng.random() < 0.4:
+                amount, description = _money(rng, 200, 8000), "Deposit"
+            else:
+                amount, description = -_money(rng, 20, 3000), "Card purchase"
+            balance = round(balance + amount, 2)
+            rows.append({"date": day.isoformat(), "description": description, "amount": amount,
+                         "running_balance": balance, "page": 1})
+        if rng.random() < 0.02:
+            balance = round(balance - 35.0, 2)
+            rows.append({"date": day.isoformat(), "description": "NSF Fee", "amount": -35.0,
+                         "running_balance": balance, "page": 1})
+    rows.append({"date": end.isoformat(), "description": "Ending Balance", "amount": 0,
+                 "running_balance": balance, "page": 1})
+    return rows
+
+def _prompt_period(prompt: str, context: str) -> Tuple[date, date]:
+    match = PERIOD_PATTERN.search(prompt)
+    if match:
+        return date.fromisoformat(match.group(1)), date.fromisoformat(match.group(2))
+    months = _statement_months(context)
+    return _month_bounds(*months[0])[0], _month_bounds(*months[-1])[1]
+
+def _classification(prompt: str, context: str, rng: random.Random) -> Dict:
+    is_tax = bool(TAX_PATTERN.search(context))
+    return {
+        "document_type": "tax_return" if is_tax else "bank_statement",
+        "confidence_score": round(rng.uniform(0.85, 0.99), 2),
+        "indicators_found": ["IRS form numbers"] if is_tax else ["Account number", "Transaction history"],
+        "explanation": "Generated by the fake LLM provider"
+    }
+
+def _ledger(prompt: str, context: str, rng: random.Random) -> Dict:
+    return {"transactions": _transactions(*_prompt_period(prompt, context), rng)}
+
+def _daily_balances(prompt: str, context: str, rng: random.Random) -> Dict:
+    start, end = _prompt_period(prompt, context)
+    balance = _money(rng, 5000, 50000)
+    balances = []
+    for day in _days(start, end):
+        balance = round(balance + rng.uniform(-1500, 1600), 2)
+        balances.append({
+            "date": day.isoformat(),
+            "balance": balance,
+            "is_business_day": day.weekday() < 5,
+            "balance_type": "direct" if day in (start, end) else "calculated"
+        })
+    return {"daily_balances": balances}
+
+def _continuity(prompt: str, context: str, rng: random.Random) -> Dict:
+    periods = [_month_bounds(year, month) for year, month in _statement_months(context)]
+    return {
+        "statement_periods": [{"start_date": start.isoformat(), "end_date": end.isoformat()} for start, end in periods],
+        "analysis": {
+            "is_contiguous": True,
+            "gap_details": [],
+            "explanation": "Statements are contiguous"
+        }
+    }
+
+def _nsf(prompt: str, context: str, rng: random.Random) -> Dict:
+    incidents = []
+    for year, month in _statement_months(context):
+        start, end = _month_bounds(year, month)
+        for _ in range(rng.choice([0, 0, 0, 1, 2])):
+            incidents.append({"date": (start + timedelta(days=rng.randint(0, end.day - 1))).isoformat(), "amount": 35.0})
+    return {
+        "nsf_incidents": incidents,
+        "total_fees": round(35.0 * len(incidents), 2),
+        "incident_count": len(incidents)
+    }
+
+def _monthly_data(prompt: str, context: str, rng: random.Random) -> Dict:
+    return {
+        "monthly_data": {
+            f"{year}-{month:02d}": {"expenses": _money(rng, 20000, 60000), "revenue": _money(rng, 25000, 70000)}
+            for year, month in _statement_months(context)
+        }
+    }
+
+def _closing_balances(prompt: str, context: str, rng: random.Random) -> Dict:
+    balances = []
+    for year, month in _statement_months(context):
+        balances.append({
+            "month": f"{year}-{month:02d}",
+            "closing_date": _month_bounds(year, month)[1].isoformat(),
+            "balance": _money(rng, 5000, 50000),
+            "balance_type": "direct",
+            "source": "Ending Balance statement",
+            "verification": "Matches next month opening balance"
+        })
+    return {
+        "monthly_closing_balances": balances,
+        "analysis": {
+            "months_covered": len(balances),
+            "direct_balances": len(balances),
+            "calculated_balances": 0,
+            "verification_notes": []
+        }
+    }
+
+def _loan_recommendation(prompt: str, context: str, rng: random.Random) -> Dict:
+    max_payment = _money(rng, 1000, 10000)
+    return {
+        "loan_recommendation": {
+            "approval_decision": rng.random() < 0.7,
+            "confidence_score": round(rng.uniform(0.5, 0.95), 2),
+            "max_monthly_payment_amount": max_payment,
+            "max_loan_amount": round(max_payment * 10, 2),
+            "key_metrics": {
+                "payment_coverage_ratio": round(rng.uniform(1.0, 3.0), 2),
+                "average_daily_balance_trend": rng.choice(["increasing", "stable", "decreasing"]),
+                "lowest_monthly_balance": _money(rng, 1000, 20000),
+                "highest_nsf_month_count": rng.randint(0, 2)
+            },
+            "risk_factors": ["Generated risk factor"],
+            "mitigating_factors": ["Generated mitigating factor"],
+            "detailed_analysis": "Generated by the fake LLM provider",
+            "conditions_if_approved": ["Provide updated statements"]
+        }
+    }
+
+# Response generators keyed by a schema field that only that tool's prompt asks for, checked in order
+RESPONSE_GENERATORS: List[Tuple[str, Callable[[str, str, random.Random], Dict]]] = [
+    ('"document_type"', _classification),
+    ('"transactions"', _ledger),
+    ('"daily_balances"', _daily_balances),
+    ('"statement_periods"', _continuity),
+    ('"nsf_incidents"', _nsf),
+    ('"monthly_closing_balances"', _closing_balances),
+    ('"monthly_data"', _monthly_data),
+    ('"loan_recommendation"', _loan_recommendation)
+]
+
+def generate_response(prompt: str, context: str, rng: random.Random) -> Any:
+    """Schema-valid JSON answer for an analysis tool prompt"""
+    for marker, generator in RESPONSE_GENERATORS:
+        if marker in prompt:
+            return generator(prompt, context, rng)
+    return {"response": "Generated by the fake LLM provider"}
+
+def create_fake_client() -> FakeLLMClient:
+    recordings = load_recordings(Config.FAKE_LLM_RECORDINGS_PATH) if Config.FAKE_LLM_RECORDINGS_PATH else None
+    return FakeLLMClient(seed=Config.FAKE_LLM_SEED, recordings=recordings)
@@ -0,0 +1,11 @@
+import hashlib
+
+CHUNK_SIZE = 1024 * 1024  # 1MB reads keep memory flat for large PDFs
+
+def compute_file_hash(file_path: str) -> str:
+    """Return the SHA-256 hex digest of a file's content"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,72 @@
+import logging
+from typing import Dict, Any
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+METRICS = ["revenue", "expenses", "cashflow"]
+
+def compute_monthly_statistics(monthly_data: Dict[str, Dict[str, float]]) -> Dict[str, Any]:
+    """
+    Compute summary statistics over per-month revenue, expenses and cashflow.
+
+    Args:
+        monthly_data: Mapping of "YYYY-MM" to totals with "revenue" and "expenses"
+            (and optionally "cashflow"; it is recomputed as revenue - expenses)
+
+    Returns:
+        Dict with cleaned monthly_data (sorted by month) and statistics per metric:
+        average, std_deviation, median, trend_slope (change per month) and
+        coefficient_of_variation
+    """
+    months = sorted(monthly_data)
+    revenue = np.array([float(monthly_data[m]["revenue"]) for m in months], dtype=np.float64)
+    expenses = np.array([float(monthly_data[m]["expenses"]) for m in months], dtype=np.float64)
+    values = np.vstack([revenue, expenses, revenue - expenses]) if months else np.zeros((3, 0))
+
+    n = values.shape[1]
+    if n == 0:
+        zeros = np.zeros(3)
+        average = std_deviation = median = trend_slope = coefficient_of_variation = zeros
+    else:
+        average = values.mean(axis=1)
+        std_deviation = values.std(axis=1, ddof=1) if n > 1 else np.zeros(3)
+        median = np.median(values, axis=1)
+
+        # Least-squares slope against month index, for all metrics at once
+        if n > 1:
+            x = np.arange(n, dtype=np.float64)
+            x_centered = x - x.mean()
+            trend_slope = (values - average[:, None]) @ x_centered / (x_centered @ x_centered)
+        else:
+            trend_slope = np.zeros(3)
+
+        abs_average = np.abs(average)
+        coefficient_of_variation = np.divide(
+            std_deviation, abs_average, out=np.zeros(3), where=abs_average > 0
+        )
+
+    statistics = {}
+    for i, metric in enumerate(METRICS):
+        statistics[metric] = {
+            "average": round(float(average[i]), 2),
+            "std_deviation": round(float(std_deviation[i]), 2),
+            "median": round(float(median[i]), 2),
+            "trend_slope": round(float(trend_slope[i]), 2),
+            "coefficient_of_variation": round(float(coefficient_of_variation[i]), 4)
+        }
+
+    cleaned_monthly_data = {
+        month: {
+            "expenses": round(float(values[1, i]), 2),
+            "revenue": round(float(values[0, i]), 2),
+            "cashflow": round(float(values[2, i]), 2)
+        }
+        for i, month in enumerate(months)
+    }
+
+    logger.debug(f"Computed monthly statistics over {n} months")
+    return {
+        "monthly_data": cleaned_monthly_data,
+        "statistics": statistics
+    }
@@ -0,0 +1,107 @@
+import re
+import logging
+from typing import List, Dict, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (label, pattern, weight) - mirrors the indicators listed in the classify_document_type prompt.
+# Definitive indicators (IRS form numbers, routing numbers) carry the highest weights.
+BANK_STATEMENT_INDICATORS: List[Tuple[str, str, float]] = [
+    ("Routing number", r"\brouting\s*(?:number|no\.?|#)|\bABA\b", 3.0),
+    ("Statement period", r"\bstatement\s+(?:period|dates?)\b", 3.0),
+    ("Account number", r"\baccount\s*(?:number|no\.?|#)", 1.5),
+    ("Opening balance", r"\b(?:beginning|opening|previous)\s+balance\b|\bbalance\s+forward\b", 2.0),
+    ("Closing balance", r"\b(?:ending|closing)\s+balance\b", 2.0),
+    ("Available balance", r"\bavailable\s+balance\b", 1.0),
+    ("Daily balance summary", r"\bdaily\s+(?:ending\s+)?balance", 1.5),
+    ("Deposits and credits", r"\bdeposits?\s+(?:and|&)\s+(?:other\s+)?(?:credits|additions)\b", 1.5),
+    ("Withdrawals and debits", r"\bwithdrawals?\s+(?:and|&)\s+(?:other\s+)?(?:debits|subtractions)\b", 1.5),
+    ("ATM/debit card transactions", r"\bATM\b|\bdebit\s+card\b|\bPOS\s+purchase\b", 1.0),
+    ("ACH/direct deposit", r"\bACH\b|\bdirect\s+deposit\b", 1.0),
+    ("Service charges or fees", r"\bservice\s+(?:charge|fee)s?\b|\bmonthly\s+maintenance\s+fee\b", 1.0),
+    ("Check details", r"\bchecks?\s+(?:paid|number|no\.?|#)", 1.0),
+    ("Overdraft/NSF", r"\boverdraft\b|\bNSF\b|\binsufficient\s+funds\b", 1.0),
+]
+
+TAX_RETURN_INDICATORS: List[Tuple[str, str, float]] = [
+    ("IRS form number", r"\bform\s+(?:1040|1120(?:-?S)?|1065|1041|990)\b", 4.0),
+    ("Internal Revenue Service", r"\binternal\s+revenue\s+service\b|\bdepartment\s+of\s+the\s+treasury\b", 3.0),
+    ("Tax year reference", r"\btax\s+year\b|\bfor\s+calendar\s+year\b|\bfor\s+the\s+year\s+jan\.?\s*1", 1.5),
+    ("SSN or EIN", r"\bsocial\s+security\s+number\b|\bemployer\s+identification\s+number\b|\bEIN\b", 2.0),
+    ("Filing status", r"\bfiling\s+status\b", 2.0),
+    ("Income sections", r"\badjusted\s+gross\s+income\b|\btaxable\s+income\b|\bgross\s+receipts\b", 2.0),
+    ("Deductions and credits", r"\b(?:standard|itemized)\s+deduction\b|\btotal\s+deductions\b|\btax\s+credits?\b", 1.5),
+    ("Schedule references", r"\bschedule\s+(?:[A-H]|K-?1|SE|M-[123]|L)\b", 1.5),
+    ("Dependent information", r"\bdependents?\b", 0.5),
+    ("Paid preparer details", r"\bpaid\s+preparer\b|\bPTIN\b", 1.5),
+    ("Perjury statement", r"\bunder\s+penalties\s+of\s+perjury\b", 2.0),
+    ("FICA/Medicare/self-employment tax", r"\bself-employment\s+tax\b|\bmedicare\b|\bFICA\b", 1.0),
+]
+
+# Bank-style fields every return carries for refund direct deposit (Form 1040 lines 35b-d,
+# 1120 line 37); not counted as bank statement evidence once an IRS form header is found
+TAX_FORM_BANK_FIELDS = {"Routing number", "Account number", "ACH/direct deposit"}
+TAX_FORM_HEADER = "IRS form number"
+
+# Combined score at which a one-sided match is treated as fully certain
+SCORE_SATURATION = 10.0
+
+_COMPILED = {
+    "bank_statement": [(label, re.compile(pattern, re.IGNORECASE), weight)
+                       for label, pattern, weight in BANK_STATEMENT_INDICATORS],
+    "tax_return": [(label, re.compile(pattern, re.IGNORECASE), weight)
+                   for label, pattern, weight in TAX_RETURN_INDICATORS],
+}
+
+def _score(text: str, document_type: str, ignored: Set[str] = frozenset()) -> Tuple[float, List[str]]:
+    score = 0.0
+    found = []
+    for label, pattern, weight in _COMPILED[document_type]:
+        if label not in ignored and pattern.search(text):
+            score += weight
+            found.append(label)
+    return score, found
+
+def classify_by_heuristics(pages: List[str]) -> Dict:
+    """
+    Score extracted page text against bank statement and tax return indicators.
+
+    Args:
+        pages: Extracted text of the first pages of the document
+
+    Returns:
+        dict: Classification result in the same shape as classify_document_type
+    """
+    text = "\n".join(pages)
+    tax_score, tax_found = _score(text, "tax_return")
+    ignored = TAX_FORM_BANK_FIELDS if TAX_FORM_HEADER in tax_found else frozenset()
+    bank_score, bank_found = _score(text, "bank_statement", ignored)
+    total = bank_score + tax_score
+
+    if total == 0:
+        return {
+            "document_type": "unknown",
+            "confidence_score": 0.0,
+            "indicators_found": [],
+            "explanation": "No bank statement or tax return indicators found in extracted text",
+            "classification_method": "heuristic"
+        }
+
+    if bank_score >= tax_score:
+        document_type, winner, loser, indicators = "bank_statement", bank_score, tax_score, bank_found
+    else:
+        document_type, winner, loser, indicators = "tax_return", tax_score, bank_score, tax_found
+
+    # Confidence combines how one-sided the evidence is with how much evidence there is
+    margin = (winner - loser) / total
+    strength = min(1.0, winner / SCORE_SATURATION)
+    confidence = round(margin * strength, 2)
+
+    logger.debug(f"Heuristic scores - bank: {bank_score}, tax: {tax_score}, confidence: {confidence}")
+    return {
+        "document_type": document_type,
+        "confidence_score": confidence,
+        "indicators_found": indicators,
+        "explanation": f"Local indicator scoring (bank statement: {bank_score:.1f}, tax return: {tax_score:.1f})",
+        "classification_method": "heuristic"
+    }
@@ -0,0 +1,108 @@
+import re
+import json
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+KEY_PATTERN = re.compile(r'"((?:[^"\\]|\\.)*)"\s*:\s*$')
+# Enough lookbehind to find the key that precedes an array
+KEY_LOOKBEHIND = 256
+
+class IncrementalJsonParser:
+    """
+    Single-pass scanner for JSON text that arrives in pieces.
+
+    Tracks string and nesting state so completion is judged correctly even when
+    strings contain braces. Each element of an array sitting directly under the
+    top-level object (e.g. "daily_balances": [...]) or of a top-level array is
+    reported through on_item(key, element) as soon as it closes. Text before the
+    first brace, such as a ```json fence, is ignored.
+    """
+    def __init__(self, on_item: Optional[Callable[[Optional[str], Any], None]] = None):
+        self.on_item = on_item
+        self.text = ""
+        self.complete = False
+        self.items_emitted = 0
+        self._pos = 0
+        self._in_string = False
+        self._escape = False
+        self._stack: List[Dict[str, Any]] = []
+
+    def feed(self, chunk: str) -> None:
+        self.text += chunk
+        text = self.text
+        for i in range(self._pos, len(text)):
+            char = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if not self._stack:
+                if not self.complete and char in "{[":
+                    self._push(char, i)
+                continue
+
+            top = self._stack[-1]
+            if char in " \t\r\n:":
+                continue
+            if char == '"':
+                self._start_element(top, i, container=False)
+                self._in_string = True
+            elif char in "{[":
+                self._start_element(top, i, container=True)
+                self._push(char, i)
+            elif char in "}]":
+                if top["tracked"] and top["start"] is not None:
+                    self._emit(top, text[top["start"]:i])
+                self._stack.pop()
+                if not self._stack:
+                    self.complete = True
+                    continue
+                parent = self._stack[-1]
+                if parent["tracked"] and parent["container"]:
+                    self._emit(parent, text[parent["start"]:i + 1])
+            elif char == ",":
+                if top["tracked"] and top["start"] is not None:
+                    self._emit(top, text[top["start"]:i])
+            else:
+                self._start_element(top, i, container=False)
+        self._pos = len(text)
+
+    def _push(self, char: str, index: int) -> None:
+        key = None
+        # Track elements of a top-level array, or of arrays directly under the top-level object
+        tracked = char == "[" and (
+            not self._stack or (len(self._stack) == 1 and self._stack[0]["kind"] == "{")
+        )
+        if tracked and self._stack:
+            match = KEY_PATTERN.search(self.text[max(0, index - KEY_LOOKBEHIND):index])
+            key = match.group(1) if match else None
+        self._stack.append({"kind": char, "tracked": tracked, "key": key, "start": None, "container": False})
+
+    def _start_element(self, top: Dict[str, Any], index: int, container: bool) -> None:
+        if top["tracked"] and top["start"] is None:
+            top["start"] = index
+            top["container"] = container
+
+    def _emit(self, array: Dict[str, Any], element_text: str) -> None:
+        array["start"] = None
+        array["container"] = False
+        if not self.on_item:
+            return
+        try:
+            element = json.loads(element_text)
+        except json.JSONDecodeError:
+            logger.debug(f"Skipping unparseable streamed element: {element_text[:80]}")
+            return
+        self.items_emitted += 1
+        self.on_item(array["key"], element)
+
+    @property
+    def started(self) -> bool:
+        return self.complete or bool(self._stack)
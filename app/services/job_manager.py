@@ -0,0 +1,86 @@
+import time
+import uuid
+import logging
+import threading
+import traceback
+from typing import Any, Callable, Dict, Optional
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class Job:
+    job_id: str
+    status: str = "queued"  # queued | running | complete | failed
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Any = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error
+        }
+
+class JobManager:
+    """Runs long pipelines on a background worker pool and tracks their results by job ID"""
+    def __init__(self, max_workers: int, retention_seconds: int):
+        self.retention_seconds = retention_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable[..., Any], *args, job_id: str = None, **kwargs) -> str:
+        """Queue fn(*args, **kwargs) and return its job ID immediately"""
+        self._purge_expired()
+        job = Job(job_id=job_id or str(uuid.uuid4()))
+        with self._lock:
+            self._jobs[job.job_id] = job
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        logger.info(f"📋 Queued job {job.job_id}")
+        return job.job_id
+
+    def _run(self, job: Job, fn: Callable[..., Any], args: tuple, kwargs: dict) -> None:
+        with self._lock:
+            job.status = "running"
+            job.started_at = time.time()
+        try:
+            result = fn(*args, **kwargs)
+            with self._lock:
+                job.result = result
+                job.status = "complete"
+            logger.info(f"✅ Job {job.job_id} complete")
+        except Exception as e:
+            logger.error(f"❌ Job {job.job_id} failed: {str(e)}")
+            logger.error(traceback.format_exc())
+            with self._lock:
+                job.error = str(e)
+                job.status = "failed"
+        finally:
+            with self._lock:
+                job.finished_at = time.time()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a snapshot of the job's status and result, or None if unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    def _purge_expired(self) -> None:
+        """Forget finished jobs older than the retention window"""
+        cutoff = time.time() - self.retention_seconds
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.finished_at is not None and job.finished_at < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+        if expired:
+            logger.debug(f"Purged {len(expired)} expired jobs")
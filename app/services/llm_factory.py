@@ -1,32 +1,116 @@
+import re
+import time
 import logging
 import base64
-from typing import Any, List, Dict
+import threading
+from contextlib import nullcontext
+from typing import Any, Callable, Iterator, List, Dict, Optional, Tuple
 from app.config import Config, LLMProvider, ModelType
 import json
-from anthropic import Anthropic
-import google.generativeai as genai
-from openai import OpenAI
-import PyPDF2
-from app.services.rate_limiter import RATE_LIMITERS
-from mistralai import Mistral
+from app.services.provider_clients import get_provider_client
+from app.services.rate_limiter import get_rate_limiter
+from app.services.token_estimator import estimate_tokens, estimate_json_tokens, estimate_document_tokens
+from app.services.concurrency_controller import get_concurrency_controller, is_rate_limit_error, get_retry_after, get_status_code
+from app.services.document_set import DocumentSet
+from app.services.mistral_file_registry import MISTRAL_FILE_REGISTRY
+from app.services.incremental_json import IncrementalJsonParser
+from app.services.response_cache import RESPONSE_CACHE, compute_text_hash
+from app.services.fake_provider import RESPONSE_RECORDER
 import os
 
 logger = logging.getLogger(__name__)
 
+# Mistral errors for a referenced upload that is gone (expired or deleted); a bare 404 is not enough
+MISSING_FILE_PATTERN = re.compile(
+    r"\bfile\b[^.]*\b(?:not found|does not exist|no longer exists|expired|deleted)\b|\bfile_not_found\b",
+    re.IGNORECASE
+)
+
+class ContextBudgetExceeded(Exception):
+    """Raised before sending a request that cannot fit any available context window"""
+    def __init__(self, required_tokens: int, context_limit: int):
+        self.required_tokens = required_tokens
+        self.context_limit = context_limit
+        super().__init__(
+            f"Request needs ~{required_tokens} tokens but the context window is {context_limit}"
+        )
+
+class CompletionStream:
+    """
+    Text deltas of a streamed completion. Iterating yields text as the provider produces
+    it; text, truncated (stopped at the output token limit) and total_tokens are filled
+    in as the stream is consumed.
+    """
+    def __init__(self):
+        self.text = ""
+        self.truncated = False
+        self.total_tokens: Optional[int] = None
+        self._deltas: Iterator[str] = iter(())
+
+    def __iter__(self) -> Iterator[str]:
+        for delta in self._deltas:
+            self.text += delta
+            yield delta
+
+    def read(self) -> str:
+        """Consume the rest of the stream and return the full text"""
+        for _ in self:
+            pass
+        return self.text
+
 class LLMWrapper:
     """Base wrapper class for LLMs with conversation memory"""
+    provider: LLMProvider = None
+
     def __init__(self, model_type: ModelType = None):
         self.messages = []
         self.tools = []
+        self.context_sources = []
+        self.context_tokens = 0  # Estimated tokens of the documents and JSON context
+        self.exchanges: List[Tuple[int, Any]] = []  # (estimated tokens, handle) per prompt/answer, oldest first
+        self._delegate: Optional["LLMWrapper"] = None
+        # Stateless wrappers serve concurrent requests; only one of them may trim history or create the delegate
+        self._budget_lock = threading.Lock()
+        # Stateless: documents and JSON context form a fixed prefix and prompts/answers are not kept
+        self.stateless = False
+        # Called with (key, element) for each array element parsed from a streamed JSON response
+        self.item_listener: Optional[Callable[[Optional[str], Any], None]] = None
+        # Serve stateless requests from the deterministic response cache
+        self.use_cache = Config.RESPONSE_CACHE_ENABLED
+        self._fingerprint: Optional[str] = None
+        self._fingerprint_sources = 0
+        self.usage = {
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "cache_read_input_tokens": 0,
+            "cache_creation_input_tokens": 0
+        }
         self.model_type = model_type or Config.DEFAULT_MODEL_TYPE
+        self.rate_limiter = get_rate_limiter(self.provider)
+        self.concurrency = get_concurrency_controller(self.provider)
         logger.info(f"Initializing {self.__class__.__name__} with model type: {self.model_type.value}")
 
     def add_pdf(self, file_path: str) -> None:
-        """Add PDF content to conversation history"""
+        """Add a single PDF to conversation history"""
+        self.add_documents(DocumentSet.from_paths([file_path]))
+
+    def add_documents(self, documents: DocumentSet) -> None:
+        """Add a document set's PDFs to conversation history, read from the original files"""
+        self._add_documents(documents)
+        # A larger-context delegate serves all later prompts, so it needs the context too
+        if self._delegate:
+            self._delegate.add_documents(documents)
+
+    def _add_documents(self, documents: DocumentSet) -> None:
         raise NotImplementedError
 
     def add_json(self, data: dict) -> None:
         """Add JSON content to conversation history"""
+        self._add_json(data)
+        if self._delegate:
+            self._delegate.add_json(data)
+
+    def _add_json(self, data: dict) -> None:
         raise NotImplementedError
 
     def set_tools(self, tools: List[Any]):
@@ -40,290 +124,958 @@ class LLMWrapper:
         logger.info(f"🔧 Binding tools: {[t.name for t in tools]}")
         self.tools = tools
 
-    def get_response(self, prompt: str) -> str:
-        """Get response for a prompt, maintaining conversation history"""
+    def get_response(self, prompt: str, validate: Optional[Callable[[str], bool]] = None) -> str:
+        """
+        Get response for a prompt, maintaining conversation history unless stateless.
+        Stateless responses are served from the response cache when it holds this request.
+
+        Args:
+            prompt: Prompt to send
+            validate: Whether a response is usable, e.g. parses as JSON. Answers that fail it
+                or stopped at the output token limit are returned but never cached.
+        """
+        if self._delegate:
+            # The larger-context wrapper caches and records its own responses
+            return self._delegate.get_response(prompt, validate)
+        cache_key = self._cache_key(prompt)
+        if cache_key:
+            cached = RESPONSE_CACHE.get(cache_key)
+            if cached is not None and (validate is None or validate(cached)):
+                logger.info(f"💾 Serving cached {self.model_config['name']} response")
+                return cached
+        if not prompt:
+            return ""
+        llm = self._budget_request(prompt)
+        if llm is not self:
+            return llm.get_response(prompt, validate)
+        response_text, truncated = self._get_response(prompt)
+        self._store_response(prompt, response_text, truncated, cache_key, validate)
+        return response_text
+
+    def _get_response(self, prompt: str) -> Tuple[str, bool]:
+        """Send a budgeted prompt to the provider; returns (text, truncated at the output token limit)"""
         raise NotImplementedError
 
+    def _store_response(self, prompt: str, response_text: str, truncated: bool,
+                        cache_key: Optional[str], validate: Optional[Callable[[str], bool]]) -> None:
+        """Cache a complete, valid answer and record it for replay when recording is enabled"""
+        if truncated:
+            logger.warning(f"⚠️ {self.provider.value} response stopped at the output token limit; not caching it")
+        elif cache_key and response_text:
+            if validate is None or validate(response_text):
+                RESPONSE_CACHE.put(cache_key, self.provider.value, self.model_config['name'], response_text)
+            else:
+                logger.warning(f"⚠️ {self.provider.value} response failed validation; not caching it")
+        if RESPONSE_RECORDER and response_text:
+            RESPONSE_RECORDER.record(
+                self.provider.value, self.model_config['name'], prompt, response_text, self.context_fingerprint()
+            )
+
+    def set_stateless(self, stateless: bool = True):
+        """
+        In stateless mode each prompt is sent after the fixed document/JSON prefix only,
+        and neither the prompt nor the answer is added to the history. Requests stay
+        constant-size and the wrapper can serve concurrent calls.
+        """
+        self.stateless = stateless
+        return self
+
+    def set_cache(self, enabled: bool = True):
+        """Enable or bypass the response cache for this wrapper, e.g. to force a fresh analysis"""
+        self.use_cache = enabled
+        if self._delegate:
+            self._delegate.set_cache(enabled)
+        return self
+
+    def context_fingerprint(self) -> str:
+        """Digest of the documents (by content hash) and JSON context sent before each prompt"""
+        if self._fingerprint is None or self._fingerprint_sources != len(self.context_sources):
+            sources = list(self.context_sources)
+            parts = []
+            for source_type, source in sources:
+                if source_type == "documents":
+                    parts.append(f"documents:{source.fingerprint()}")
+                else:
+                    parts.append(f"json:{compute_text_hash(json.dumps(source, sort_keys=True))}")
+            self._fingerprint = compute_text_hash("\n".join(parts))
+            self._fingerprint_sources = len(sources)
+        return self._fingerprint
+
+    def _cache_key(self, prompt: str) -> Optional[str]:
+        """
+        Response cache key for a prompt, or None when the response cannot be cached.
+        Only stateless requests qualify: they depend on nothing but the fixed context and the prompt.
+        """
+        if not (prompt and self.use_cache and self.stateless):
+            return None
+        return RESPONSE_CACHE.make_key(
+            self.provider.value, self.model_config['name'], self.context_fingerprint(), prompt
+        )
+
+    def set_item_listener(self, listener: Optional[Callable[[Optional[str], Any], None]]):
+        """Receive each completed array element of streamed JSON responses, e.g. to forward it to a status stream"""
+        self.item_listener = listener
+        if self._delegate:
+            self._delegate.set_item_listener(listener)
+        return self
+
+    def isolated(self) -> "LLMWrapper":
+        """A wrapper whose requests do not affect this conversation: itself when stateless, otherwise a fork"""
+        return self if self.stateless else self.fork()
+
+    def stream_response(self, prompt: str, validate: Optional[Callable[[str], bool]] = None) -> CompletionStream:
+        """
+        Streaming variant of get_response. The request is budgeted and sent once the
+        returned stream is iterated; history is updated after it has been fully consumed.
+        """
+        if self._delegate:
+            return self._delegate.stream_response(prompt, validate)
+        stream = CompletionStream()
+        cache_key = self._cache_key(prompt)
+        if cache_key:
+            cached = RESPONSE_CACHE.get(cache_key)
+            if cached is not None and (validate is None or validate(cached)):
+                logger.info(f"💾 Serving cached {self.model_config['name']} response")
+                stream._deltas = iter([cached])
+                return stream
+
+        llm = self._budget_request(prompt)
+        if llm is not self:
+            return llm.stream_response(prompt, validate)
+        stream._deltas = self._run_stream(prompt, stream, cache_key, validate)
+        return stream
+
+    def _open_stream(self, prompt: str, stream: CompletionStream) -> Iterator[str]:
+        """Start a streamed completion and yield its text deltas, setting stream.truncated and stream.total_tokens"""
+        raise NotImplementedError
+
+    def _user_message(self, prompt: str) -> Dict:
+        return {"role": "user", "content": prompt}
+
+    def _finish_stream(self, prompt: str, stream: CompletionStream) -> None:
+        """Add a fully streamed prompt/answer pair to the history unless stateless"""
+        if self.stateless:
+            return
+        user_message = self._user_message(prompt)
+        assistant_message = {"role": "assistant", "content": stream.text}
+        self.messages.extend([user_message, assistant_message])
+        self._record_exchange(prompt, stream.text, (user_message, assistant_message))
+
+    def _run_stream(self, prompt: str, stream: CompletionStream, cache_key: Optional[str] = None,
+                    validate: Optional[Callable[[str], bool]] = None) -> Iterator[str]:
+        """
+        Stream a completion under the rate limiter and concurrency controller. A 429 is
+        retried only before the first delta; once text has been delivered errors propagate.
+        """
+        estimated_tokens = self._estimate_request_tokens(prompt)
+        for attempt in range(Config.LLM_MAX_RETRIES + 1):
+            if self.rate_limiter:
+                self.rate_limiter.acquire(estimated_tokens)
+            delivered = False
+            try:
+                with self.concurrency.slot() if self.concurrency else nullcontext():
+                    started = time.monotonic()
+                    for delta in self._open_stream(prompt, stream):
+                        if delta:
+                            delivered = True
+                            yield delta
+                    latency = time.monotonic() - started
+            except Exception as e:
+                if delivered:
+                    logger.error(f"❌ {self.provider.value} stream failed after {len(stream.text)} characters: {str(e)}")
+                    raise
+                self._handle_rate_limit(e, attempt)
+                continue
+
+            if self.concurrency:
+                self.concurrency.on_success(latency, self._request_class(estimated_tokens))
+            if self.rate_limiter and stream.total_tokens is not None:
+                self.rate_limiter.record_usage(estimated_tokens, stream.total_tokens)
+            self._store_response(prompt, stream.text, stream.truncated, cache_key, validate)
+            self._finish_stream(prompt, stream)
+            return
+
+    def _handle_rate_limit(self, error: Exception, attempt: int) -> None:
+        """Re-raise errors that should not be retried; otherwise back off before the next attempt"""
+        if not is_rate_limit_error(error):
+            raise error
+        retry_after = get_retry_after(error)
+        # Every 429 shrinks the concurrency limit, including the one that exhausts the retries
+        if self.concurrency:
+            self.concurrency.on_rate_limited(retry_after)
+        if attempt == Config.LLM_MAX_RETRIES:
+            logger.error(f"❌ {self.provider.value} still rate limited after {Config.LLM_MAX_RETRIES} retries")
+            raise error
+        logger.warning(f"⏳ {self.provider.value} rate limited, retry {attempt + 1}/{Config.LLM_MAX_RETRIES}")
+        # The controller holds new requests for retry-after; otherwise back off here
+        if retry_after is None or not self.concurrency:
+            time.sleep(retry_after or 2 ** attempt)
+
+    def _request_class(self, estimated_tokens: int) -> str:
+        """
+        Latency class of a request: the model and the power-of-two size bucket of its
+        estimated tokens, so only requests of comparable size are compared for congestion
+        """
+        return f"{self.model_config['name']}:{max(0, int(estimated_tokens)).bit_length()}"
+
+    def _call_provider(self, estimated_tokens: int, request: Callable[[], Any],
+                       usage: Callable[[Any], int] = None) -> Any:
+        """
+        Run a provider API call under the shared rate limiter and adaptive concurrency
+        controller, retrying when the provider answers 429.
+
+        Args:
+            estimated_tokens: Tokens to reserve from the rate limiter
+            request: Performs the API call and returns its response
+            usage: Extracts the provider-reported total tokens from the response
+        """
+        for attempt in range(Config.LLM_MAX_RETRIES + 1):
+            if self.rate_limiter:
+                self.rate_limiter.acquire(estimated_tokens)
+            try:
+                with self.concurrency.slot() if self.concurrency else nullcontext():
+                    started = time.monotonic()
+                    response = request()
+                    latency = time.monotonic() - started
+            except Exception as e:
+                self._handle_rate_limit(e, attempt)
+                continue
+
+            if self.concurrency:
+                self.concurrency.on_success(latency, self._request_class(estimated_tokens))
+            if self.rate_limiter and usage:
+                actual_tokens = usage(response)
+                if actual_tokens is not None:
+                    self.rate_limiter.record_usage(estimated_tokens, actual_tokens)
+            return response
+
+    @property
+    def context_limit(self) -> int:
+        return self.model_config['context_limit']
+
+    def _estimate_document_tokens(self, documents: DocumentSet) -> int:
+        """Estimated tokens of a document set as this wrapper sends it"""
+        return estimate_document_tokens(documents)
+
+    def history_tokens(self) -> int:
+        return sum(tokens for tokens, _ in self.exchanges)
+
+    def _estimate_request_tokens(self, prompt: str) -> int:
+        """Estimated input plus worst-case output tokens for a request with this prompt"""
+        return self.context_tokens + self.history_tokens() + estimate_tokens(prompt) + self.model_config['max_tokens']
+
+    def fits_context(self, prompt_tokens: int = 0) -> bool:
+        """Whether the documents and JSON context plus a prompt of this size fit a fresh conversation"""
+        return self.context_tokens + prompt_tokens + self.model_config['max_tokens'] <= self.context_limit
+
+    def _record_exchange(self, prompt: str, response_text: str, handle: Any) -> None:
+        """Track a prompt/answer pair so it can be trimmed when the context window fills up"""
+        self.exchanges.append((estimate_tokens(prompt) + estimate_tokens(response_text), handle))
+
+    def _remove_exchange(self, handle: Any) -> None:
+        """Drop a recorded prompt/answer pair from the conversation history"""
+        user_message, assistant_message = handle
+        self.messages = [m for m in self.messages if m is not user_message and m is not assistant_message]
+
+    def _budget_request(self, prompt: str) -> "LLMWrapper":
+        """
+        Make sure a request fits the context window before any round trip: drop the
+        oldest prompt/answer exchanges first, then hand over to a larger-context model.
+        Returns the wrapper that should serve the request.
+        """
+        with self._budget_lock:
+            if self._delegate:
+                return self._delegate
+
+            required = self._estimate_request_tokens(prompt)
+            while required > self.context_limit and self.exchanges:
+                tokens, handle = self.exchanges.pop(0)
+                self._remove_exchange(handle)
+                required -= tokens
+                logger.warning(f"✂️ Trimmed {tokens} tokens of history to fit {self.context_limit} token context")
+            if required <= self.context_limit:
+                return self
+
+            self._delegate = self._larger_context_llm(required - self.model_config['max_tokens'])
+            if self._delegate:
+                return self._delegate
+            raise ContextBudgetExceeded(required, self.context_limit)
+
+    def _larger_context_llm(self, input_tokens: int) -> Optional["LLMWrapper"]:
+        """A wrapper seeded with this context on a model whose window fits input_tokens, if any"""
+        candidates = [(self.provider, model_type) for model_type in ModelType if model_type != self.model_type]
+        overflow_provider = Config.get_context_overflow_provider()
+        if overflow_provider and overflow_provider != self.provider:
+            candidates += [(overflow_provider, self.model_type)]
+            candidates += [(overflow_provider, model_type) for model_type in ModelType if model_type != self.model_type]
+
+        for provider, model_type in candidates:
+            model_config = Config.get_model_config(provider, model_type)
+            if input_tokens + model_config['max_tokens'] <= model_config['context_limit']:
+                logger.warning(
+                    f"📏 ~{input_tokens} tokens exceed {self.model_config['name']} context; "
+                    f"routing to {model_config['name']}"
+                )
+                llm = LLMFactory.create_llm(provider, model_type, stateless=self.stateless)
+                llm.set_cache(self.use_cache).set_item_listener(self.item_listener)
+                return self._seed(llm)
+        return None
+
+    def _seed(self, llm: "LLMWrapper", include_documents: bool = True) -> "LLMWrapper":
+        """Replay this wrapper's PDFs and JSON context into another wrapper"""
+        for source_type, source in self.context_sources:
+            if source_type == "documents":
+                if include_documents:
+                    llm.add_documents(source)
+            else:
+                llm.add_json(source)
+        return llm
+
+    def fork(self, include_documents: bool = True) -> "LLMWrapper":
+        """
+        Create a fresh conversation on the same model, seeded with the same JSON context
+        and, unless include_documents is False, the same PDFs
+        """
+        if self._delegate:
+            return self._delegate.fork(include_documents)
+        llm = self.__class__(self.model_type).set_stateless(self.stateless).set_cache(self.use_cache)
+        llm.set_item_listener(self.item_listener)
+        return self._seed(llm, include_documents)
+
 class AnthropicWrapper(LLMWrapper):
+    provider = LLMProvider.ANTHROPIC
+
     def __init__(self, model_type: ModelType = None):
         super().__init__(model_type)
-        self.model = Anthropic(api_key=Config.ANTHROPIC_API_KEY)
+        self.model = get_provider_client(LLMProvider.ANTHROPIC)
         self.model_config = Config.get_model_config(LLMProvider.ANTHROPIC, model_type)
+        self._context_messages = []
         logger.info(f"🤖 Initialized Anthropic wrapper with {self.model_config['name']}")
 
-    def add_pdf(self, file_path: str) -> None:
+    def _add_documents(self, documents: DocumentSet) -> None:
         try:
-            with open(file_path, 'rb') as file:
-                pdf_data = base64.b64encode(file.read()).decode('utf-8')
-                self.messages.append({
-                    "role": "user",
-                    "content": [{
+            # One document block per original file; page ranges are sent as their extracted text
+            content = []
+            for part in documents.parts:
+                if part.whole_file:
+                    with open(part.path, 'rb') as file:
+                        pdf_data = base64.b64encode(file.read()).decode('utf-8')
+                    content.append({
                         "type": "document",
+                        "title": part.name,
                         "source": {
                             "type": "base64",
                             "media_type": "application/pdf",
                             "data": pdf_data
                         }
-                    }]
-                })
-            logger.info("📄 Added PDF to conversation")
+                    })
+                else:
+                    content.append({"type": "text", "text": f"PDF content ({part.label}):\n{part.get_text()}"})
+            message = {"role": "user", "content": content}
+            self.messages.append(message)
+            self._context_messages.append(message)
+            self.context_sources.append(("documents", documents))
+            self.context_tokens += self._estimate_document_tokens(documents)
+            logger.info(f"📄 Added {len(documents)} PDF(s) to conversation")
         except Exception as e:
             logger.error(f"Error adding PDF: {str(e)}")
             raise
 
-    def add_json(self, data: dict) -> None:
+    def _add_json(self, data: dict) -> None:
         try:
-            self.messages.append({
+            message = {
                 "role": "user",
                 "content": [{
                     "type": "text",
                     "text": f"JSON content:\n{json.dumps(data, indent=2)}"
                 }]
-            })
+            }
+            self.messages.append(message)
+            self._context_messages.append(message)
+            self.context_sources.append(("json", data))
+            self.context_tokens += estimate_json_tokens(data)
             logger.info("📄 Added JSON to conversation")
         except Exception as e:
             logger.error(f"Error adding JSON: {str(e)}")
             raise
 
-    def get_response(self, prompt: str) -> str:
+    def _estimate_document_tokens(self, documents: DocumentSet) -> int:
+        # PDFs are sent as native documents, billed as text plus an image per page
+        return estimate_document_tokens(documents, include_page_images=True)
+
+    def _request_messages(self, conversation: List[Dict]) -> List[Dict]:
+        """
+        Messages to send, with cache breakpoints after the shared document/JSON prefix and
+        after the latest prompt. Breakpoints are applied to copies so the stored history,
+        and therefore the cached prefix, stays byte-identical across calls and forks.
+        """
+        if not Config.ANTHROPIC_PROMPT_CACHING:
+            return conversation
+        breakpoints = {id(conversation[-1])}
+        if self._context_messages:
+            breakpoints.add(id(self._context_messages[-1]))
+
+        messages = []
+        for message in conversation:
+            if id(message) in breakpoints and isinstance(message["content"], list):
+                content = list(message["content"])
+                content[-1] = {**content[-1], "cache_control": {"type": "ephemeral"}}
+                message = {**message, "content": content}
+            messages.append(message)
+        return messages
+
+    def _user_message(self, prompt: str) -> Dict:
+        return {
+            "role": "user",
+            "content": [{"type": "text", "text": prompt}]
+        }
+
+    def _usage_tokens(self, usage: Any) -> int:
+        # Cache reads do not count against Anthropic's input token rate limit
+        return (usage.input_tokens + usage.output_tokens
+                + (getattr(usage, "cache_creation_input_tokens", None) or 0))
+
+    def _open_stream(self, prompt: str, stream: CompletionStream) -> Iterator[str]:
+        conversation = self.messages + [self._user_message(prompt)]
+        with self.model.messages.stream(
+            model=self.model_config['name'],
+            messages=self._request_messages(conversation),
+            max_tokens=self.model_config['max_tokens'],
+            temperature=Config.TEMPERATURE
+        ) as response:
+            for text in response.text_stream:
+                yield text
+            final = response.get_final_message()
+        self._record_cache_usage(final.usage)
+        stream.truncated = final.stop_reason == "max_tokens"
+        stream.total_tokens = self._usage_tokens(final.usage)
+
+    def _record_cache_usage(self, usage: Any) -> None:
+        cache_read = getattr(usage, "cache_read_input_tokens", None) or 0
+        cache_creation = getattr(usage, "cache_creation_input_tokens", None) or 0
+        self.usage["input_tokens"] += usage.input_tokens
+        self.usage["output_tokens"] += usage.output_tokens
+        self.usage["cache_read_input_tokens"] += cache_read
+        self.usage["cache_creation_input_tokens"] += cache_creation
+        logger.info(
+            f"🗄️ Prompt cache: {cache_read} tokens read, {cache_creation} written, "
+            f"{usage.input_tokens} uncached input"
+        )
+
+    def _get_response(self, prompt: str) -> Tuple[str, bool]:
         try:
-            if not prompt:
-                return ""
+            user_message = self._user_message(prompt)
+            conversation = self.messages + [user_message]
             
-            self.messages.append({
-                "role": "user",
-                "content": [{"type": "text", "text": prompt}]
-            })
-            
-            result = self.model.messages.create(
-                model=self.model_config['name'],
-                messages=self.messages,
-                max_tokens=self.model_config['max_tokens'],
-                temperature=Config.TEMPERATURE
+            result = self._call_provider(
+                self._estimate_request_tokens(prompt),
+                lambda: self.model.messages.create(
+                    model=self.model_config['name'],
+                    messages=self._request_messages(conversation),
+                    max_tokens=self.model_config['max_tokens'],
+                    temperature=Config.TEMPERATURE
+                ),
+                lambda result: self._usage_tokens(result.usage)
             )
+            self._record_cache_usage(result.usage)
             
             response_text = result.content[0].text
-            self.messages.append({
-                "role": "assistant",
-                "content": response_text
-            })
+            if not self.stateless:
+                assistant_message = {
+                    "role": "assistant",
+                    "content": response_text
+                }
+                self.messages.extend([user_message, assistant_message])
+                self._record_exchange(prompt, response_text, (user_message, assistant_message))
             
-            return response_text
+            return response_text, result.stop_reason == "max_tokens"
             
         except Exception as e:
             logger.error(f"❌ Error from Anthropic: {str(e)}")
             raise
 
 class GoogleWrapper(LLMWrapper):
+    provider = LLMProvider.GOOGLE
+
     def __init__(self, model_type: ModelType = None):
         super().__init__(model_type)
-        genai.configure(api_key=Config.GOOGLE_API_KEY)
+        genai = get_provider_client(LLMProvider.GOOGLE)
         self.model_config = Config.get_model_config(LLMProvider.GOOGLE, model_type)
         self.model = genai.GenerativeModel(self.model_config['name'])
         self.chat = self.model.start_chat()
-        self.rate_limiter = RATE_LIMITERS["google"]
+        self._request_options = {"timeout": Config.PROVIDER_REQUEST_TIMEOUT_SECONDS}
         logger.info(f"🤖 Initialized Google wrapper with {self.model_config['name']}")
 
-    def add_pdf(self, file_path: str) -> None:
+    def _append_context(self, text: str) -> None:
+        """
+        Add context to the chat history locally; it is sent with the next prompt, so the
+        context budget is checked before any round trip
+        """
+        self.chat.history = list(self.chat.history) + [
+            {"role": "user", "parts": [text]},
+            {"role": "model", "parts": ["Received."]}
+        ]
+
+    def _add_documents(self, documents: DocumentSet) -> None:
         try:
-            content = ""
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                for page in pdf_reader.pages:
-                    content += page.extract_text() + "\n\n"
+            content = documents.get_text()
             
-            self.chat.send_message(f"PDF content:\n{content}")
-            logger.info("📄 Added PDF to conversation")
+            self._append_context(f"PDF content:\n{content}")
+            self.context_sources.append(("documents", documents))
+            self.context_tokens += estimate_tokens(content)
+            logger.info(f"📄 Added {len(documents)} PDF(s) to conversation")
         except Exception as e:
             logger.error(f"Error adding PDF: {str(e)}")
             raise
 
-    def add_json(self, data: dict) -> None:
+    def _add_json(self, data: dict) -> None:
         try:
-            self.chat.send_message(
-                f"JSON content:\n{json.dumps(data, indent=2)}"
-            )
+            self._append_context(f"JSON content:\n{json.dumps(data, indent=2)}")
+            self.context_sources.append(("json", data))
+            self.context_tokens += estimate_json_tokens(data)
             logger.info("📄 Added JSON to conversation")
         except Exception as e:
             logger.error(f"Error adding JSON: {str(e)}")
             raise
 
-    def get_response(self, prompt: str) -> str:
+    def _last_exchange(self) -> Tuple[Any, Any]:
+        history = self.chat.history
+        return history[-2], history[-1]
+
+    def _remove_exchange(self, handle: Any) -> None:
+        history = list(self.chat.history)
+        for i in range(len(history) - 1):
+            if (history[i], history[i + 1]) == handle:
+                del history[i:i + 2]
+                break
+        self.chat.history = history
+
+    def _send(self, prompt: str, contents: Optional[List[Any]] = None) -> Any:
+        """Send a prompt on the chat, or after the given contents without touching the chat"""
+        if contents is None:
+            request = lambda: self.chat.send_message(prompt, request_options=self._request_options)
+        else:
+            request = lambda: self.model.generate_content(
+                contents + [{"role": "user", "parts": [prompt]}],
+                request_options=self._request_options
+            )
+        return self._call_provider(self._estimate_request_tokens(prompt), request, self._usage_tokens)
+
+    def _usage_tokens(self, response: Any) -> int:
+        usage = getattr(response, "usage_metadata", None)
+        return getattr(usage, "total_token_count", None)
+
+    def _stopped_at_limit(self, response: Any) -> bool:
+        candidates = getattr(response, "candidates", None)
+        if not candidates:
+            return False
+        finish_reason = candidates[0].finish_reason
+        return getattr(finish_reason, "name", finish_reason) == "MAX_TOKENS"
+
+    def _is_truncated(self, response: Any) -> bool:
+        """Whether the answer hit the output token limit or left a JSON value unfinished"""
+        if self._stopped_at_limit(response):
+            return True
+        parser = IncrementalJsonParser()
+        parser.feed(response.text)
+        return parser.started and not parser.complete
+
+    def _open_stream(self, prompt: str, stream: CompletionStream) -> Iterator[str]:
+        if self.stateless:
+            response = self.model.generate_content(
+                list(self.chat.history) + [{"role": "user", "parts": [prompt]}],
+                stream=True,
+                request_options=self._request_options
+            )
+        else:
+            response = self.chat.send_message(prompt, stream=True, request_options=self._request_options)
+        for chunk in response:
+            if chunk.parts:
+                yield chunk.text
+            if self._stopped_at_limit(chunk):
+                stream.truncated = True
+        stream.total_tokens = self._usage_tokens(response)
+
+    def _finish_stream(self, prompt: str, stream: CompletionStream) -> None:
+        # The chat session appends streamed exchanges to its history itself
+        if not self.stateless:
+            self._record_exchange(prompt, stream.text, self._last_exchange())
+
+    def _get_response(self, prompt: str) -> Tuple[str, bool]:
         try:
-            if not prompt:
-                return ""
-            
-            response = self.chat.send_message(prompt)
+            # Stateless requests are sent after a snapshot of the context instead of on the chat
+            contents = list(self.chat.history) if self.stateless else None
+            response = self._send(prompt, contents)
             response_text = response.text
+            if contents is None:
+                self._record_exchange(prompt, response_text, self._last_exchange())
             
-            if response_text.count('{') != response_text.count('}'):
-                logger.warning("⚠️ Incomplete JSON detected, requesting completion")
-                completion = self.chat.send_message(
-                    "Please complete the JSON response. Return ONLY the complete JSON."
-                )
+            truncated = self._is_truncated(response)
+            if truncated:
+                logger.warning("⚠️ Truncated response detected, requesting completion")
+                completion_prompt = "Please complete the JSON response. Return ONLY the complete JSON."
+                if contents is not None:
+                    contents += [{"role": "user", "parts": [prompt]}, response.candidates[0].content]
+                completion = self._send(completion_prompt, contents)
                 response_text = completion.text
+                truncated = self._is_truncated(completion)
+                if contents is None:
+                    self._record_exchange(completion_prompt, response_text, self._last_exchange())
             
-            return response_text
+            return response_text, truncated
             
         except Exception as e:
             logger.error(f"❌ Error from Google: {str(e)}")
             raise
 
 class OpenAIWrapper(LLMWrapper):
+    provider = LLMProvider.OPENAI
+
     def __init__(self, model_type: ModelType = None):
         super().__init__(model_type)
-        self.client = OpenAI(api_key=Config.OPENAI_API_KEY)
+        self.client = get_provider_client(LLMProvider.OPENAI)
         self.model_config = Config.get_model_config(LLMProvider.OPENAI, model_type)
-        self.rate_limiter = RATE_LIMITERS["openai"]
         logger.info(f"🤖 Initialized OpenAI wrapper with {self.model_config['name']}")
 
-    def add_pdf(self, file_path: str) -> None:
+    def _add_documents(self, documents: DocumentSet) -> None:
         try:
-            content = ""
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                for page in pdf_reader.pages:
-                    content += page.extract_text() + "\n\n"
+            content = documents.get_text()
             
             self.messages.append({
                 "role": "user",
                 "content": f"PDF content:\n{content}"
             })
-            logger.info("📄 Added PDF to conversation")
+            self.context_sources.append(("documents", documents))
+            self.context_tokens += estimate_tokens(content)
+            logger.info(f"📄 Added {len(documents)} PDF(s) to conversation")
         except Exception as e:
             logger.error(f"Error adding PDF: {str(e)}")
             raise
 
-    def add_json(self, data: dict) -> None:
+    def _add_json(self, data: dict) -> None:
         try:
             self.messages.append({
                 "role": "user",
                 "content": f"JSON content:\n{json.dumps(data, indent=2)}"
             })
+            self.context_sources.append(("json", data))
+            self.context_tokens += estimate_json_tokens(data)
             logger.info("📄 Added JSON to conversation")
         except Exception as e:
             logger.error(f"Error adding JSON: {str(e)}")
             raise
 
-    def get_response(self, prompt: str) -> str:
+    def _open_stream(self, prompt: str, stream: CompletionStream) -> Iterator[str]:
+        response = self.client.chat.completions.create(
+            model=self.model_config['name'],
+            messages=self.messages + [self._user_message(prompt)],
+            max_completion_tokens=self.model_config['max_tokens'],
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        for chunk in response:
+            if chunk.usage:
+                stream.total_tokens = chunk.usage.total_tokens
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            if choice.delta.content:
+                yield choice.delta.content
+            if choice.finish_reason:
+                stream.truncated = choice.finish_reason == "length"
+
+    def _get_response(self, prompt: str) -> Tuple[str, bool]:
         try:
-            if not prompt:
-                return ""
-            
-            self.messages.append({
-                "role": "user",
-                "content": prompt
-            })
+            user_message = self._user_message(prompt)
+            conversation = self.messages + [user_message]
             
-            response = self.client.chat.completions.create(
-                model=self.model_config['name'],
-                messages=self.messages,
-                max_completion_tokens=self.model_config['max_tokens'],
+            response = self._call_provider(
+                self._estimate_request_tokens(prompt),
+                lambda: self.client.chat.completions.create(
+                    model=self.model_config['name'],
+                    messages=conversation,
+                    max_completion_tokens=self.model_config['max_tokens'],
+                ),
+                lambda response: response.usage.total_tokens if response.usage else None
             )
             
             response_text = response.choices[0].message.content
-            self.messages.append({
-                "role": "assistant",
-                "content": response_text
-            })
+            if not self.stateless:
+                assistant_message = {
+                    "role": "assistant",
+                    "content": response_text
+                }
+                self.messages.extend([user_message, assistant_message])
+                self._record_exchange(prompt, response_text, (user_message, assistant_message))
             
-            return response_text
+            return response_text, response.choices[0].finish_reason == "length"
             
         except Exception as e:
             logger.error(f"❌ Error from OpenAI: {str(e)}")
             raise
 
 class MistralWrapper(LLMWrapper):
+    provider = LLMProvider.MISTRAL
+
     def __init__(self, model_type: ModelType = None):
         super().__init__(model_type)
-        self.client = Mistral(api_key=Config.MISTRAL_API_KEY)
+        self.client = get_provider_client(LLMProvider.MISTRAL)
         self.model_config = Config.get_model_config(LLMProvider.MISTRAL, model_type)
-        self.rate_limiter = RATE_LIMITERS.get("mistral", None)
+        self._uploads: Dict[str, Tuple[str, str]] = {}  # file_id -> (path, content hash) referenced by messages
         logger.info(f"🤖 Initialized Mistral wrapper with {self.model_config['name']}")
         
-    def add_pdf(self, file_path: str) -> None:
+    def _upload_pdf(self, file_path: str) -> str:
+        """Upload a PDF with Mistral's file upload API, streaming it from disk"""
+        file_name = os.path.basename(file_path)
+        
+        def upload():
+            with open(file_path, "rb") as file:
+                return self.client.files.upload(
+                    file={
+                        "file_name": file_name,
+                        "content": file,
+                    },
+                    purpose="ocr"
+                )
+        
+        uploaded_file = self._call_provider(0, upload)
+        logger.info(f"📤 Uploaded {file_name} to Mistral as {uploaded_file.id}")
+        return uploaded_file.id
+
+    def _add_documents(self, documents: DocumentSet) -> None:
         try:
-            content = ""
-            # Get the filename from the path
-            file_name = os.path.basename(file_path)
+            content = [{"type": "text", "text": "Pdf Content:"}]
+            for part in documents.parts:
+                if part.whole_file:
+                    # Reuse an earlier upload of the same content when there is one
+                    file_id = MISTRAL_FILE_REGISTRY.get_or_upload(part.path, self._upload_pdf, part.content_hash)
+                    self._uploads[file_id] = (part.path, part.content_hash)
+                    content.append({"type": "file", "file_id": file_id})
+                else:
+                    content.append({"type": "text", "text": f"PDF content ({part.label}):\n{part.get_text()}"})
             
-            # Upload the PDF file using Mistral's file upload API
-            uploaded_file = self.client.files.upload(
-                file={
-                    "file_name": file_name,
-                    "content": open(file_path, "rb"),
-                },
-                purpose="ocr"
-            )
-            
-            # Add a message referencing the uploaded file
+            # Add a message referencing the uploaded files
             self.messages.append({
                 "role": "user",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": "Pdf Content:"
-                    },
-                    {
-                        "type": "file",
-                        "file_id": uploaded_file.id
-                    }
-                ]
+                "content": content
             })
-            logger.info("📄 Added PDF to conversation")
+            self.context_sources.append(("documents", documents))
+            self.context_tokens += self._estimate_document_tokens(documents)
+            logger.info(f"📄 Added {len(documents)} PDF(s) to conversation")
         except Exception as e:
             logger.error(f"Error adding PDF: {str(e)}")
             raise
 
-    def add_json(self, data: dict) -> None:
+    def _add_json(self, data: dict) -> None:
         try:
             self.messages.append({
                 "role": "user", 
                 "content": f"JSON content:\n{json.dumps(data, indent=2)}"
             })
+            self.context_sources.append(("json", data))
+            self.context_tokens += estimate_json_tokens(data)
             logger.info("📄 Added JSON to conversation")
         except Exception as e:
             logger.error(f"Error adding JSON: {str(e)}")
             raise
 
-    def get_response(self, prompt: str) -> str:
+    def _is_missing_file(self, error: Exception) -> bool:
+        """
+        Whether the provider rejected a request because a referenced upload is gone. The error
+        must say so about a file: other 404s (unknown model, wrong endpoint) are not retried.
+        """
+        if not self._uploads:
+            return False
+        status = get_status_code(error)
+        if status is not None and not 400 <= status < 500:
+            return False
+        details = f"{error} {getattr(error, 'body', None) or ''}"
+        return bool(MISSING_FILE_PATTERN.search(details))
+
+    def _refresh_uploads(self) -> None:
+        """Re-upload every referenced file and point the conversation at the new file_ids"""
+        replacements = {}
+        for file_id, (path, content_hash) in list(self._uploads.items()):
+            MISTRAL_FILE_REGISTRY.invalidate(content_hash, file_id)
+            new_id = MISTRAL_FILE_REGISTRY.get_or_upload(path, self._upload_pdf, content_hash)
+            replacements[file_id] = new_id
+            del self._uploads[file_id]
+            self._uploads[new_id] = (path, content_hash)
+        for message in self.messages:
+            if isinstance(message["content"], list):
+                for block in message["content"]:
+                    if block.get("type") == "file" and block["file_id"] in replacements:
+                        block["file_id"] = replacements[block["file_id"]]
+
+    def _with_fresh_uploads(self, request: Callable[[], Any]) -> Any:
+        """Run a request, re-uploading the documents and retrying once if Mistral no longer has them"""
         try:
-            if not prompt:
-                return ""
-                
+            return request()
+        except Exception as e:
+            if not self._is_missing_file(e):
+                raise
+            logger.warning(f"♻️ Mistral upload missing ({str(e)}), re-uploading documents")
+            self._refresh_uploads()
+            return request()
+
+    def _run_stream(self, prompt: str, stream: CompletionStream, cache_key: Optional[str] = None,
+                    validate: Optional[Callable[[str], bool]] = None) -> Iterator[str]:
+        # Re-upload outside the concurrency slot the stream holds
+        try:
+            yield from super()._run_stream(prompt, stream, cache_key, validate)
+        except Exception as e:
+            if stream.text or not self._is_missing_file(e):
+                raise
+            logger.warning(f"♻️ Mistral upload missing ({str(e)}), re-uploading documents")
+            self._refresh_uploads()
+            yield from super()._run_stream(prompt, stream, cache_key, validate)
+
+    def _open_stream(self, prompt: str, stream: CompletionStream) -> Iterator[str]:
+        with self.client.chat.stream(
+            model=self.model_config['name'],
+            messages=self.messages + [self._user_message(prompt)],
+            max_tokens=self.model_config['max_tokens'],
+            temperature=Config.TEMPERATURE
+        ) as events:
+            for event in events:
+                chunk = event.data
+                if chunk.usage:
+                    stream.total_tokens = chunk.usage.total_tokens
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                if isinstance(choice.delta.content, str) and choice.delta.content:
+                    yield choice.delta.content
+                if choice.finish_reason:
+                    stream.truncated = choice.finish_reason == "length"
+
+    def _get_response(self, prompt: str) -> Tuple[str, bool]:
+        try:
+            user_message = self._user_message(prompt)
+            
+            response = self._with_fresh_uploads(lambda: self._call_provider(
+                self._estimate_request_tokens(prompt),
+                lambda: self.client.chat.complete(
+                    model=self.model_config['name'],
+                    messages=self.messages + [user_message],
+                    max_tokens=self.model_config['max_tokens'],
+                    temperature=Config.TEMPERATURE
+                ),
+                lambda response: response.usage.total_tokens if response.usage else None
+            ))
+            
+            response_text = response.choices[0].message.content
+            if not self.stateless:
+                assistant_message = {
+                    "role": "assistant",
+                    "content": response_text
+                }
+                self.messages.extend([user_message, assistant_message])
+                self._record_exchange(prompt, response_text, (user_message, assistant_message))
+            
+            return response_text, response.choices[0].finish_reason == "length"
+            
+        except Exception as e:
+            logger.error(f"❌ Error from Mistral: {str(e)}")
+            raise
+
+class FakeWrapper(LLMWrapper):
+    """
+    Wrapper around the offline fake provider. PDFs are sent as extracted text, so the
+    text extraction, budgeting, rate limiting and retry paths run as they do for real providers.
+    """
+    provider = LLMProvider.FAKE
+
+    def __init__(self, model_type: ModelType = None):
+        super().__init__(model_type)
+        self.client = get_provider_client(LLMProvider.FAKE)
+        self.model_config = Config.get_model_config(LLMProvider.FAKE, model_type)
+        logger.info(f"🤖 Initialized fake wrapper with {self.model_config['name']}")
+
+    def _add_documents(self, documents: DocumentSet) -> None:
+        try:
+            content = documents.get_text()
+            
             self.messages.append({
                 "role": "user",
-                "content": prompt
+                "content": f"PDF content:\n{content}"
             })
+            self.context_sources.append(("documents", documents))
+            self.context_tokens += estimate_tokens(content)
+            logger.info(f"📄 Added {len(documents)} PDF(s) to conversation")
+        except Exception as e:
+            logger.error(f"Error adding PDF: {str(e)}")
+            raise
+
+    def _add_json(self, data: dict) -> None:
+        try:
+            self.messages.append({
+                "role": "user",
+                "content": f"JSON content:\n{json.dumps(data, indent=2)}"
+            })
+            self.context_sources.append(("json", data))
+            self.context_tokens += estimate_json_tokens(data)
+            logger.info("📄 Added JSON to conversation")
+        except Exception as e:
+            logger.error(f"Error adding JSON: {str(e)}")
+            raise
+
+    def _open_stream(self, prompt: str, stream: CompletionStream) -> Iterator[str]:
+        for chunk in self.client.stream(
+            model=self.model_config['name'],
+            messages=self.messages + [self._user_message(prompt)],
+            max_tokens=self.model_config['max_tokens'],
+            context_fingerprint=self.context_fingerprint()
+        ):
+            yield chunk.text
+            if chunk.finish_reason:
+                stream.truncated = chunk.finish_reason == "length"
+                stream.total_tokens = chunk.total_tokens
+
+    def _get_response(self, prompt: str) -> Tuple[str, bool]:
+        try:
+            user_message = self._user_message(prompt)
+            conversation = self.messages + [user_message]
             
-            response = self.client.chat.complete(
-                model=self.model_config['name'],
-                messages=self.messages,
-                max_tokens=self.model_config['max_tokens'],
-                temperature=Config.TEMPERATURE
+            response = self._call_provider(
+                self._estimate_request_tokens(prompt),
+                lambda: self.client.complete(
+                    model=self.model_config['name'],
+                    messages=conversation,
+                    max_tokens=self.model_config['max_tokens'],
+                    context_fingerprint=self.context_fingerprint()
+                ),
+                lambda response: response.total_tokens
             )
             
-            response_text = response.choices[0].message.content
-            self.messages.append({
-                "role": "assistant",
-                "content": response_text
-            })
+            response_text = response.text
+            if not self.stateless:
+                assistant_message = {
+                    "role": "assistant",
+                    "content": response_text
+                }
+                self.messages.extend([user_message, assistant_message])
+                self._record_exchange(prompt, response_text, (user_message, assistant_message))
             
-            return response_text
+            return response_text, response.finish_reason == "length"
             
         except Exception as e:
-            logger.error(f"❌ Error from Mistral: {str(e)}")
+            logger.error(f"❌ Error from fake provider: {str(e)}")
             raise
 
 class LLMFactory:
     @staticmethod
     def create_llm(
         provider: LLMProvider = None,
-        model_type: ModelType = None
+        model_type: ModelType = None,
+        stateless: bool = False,
+        use_cache: bool = True
     ) -> LLMWrapper:
         """
         Factory method that produces wrapped LLM instances
         If model_type not specified, uses DEFAULT_MODEL_TYPE (ANALYSIS) from Config
+        If stateless, tool calls do not accumulate conversation history
+        If use_cache is False, stateless calls bypass the response cache
         """
         provider = provider or Config.DEFAULT_PROVIDER
         model_type = model_type or Config.DEFAULT_MODEL_TYPE
@@ -331,12 +1083,15 @@ class LLMFactory:
         logger.info(f"🏭 Creating new LLM instance for provider: {provider} with model type: {model_type.value}")
         
         if provider == LLMProvider.ANTHROPIC:
-            return AnthropicWrapper(model_type)
+            llm = AnthropicWrapper(model_type)
         elif provider == LLMProvider.GOOGLE:
-            return GoogleWrapper(model_type)
+            llm = GoogleWrapper(model_type)
         elif provider == LLMProvider.OPENAI:
-            return OpenAIWrapper(model_type)
+            llm = OpenAIWrapper(model_type)
         elif provider == LLMProvider.MISTRAL:
-            return MistralWrapper(model_type)
+            llm = MistralWrapper(model_type)
+        elif provider == LLMProvider.FAKE:
+            llm = FakeWrapper(model_type)
         else:
-            raise ValueError(f"Unsupported LLM provider: {provider}")
\ No newline at end of file
+            raise ValueError(f"Unsupported LLM provider: {provider}")
+        return llm.set_stateless(stateless).set_cache(use_cache and Config.RESPONSE_CACHE_ENABLED)
\ No newline at end of file
@@ -0,0 +1,110 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+from app.config import Config
+from app.services.file_hash import compute_file_hash
+
+logger = logging.getLogger(__name__)
+
+class MistralFileRegistry:
+    """
+    SQLite-backed map from PDF content hash to an uploaded Mistral file_id, so the
+    same document is uploaded once and reused by every wrapper and process until
+    the entry expires. Concurrent requests for the same hash in this process wait
+    for a single upload instead of racing.
+    """
+    def __init__(self, db_path: str, ttl_seconds: int):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        # Per-hash upload locks with their number of holders and waiters; removed when unused
+        self._locks: Dict[str, List] = {}
+        self._locks_guard = threading.Lock()
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS mistral_files (
+                    content_hash TEXT PRIMARY KEY,
+                    file_id TEXT NOT NULL,
+                    uploaded_at REAL NOT NULL
+                )
+            """)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _hash_lock(self, content_hash: str) -> Iterator[None]:
+        with self._locks_guard:
+            entry = self._locks.setdefault(content_hash, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._locks_guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[content_hash]
+
+    def get(self, content_hash: str) -> Optional[str]:
+        """Return the file_id uploaded for this content, or None if missing or expired"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT file_id, uploaded_at FROM mistral_files WHERE content_hash = ?",
+                (content_hash,)
+            ).fetchone()
+            if row and time.time() - row[1] > self.ttl_seconds:
+                conn.execute("DELETE FROM mistral_files WHERE content_hash = ?", (content_hash,))
+                row = None
+        return row[0] if row else None
+
+    def put(self, content_hash: str, file_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO mistral_files (content_hash, file_id, uploaded_at) VALUES (?, ?, ?)",
+                (content_hash, file_id, time.time())
+            )
+
+    def invalidate(self, content_hash: str, file_id: Optional[str] = None) -> None:
+        """
+        Forget an upload, e.g. after the provider reports the file is gone. With file_id,
+        only that upload is forgotten, so a replacement another wrapper already made is kept.
+        """
+        with self._connect() as conn:
+            if file_id:
+                conn.execute("DELETE FROM mistral_files WHERE content_hash = ? AND file_id = ?", (content_hash, file_id))
+            else:
+                conn.execute("DELETE FROM mistral_files WHERE content_hash = ?", (content_hash,))
+
+    def get_or_upload(self, file_path: str, upload: Callable[[str], str], content_hash: str = None) -> str:
+        """
+        Return the file_id for file_path, calling upload(file_path) only when this
+        content has not been uploaded within the TTL.
+        """
+        content_hash = content_hash or compute_file_hash(file_path)
+        with self._hash_lock(content_hash):
+            file_id = self.get(content_hash)
+            if file_id:
+                logger.info(f"♻️ Reusing Mistral upload {file_id} for {os.path.basename(file_path)}")
+                return file_id
+            file_id = upload(file_path)
+            self.put(content_hash, file_id)
+            return file_id
+
+# Shared upload registry used by MistralWrapper
+MISTRAL_FILE_REGISTRY = MistralFileRegistry(
+    db_path=Config.MISTRAL_FILE_REGISTRY_PATH,
+    ttl_seconds=Config.MISTRAL_FILE_TTL_SECONDS
+)
@@ -0,0 +1,116 @@
+import os
+import json
+import time
+import logging
+import threading
+from typing import List, Optional
+import PyPDF2
+from app.config import Config
+from app.services.file_hash import compute_file_hash
+
+logger = logging.getLogger(__name__)
+
+class PdfTextCache:
+    """
+    Disk-backed cache of extracted PDF page text keyed by content hash.
+    Entries are evicted least-recently-used first once the cache exceeds max_bytes.
+    """
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _entry_path(self, content_hash: str) -> str:
+        return os.path.join(self.cache_dir, f"{content_hash}.json")
+
+    def _read_entry(self, content_hash: str) -> Optional[List[str]]:
+        entry_path = self._entry_path(content_hash)
+        try:
+            with open(entry_path, 'r', encoding='utf-8') as file:
+                pages = json.load(file)
+            # Touch the entry so eviction sees it as recently used
+            os.utime(entry_path, None)
+            return pages
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable PDF text cache entry {content_hash}: {str(e)}")
+            self._remove_entry(entry_path)
+            return None
+
+    def _write_entry(self, content_hash: str, pages: List[str]) -> None:
+        entry_path = self._entry_path(content_hash)
+        tmp_path = f"{entry_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(pages, file)
+        os.replace(tmp_path, entry_path)
+
+    def _remove_entry(self, entry_path: str) -> None:
+        try:
+            os.remove(entry_path)
+        except OSError:
+            pass
+
+    def _evict_if_needed(self) -> None:
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        entries = []
+        total_bytes = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.json'):
+                continue
+            entry_path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(entry_path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry_path))
+            total_bytes += stat.st_size
+
+        if total_bytes <= self.max_bytes:
+            return
+
+        entries.sort()
+        for _, size, entry_path in entries:
+            if total_bytes <= self.max_bytes:
+                break
+            logger.debug(f"Evicting PDF text cache entry: {entry_path}")
+            self._remove_entry(entry_path)
+            total_bytes -= size
+
+    def _extract_pages(self, file_path: str) -> List[str]:
+        with open(file_path, 'rb') as file:
+            pdf_reader = PyPDF2.PdfReader(file)
+            return [page.extract_text() or "" for page in pdf_reader.pages]
+
+    def get_pages(self, file_path: str, content_hash: str = None) -> List[str]:
+        """Return extracted text for each page, parsing the PDF only on a cache miss"""
+        content_hash = content_hash or compute_file_hash(file_path)
+
+        with self._lock:
+            pages = self._read_entry(content_hash)
+        if pages is not None:
+            logger.info(f"📄 PDF text cache hit for {os.path.basename(file_path)}")
+            return pages
+
+        start_time = time.time()
+        pages = self._extract_pages(file_path)
+        logger.info(f"📄 Extracted {len(pages)} pages from {os.path.basename(file_path)} in {time.time() - start_time:.2f}s")
+
+        with self._lock:
+            try:
+                self._write_entry(content_hash, pages)
+                self._evict_if_needed()
+            except OSError as e:
+                logger.warning(f"Could not write PDF text cache entry: {str(e)}")
+        return pages
+
+    def get_text(self, file_path: str, content_hash: str = None) -> str:
+        """Return the full extracted text of a PDF, pages separated by blank lines"""
+        return "".join(page + "\n\n" for page in self.get_pages(file_path, content_hash))
+
+# Shared cache used by all LLM wrappers
+PDF_TEXT_CACHE = PdfTextCache(
+    cache_dir=Config.PDF_TEXT_CACHE_DIR,
+    max_bytes=Config.PDF_TEXT_CACHE_MAX_BYTES
+)
@@ -0,0 +1,97 @@
+import logging
+import threading
+from typing import Any, Dict
+# Anthropic and OpenAI SDKs run on httpx2; Mistral on httpx. Pool settings must use each SDK's own classes
+import httpx
+import httpx2
+from anthropic import Anthropic, DefaultHttpxClient as AnthropicHttpxClient
+import google.generativeai as genai
+from openai import OpenAI, DefaultHttpxClient as OpenAIHttpxClient
+from mistralai import Mistral
+from app.config import Config, LLMProvider
+from app.services.fake_provider import create_fake_client
+
+logger = logging.getLogger(__name__)
+
+def _pool_options(http: Any) -> Dict[str, Any]:
+    """Connection limits and timeouts built with the given HTTP library (httpx or httpx2)"""
+    return {
+        "limits": http.Limits(
+            max_connections=Config.PROVIDER_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=Config.PROVIDER_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=Config.PROVIDER_HTTP_KEEPALIVE_EXPIRY_SECONDS
+        ),
+        "timeout": http.Timeout(
+            Config.PROVIDER_REQUEST_TIMEOUT_SECONDS,
+            connect=Config.PROVIDER_CONNECT_TIMEOUT_SECONDS
+        )
+    }
+
+class ProviderClients:
+    """
+    Process-wide registry of provider SDK clients. Each provider gets one client with a
+    pooled, keep-alive HTTP transport that every wrapper shares; conversation state
+    stays on the wrappers.
+    """
+    def __init__(self):
+        self._clients: Dict[LLMProvider, Any] = {}
+        self._lock = threading.Lock()
+
+    def get(self, provider: LLMProvider) -> Any:
+        with self._lock:
+            client = self._clients.get(provider)
+            if client is None:
+                client = self._create(provider)
+                self._clients[provider] = client
+                logger.info(f"🔌 Created pooled {provider.value} client")
+            return client
+
+    def _create(self, provider: LLMProvider) -> Any:
+        # SDK-level retries are disabled: LLMWrapper retries 429s itself so every attempt goes
+        # through the shared rate limiter and concurrency controller
+        if provider == LLMProvider.ANTHROPIC:
+            options = _pool_options(httpx2)
+            return Anthropic(
+                api_key=Config.ANTHROPIC_API_KEY,
+                http_client=AnthropicHttpxClient(limits=options["limits"]),
+                timeout=options["timeout"],
+                max_retries=0
+            )
+        elif provider == LLMProvider.OPENAI:
+            options = _pool_options(httpx2)
+            return OpenAI(
+                api_key=Config.OPENAI_API_KEY,
+                http_client=OpenAIHttpxClient(limits=options["limits"]),
+                timeout=options["timeout"],
+                max_retries=0
+            )
+        elif provider == LLMProvider.MISTRAL:
+            return Mistral(
+                api_key=Config.MISTRAL_API_KEY,
+                client=httpx.Client(**_pool_options(httpx)),
+                timeout_ms=int(Config.PROVIDER_REQUEST_TIMEOUT_SECONDS * 1000),
+                retry_config=None
+            )
+        elif provider == LLMProvider.GOOGLE:
+            # The Gemini SDK keeps one module-level client; configure it once per process
+            genai.configure(api_key=Config.GOOGLE_API_KEY)
+            return genai
+        elif provider == LLMProvider.FAKE:
+            return create_fake_client()
+        raise ValueError(f"Unsupported LLM provider: {provider}")
+
+    def close(self) -> None:
+        """Close pooled connections, e.g. at worker shutdown"""
+        with self._lock:
+            for provider, client in self._clients.items():
+                close = getattr(client, "close", None)
+                if callable(close):
+                    close()
+            self._clients.clear()
+
+# Shared clients used by every LLMWrapper
+PROVIDER_CLIENTS = ProviderClients()
+
+def get_provider_client(provider: LLMProvider) -> Any:
+    """Get the shared, pooled SDK client for a provider"""
+    return PROVIDER_CLIENTS.get(provider)
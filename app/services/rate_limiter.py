@@ -1,8 +1,11 @@
+import os
 import time
+import sqlite3
 import logging
-from typing import Dict, Any
+import threading
+from typing import Dict, Optional
 from dataclasses import dataclass
-from datetime import datetime
+from app.config import Config, LLMProvider
 
 logger = logging.getLogger(__name__)
 
@@ -13,70 +16,235 @@ class RateLimitConfig:
     min_request_interval: float = 0.1  # seconds between requests
 
 class RateLimiter:
+    """
+    Thread-safe token-bucket limiter for requests and tokens.
+    Both buckets refill continuously at their per-minute rate up to one minute of burst.
+    """
     def __init__(self, config: RateLimitConfig):
         self.config = config
-        self.last_request_time = 0
-        self.request_count = 0
-        self.token_count = 0
-        self.last_reset = time.time()
-        
-    def _reset_if_needed(self):
-        """Reset counters if minute has elapsed"""
-        current_time = time.time()
-        if current_time - self.last_reset >= 60:
-            logger.debug("Resetting rate limit counters")
-            self.request_count = 0
-            self.token_count = 0
-            self.last_reset = current_time
-    
+        self._request_rate = config.requests_per_minute / 60.0
+        self._token_rate = config.tokens_per_minute / 60.0
+        self._available_requests = float(config.requests_per_minute)
+        self._available_tokens = float(config.tokens_per_minute)
+        self._last_refill = self._now()
+        self.last_request_time = 0.0
+        self._condition = threading.Condition()
+
+    def _now(self) -> float:
+        return time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._last_refill
+        self._available_requests = min(
+            float(self.config.requests_per_minute),
+            self._available_requests + elapsed * self._request_rate
+        )
+        self._available_tokens = min(
+            float(self.config.tokens_per_minute),
+            self._available_tokens + elapsed * self._token_rate
+        )
+        self._last_refill = now
+
+    def _wait_time(self, tokens: int, now: float) -> float:
+        """Seconds until a request of the given size fits in both buckets"""
+        wait = self.config.min_request_interval - (now - self.last_request_time)
+        if self._available_requests < 1:
+            wait = max(wait, (1 - self._available_requests) / self._request_rate)
+        if tokens > self._available_tokens:
+            wait = max(wait, (tokens - self._available_tokens) / self._token_rate)
+        return wait
+
+    def _reserve(self, tokens: int) -> float:
+        """
+        Take one request and tokens from the buckets if they fit.
+        Returns 0 on success, otherwise the seconds to wait before retrying.
+        Caller must hold self._condition.
+        """
+        now = self._now()
+        self._refill(now)
+        wait = self._wait_time(tokens, now)
+        if wait <= 0:
+            self._available_requests -= 1
+            self._available_tokens -= tokens
+            self.last_request_time = now
+            return 0.0
+        return wait
+
+    def _adjust_tokens(self, delta: float) -> None:
+        """Add delta (possibly negative) to the token bucket. Caller must hold self._condition"""
+        self._available_tokens += delta
+
+    def acquire(self, estimated_tokens: int = 0, blocking: bool = True, timeout: Optional[float] = None) -> bool:
+        """
+        Reserve one request and estimated_tokens from the buckets.
+
+        Args:
+            estimated_tokens: Tokens the request is expected to consume
+            blocking: Wait for capacity instead of returning immediately
+            timeout: Maximum seconds to wait when blocking (None waits indefinitely)
+
+        Returns:
+            True if capacity was reserved, False otherwise
+        """
+        # A single request larger than the bucket would never fit; let it drain the bucket instead
+        tokens = min(max(estimated_tokens, 0), self.config.tokens_per_minute)
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self._condition:
+            while True:
+                wait = self._reserve(tokens)
+                if wait <= 0:
+                    return True
+
+                if not blocking:
+                    return False
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    wait = min(wait, remaining)
+
+                if wait >= 1:
+                    logger.info(f"Rate limiting: waiting {wait:.2f}s for capacity")
+                else:
+                    logger.debug(f"Rate limiting: waiting {wait:.2f}s for capacity")
+                self._condition.wait(wait)
+
+    def try_acquire(self, estimated_tokens: int = 0) -> bool:
+        """Non-blocking acquire"""
+        return self.acquire(estimated_tokens, blocking=False)
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """Correct the token bucket once the provider reports actual usage"""
+        if actual_tokens is None:
+            return
+        with self._condition:
+            self._adjust_tokens(min(estimated_tokens, self.config.tokens_per_minute) - actual_tokens)
+            self._condition.notify_all()
+
     def check_limits(self, estimated_tokens: int = 0) -> None:
-        """Check and enforce rate limits"""
-        current_time = time.time()
-        self._reset_if_needed()
-        
-        # Enforce minimum delay between requests
-        time_since_last = current_time - self.last_request_time
-        if time_since_last < self.config.min_request_interval:
-            sleep_time = self.config.min_request_interval - time_since_last
-            logger.debug(f"Rate limiting: Minimum delay sleep for {sleep_time:.2f}s")
-            time.sleep(sleep_time)
-        
-        # Check request limit
-        if self.request_count >= self.config.requests_per_minute:
-            sleep_time = 60 - (current_time - self.last_reset)
-            if sleep_time > 0:
-                logger.info(f"Rate limiting: Request limit reached, sleeping for {sleep_time:.2f}s")
-                time.sleep(sleep_time)
-                self._reset_if_needed()
-        
-        # Check token limit
-        if estimated_tokens > 0 and self.token_count + estimated_tokens > self.config.tokens_per_minute:
-            sleep_time = 60 - (current_time - self.last_reset)
-            if sleep_time > 0:
-                logger.info(f"Rate limiting: Token limit reached, sleeping for {sleep_time:.2f}s")
-                time.sleep(sleep_time)
-                self._reset_if_needed()
-        
-        # Update counters
-        self.request_count += 1
-        self.token_count += estimated_tokens
-        self.last_request_time = time.time()
+        """Check and enforce rate limits, blocking until capacity is available"""
+        self.acquire(estimated_tokens)
 
-# Pre-configured rate limiters for different LLMs
-RATE_LIMITERS = {
-    "claude": RateLimiter(RateLimitConfig(
+class SharedRateLimiter(RateLimiter):
+    """
+    Token-bucket limiter whose bucket state lives in a SQLite database, so every
+    process on the host (gunicorn workers, containers sharing a volume) draws from
+    one provider budget. Each reservation is a BEGIN IMMEDIATE transaction that
+    loads the bucket, applies the same refill/reserve logic and writes it back.
+    Waiters in other processes are not notified, so they retry on their wait timer.
+    """
+    def __init__(self, name: str, config: RateLimitConfig, db_path: str):
+        self.name = name
+        self.db_path = db_path
+        super().__init__(config)
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS rate_limits (
+                    name TEXT PRIMARY KEY,
+                    available_requests REAL NOT NULL,
+                    available_tokens REAL NOT NULL,
+                    last_refill REAL NOT NULL,
+                    last_request_time REAL NOT NULL
+                )
+            """)
+            conn.execute(
+                "INSERT OR IGNORE INTO rate_limits VALUES (?, ?, ?, ?, ?)",
+                (self.name, self._available_requests, self._available_tokens, self._last_refill, 0.0)
+            )
+        finally:
+            conn.close()
+
+    def _now(self) -> float:
+        # Wall clock, since monotonic clocks are not comparable across processes
+        return time.time()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+
+    def _update_state(self, operation) -> float:
+        """Run operation against the shared bucket state inside a write transaction"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT available_requests, available_tokens, last_refill, last_request_time "
+                "FROM rate_limits WHERE name = ?",
+                (self.name,)
+            ).fetchone()
+            if row:
+                (self._available_requests, self._available_tokens,
+                 self._last_refill, self.last_request_time) = row
+            result = operation()
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_limits VALUES (?, ?, ?, ?, ?)",
+                (self.name, self._available_requests, self._available_tokens,
+                 self._last_refill, self.last_request_time)
+            )
+            conn.execute("COMMIT")
+            return result
+        except Exception:
+            # BEGIN IMMEDIATE itself may have failed (e.g. database locked), leaving nothing to roll back
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _reserve(self, tokens: int) -> float:
+        return self._update_state(lambda: super(SharedRateLimiter, self)._reserve(tokens))
+
+    def _adjust_tokens(self, delta: float) -> None:
+        self._update_state(lambda: super(SharedRateLimiter, self)._adjust_tokens(delta))
+
+# Provider quotas shared by every wrapper (and, with the sqlite backend, every process)
+RATE_LIMIT_CONFIGS: Dict[LLMProvider, RateLimitConfig] = {
+    LLMProvider.ANTHROPIC: RateLimitConfig(
         requests_per_minute=5,
         tokens_per_minute=80000,
         min_request_interval=0.5
-    )),
-    "google": RateLimiter(RateLimitConfig(
+    ),
+    LLMProvider.GOOGLE: RateLimitConfig(
         requests_per_minute=60,
         tokens_per_minute=60000,
         min_request_interval=0.1
-    )),
-    "openai": RateLimiter(RateLimitConfig(
+    ),
+    LLMProvider.OPENAI: RateLimitConfig(
         requests_per_minute=200,  # GPT-4 limit
         tokens_per_minute=100000,
         min_request_interval=0.05
-    ))
-} 
\ No newline at end of file
+    ),
+    LLMProvider.MISTRAL: RateLimitConfig(
+        requests_per_minute=60,
+        tokens_per_minute=500000,
+        min_request_interval=0.1
+    ),
+    LLMProvider.FAKE: RateLimitConfig(
+        requests_per_minute=Config.FAKE_LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute=Config.FAKE_LLM_TOKENS_PER_MINUTE,
+        min_request_interval=0
+    )
+}
+
+def create_rate_limiter(provider: LLMProvider, config: RateLimitConfig) -> RateLimiter:
+    """Build a limiter using the backend selected by Config.RATE_LIMIT_BACKEND"""
+    if Config.RATE_LIMIT_BACKEND == "sqlite":
+        return SharedRateLimiter(provider.value, config, Config.RATE_LIMIT_DB_PATH)
+    if Config.RATE_LIMIT_BACKEND != "memory":
+        logger.warning(f"Unknown RATE_LIMIT_BACKEND '{Config.RATE_LIMIT_BACKEND}', using in-memory rate limiting")
+    return RateLimiter(config)
+
+# Pre-configured rate limiters for different LLMs
+RATE_LIMITERS: Dict[LLMProvider, RateLimiter] = {
+    provider: create_rate_limiter(provider, config)
+    for provider, config in RATE_LIMIT_CONFIGS.items()
+}
+
+def get_rate_limiter(provider: LLMProvider) -> Optional[RateLimiter]:
+    """Get the shared rate limiter for a provider"""
+    return RATE_LIMITERS.get(provider)
@@ -0,0 +1,134 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+def compute_text_hash(text: str) -> str:
+    """Return the SHA-256 hex digest of a string"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+class ResponseCache:
+    """
+    SQLite-backed store of LLM responses keyed by provider, model name, context
+    fingerprint (document content hashes and JSON context) and prompt hash. Analysis
+    runs at temperature 0, so a repeated request returns the stored answer instead of
+    spending tokens. Entries are evicted least-recently-used first once the cache holds
+    more than max_entries responses or max_bytes of text.
+    """
+    def __init__(self, db_path: str, max_bytes: int, max_entries: int):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    cache_key TEXT PRIMARY KEY,
+                    provider TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def make_key(provider: str, model: str, context_fingerprint: str, prompt: str) -> str:
+        """Cache key for a prompt sent to a model after the given context"""
+        return compute_text_hash("\n".join([provider, model, context_fingerprint, compute_text_hash(prompt)]))
+
+    def get(self, cache_key: str) -> Optional[str]:
+        """Return a cached response, or None if missing"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT response FROM responses WHERE cache_key = ?",
+                (cache_key,)
+            ).fetchone()
+            if row:
+                conn.execute(
+                    "UPDATE responses SET last_used = ? WHERE cache_key = ?",
+                    (time.time(), cache_key)
+                )
+
+        with self._lock:
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return row[0] if row else None
+
+    def put(self, cache_key: str, provider: str, model: str, response: str) -> None:
+        """Store a response and evict old entries if the cache is over its limits"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (cache_key, provider, model, response, size, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (cache_key, provider, model, response, len(response.encode('utf-8')), now, now)
+            )
+        self._evict_if_needed()
+
+    def _evict_if_needed(self) -> None:
+        """Remove least recently used entries until the cache fits max_entries and max_bytes"""
+        with self._connect() as conn:
+            entries, total_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            if entries <= self.max_entries and total_bytes <= self.max_bytes:
+                return
+            evicted = 0
+            rows = conn.execute("SELECT cache_key, size FROM responses ORDER BY last_used").fetchall()
+            for cache_key, size in rows:
+                if entries <= self.max_entries and total_bytes <= self.max_bytes:
+                    break
+                conn.execute("DELETE FROM responses WHERE cache_key = ?", (cache_key,))
+                entries -= 1
+                total_bytes -= size
+                evicted += 1
+        logger.info(f"🧹 Evicted {evicted} LLM response cache entries")
+
+    def clear(self) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM responses")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the current size of the cache"""
+        with self._connect() as conn:
+            entries, total_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": entries,
+                "bytes": total_bytes
+            }
+
+# Shared response cache used by LLMWrapper
+RESPONSE_CACHE = ResponseCache(
+    db_path=Config.RESPONSE_CACHE_PATH,
+    max_bytes=Config.RESPONSE_CACHE_MAX_BYTES,
+    max_entries=Config.RESPONSE_CACHE_MAX_ENTRIES
+)
@@ -0,0 +1,124 @@
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Channel used by callers that are not scoped to a job or session
+GLOBAL_CHANNEL = "global"
+
+class StatusChannel:
+    def __init__(self, history_size: int):
+        self.events = deque(maxlen=history_size)
+        self.next_event_id = 1
+        # Live-only events (e.g. streamed items) are fanned out but never replayed
+        self.live_events = deque(maxlen=history_size)
+        self.next_live_id = 1
+        self.closed = False
+        self.updated_at = time.time()
+        self.condition = threading.Condition()
+
+class StatusBroker:
+    """
+    Fan-out of status events to every subscriber of a channel (job or session).
+    Each channel keeps a bounded history so late or reconnecting subscribers can
+    catch up, and subscribers block on a condition variable instead of polling.
+    Live events reach only the subscribers connected when they are published, so
+    high-volume updates cannot push stage events out of the history.
+    """
+    def __init__(self, history_size: int, channel_ttl_seconds: int):
+        self.history_size = history_size
+        self.channel_ttl_seconds = channel_ttl_seconds
+        self._channels: Dict[str, StatusChannel] = {}
+        self._lock = threading.Lock()
+
+    def _channel(self, channel_id: str) -> StatusChannel:
+        with self._lock:
+            self._purge_expired()
+            channel = self._channels.get(channel_id)
+            if channel is None:
+                channel = StatusChannel(self.history_size)
+                self._channels[channel_id] = channel
+            return channel
+
+    def _purge_expired(self) -> None:
+        """Drop channels with no activity within the TTL. Caller must hold self._lock"""
+        cutoff = time.time() - self.channel_ttl_seconds
+        expired = [channel_id for channel_id, channel in self._channels.items()
+                   if channel_id != GLOBAL_CHANNEL and channel.updated_at < cutoff]
+        for channel_id in expired:
+            channel = self._channels.pop(channel_id)
+            with channel.condition:
+                channel.closed = True
+                channel.condition.notify_all()
+
+    def publish(self, channel_id: str, message: Dict[str, Any]) -> int:
+        """Append an event to a channel and wake its subscribers. Returns the event ID"""
+        channel = self._channel(channel_id)
+        with channel.condition:
+            event_id = channel.next_event_id
+            channel.next_event_id += 1
+            channel.events.append((event_id, message))
+            channel.updated_at = time.time()
+            channel.condition.notify_all()
+        return event_id
+
+    def publish_live(self, channel_id: str, message: Dict[str, Any]) -> None:
+        """Send an event to current subscribers without adding it to the replay history"""
+        channel = self._channel(channel_id)
+        with channel.condition:
+            channel.live_events.append((channel.next_live_id, message))
+            channel.next_live_id += 1
+            channel.updated_at = time.time()
+            channel.condition.notify_all()
+
+    def close(self, channel_id: str) -> None:
+        """Mark a channel finished; subscribers end once they have drained its history"""
+        if channel_id == GLOBAL_CHANNEL:
+            return
+        channel = self._channel(channel_id)
+        with channel.condition:
+            channel.closed = True
+            channel.updated_at = time.time()
+            channel.condition.notify_all()
+
+    def subscribe(self, channel_id: str, last_event_id: int = 0,
+                  heartbeat_seconds: float = 15.0) -> Iterator[Optional[Tuple[int, Dict[str, Any]]]]:
+        """
+        Yield (event_id, message) for every event after last_event_id, blocking until new
+        events arrive, and (None, message) for live events published while subscribed.
+        Yields None after heartbeat_seconds without events so the caller can send a
+        keep-alive. Stops once the channel is closed and drained.
+        """
+        channel = self._channel(channel_id)
+        cursor = last_event_id
+        with channel.condition:
+            live_cursor = channel.next_live_id - 1
+
+        def collect() -> Tuple[list, list]:
+            return (
+                [(event_id, message) for event_id, message in channel.events if event_id > cursor],
+                [(live_id, message) for live_id, message in channel.live_events if live_id > live_cursor]
+            )
+
+        while True:
+            with channel.condition:
+                pending, live = collect()
+                if not pending and not live:
+                    if channel.closed:
+                        return
+                    channel.condition.wait(timeout=heartbeat_seconds)
+                    pending, live = collect()
+
+            if not pending and not live:
+                yield None
+                continue
+
+            for live_id, message in live:
+                live_cursor = live_id
+                yield None, message
+            for event_id, message in pending:
+                cursor = event_id
+                yield event_id, message
@@ -0,0 +1,34 @@
+import json
+import logging
+from typing import Any
+from app.config import Config
+from app.services.document_set import DocumentSet
+
+logger = logging.getLogger(__name__)
+
+# Rough average for English prose; used where no tokenizer is available
+CHARS_PER_TOKEN = 4
+# Digits and punctuation in statement tables tokenize far more densely than prose
+NUMERIC_CHARS_PER_TOKEN = 2
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate that weights numeric content more heavily than prose"""
+    if not text:
+        return 0
+    numeric = sum(1 for char in text if char.isdigit() or char in ".,$-/()")
+    return int((len(text) - numeric) / CHARS_PER_TOKEN + numeric / NUMERIC_CHARS_PER_TOKEN) + 1
+
+def estimate_json_tokens(data: Any) -> int:
+    """Estimated tokens of JSON context as the wrappers serialize it"""
+    return estimate_tokens(f"JSON content:\n{json.dumps(data, indent=2)}")
+
+def estimate_document_tokens(documents: DocumentSet, include_page_images: bool = False) -> int:
+    """
+    Estimated tokens of a document set from its extracted text. Providers that read PDFs
+    natively also bill each page as an image, added when include_page_images is set.
+    """
+    pages = documents.get_pages()
+    tokens = sum(estimate_tokens(page) for page in pages)
+    if include_page_images:
+        tokens += len(pages) * Config.PDF_PAGE_IMAGE_TOKENS
+    return tokens
@@ -0,0 +1,231 @@
+import re
+import logging
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# NSF fees only - overdraft fees are deliberately excluded, matching the check_nsf prompt
+NSF_PATTERN = re.compile(r"\bNSF\b|non[\s-]?sufficient|insufficient\s+funds|returned\s+item\s+fee", re.IGNORECASE)
+OVERDRAFT_PATTERN = re.compile(r"\boverdraft\b|\bOD\s+fee\b", re.IGNORECASE)
+
+BALANCE_TOLERANCE = 0.01
+# Date formats seen in extracted statements; ISO is what the prompts ask for
+DATE_FORMATS = ("%Y-%m-%d", "%m/%d/%Y", "%m/%d/%y", "%Y/%m/%d", "%m-%d-%Y")
+
+def parse_date(value: Any) -> Optional[str]:
+    """ISO date for a statement date string, or None when it is not a valid date"""
+    text = str(value or "").strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+def parse_amount(value: Any) -> Optional[float]:
+    """Float for an amount like 1200, "-35.00", "$1,200.00" or "(1,200.00)", or None when not numeric"""
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return None if np.isnan(value) else float(value)
+    text = str(value).strip().replace(",", "").replace("$", "").replace(" ", "")
+    negative = text.startswith("(") and text.endswith(")")
+    try:
+        amount = float(text.strip("()"))
+    except ValueError:
+        return None
+    if np.isnan(amount) or np.isinf(amount):
+        return None
+    return -amount if negative else amount
+
+def normalize_record(record: Any) -> Optional[Dict[str, Any]]:
+    """
+    Coerce an extracted transaction into the form from_records expects, or return None
+    when its date or amount cannot be parsed. An unreadable running balance or page is
+    dropped rather than rejecting the row.
+    """
+    if not isinstance(record, dict):
+        return None
+    date = parse_date(record.get("date"))
+    amount = parse_amount(record.get("amount"))
+    if date is None or amount is None:
+        return None
+    try:
+        page = int(record.get("page") or 0)
+    except (TypeError, ValueError):
+        page = 0
+    return {
+        "date": date,
+        "description": str(record.get("description") or ""),
+        "amount": amount,
+        "running_balance": parse_amount(record.get("running_balance")),
+        "page": page
+    }
+
+class TransactionLedger:
+    """
+    Normalized transaction ledger stored as parallel NumPy arrays sorted by date.
+
+    Amounts are signed (credits positive, debits negative). Running balances are
+    NaN where the statement does not print one. Statement beginning/ending balances
+    are expected as zero-amount rows carrying the stated balance, which anchor the
+    running balance reconstruction.
+    """
+    def __init__(self, dates: np.ndarray, descriptions: List[str], amounts: np.ndarray,
+                 balances: np.ndarray, pages: np.ndarray):
+        order = np.argsort(dates, kind="stable")
+        self.dates = dates[order]
+        self.descriptions = np.asarray(descriptions, dtype=object)[order]
+        self.amounts = amounts[order]
+        self.balances = balances[order]
+        self.pages = pages[order]
+
+    @classmethod
+    def from_records(cls, records: List[Dict[str, Any]]) -> "TransactionLedger":
+        """Build a ledger from extracted transaction dicts"""
+        def to_float(value):
+            return np.nan if value is None or value == "" else float(value)
+
+        return cls(
+            dates=np.array([r["date"] for r in records], dtype="datetime64[D]"),
+            descriptions=[str(r.get("description", "")) for r in records],
+            amounts=np.array([float(r.get("amount") or 0) for r in records], dtype=np.float64),
+            balances=np.array([to_float(r.get("running_balance")) for r in records], dtype=np.float64),
+            pages=np.array([int(r.get("page") or 0) for r in records], dtype=np.int32)
+        )
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """Return the ledger as a list of transaction dicts"""
+        return [
+            {
+                "date": str(self.dates[i]),
+                "description": self.descriptions[i],
+                "amount": round(float(self.amounts[i]), 2),
+                "running_balance": None if np.isnan(self.balances[i]) else round(float(self.balances[i]), 2),
+                "page": int(self.pages[i])
+            }
+            for i in range(len(self))
+        ]
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def running_balances(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Reconstruct the balance after every transaction.
+
+        Returns:
+            (balances, is_direct) where is_direct marks balances printed on the statement
+        """
+        n = len(self)
+        is_direct = ~np.isnan(self.balances)
+        if n == 0:
+            return np.zeros(0), is_direct
+
+        cumulative = np.cumsum(self.amounts)
+        if not is_direct.any():
+            logger.warning("Ledger has no stated balances; balances are relative to a zero opening balance")
+            return cumulative, is_direct
+
+        # Each stated balance implies an opening balance for the running sum; carry the most
+        # recent one forward (and the first one backward) to fill unstated rows
+        implied_opening = np.where(is_direct, self.balances - cumulative, np.nan)
+        anchor_index = np.where(is_direct, np.arange(n), -1)
+        anchor_index = np.maximum.accumulate(anchor_index)
+        anchor_index[anchor_index < 0] = np.argmax(is_direct)
+
+        balances = np.where(is_direct, self.balances, implied_opening[anchor_index] + cumulative)
+        return balances, is_direct
+
+    def end_of_day_balances(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns:
+            (dates, balances, is_direct) with one entry per date that has activity
+        """
+        balances, is_direct = self.running_balances()
+        if len(self) == 0:
+            return self.dates, balances, is_direct
+        _, first_index = np.unique(self.dates, return_index=True)
+        last_index = np.r_[first_index[1:], len(self)] - 1
+        return self.dates[last_index], balances[last_index], is_direct[last_index]
+
+    def nsf_summary(self) -> Dict[str, Any]:
+        """NSF fee incidents in the check_nsf shape"""
+        incidents = []
+        for i, description in enumerate(self.descriptions):
+            if self.amounts[i] < 0 and NSF_PATTERN.search(description) and not OVERDRAFT_PATTERN.search(description):
+                incidents.append({
+                    "date": str(self.dates[i]),
+                    "amount": round(float(-self.amounts[i]), 2)
+                })
+        return {
+            "nsf_incidents": incidents,
+            "total_fees": round(sum(incident["amount"] for incident in incidents), 2),
+            "incident_count": len(incidents)
+        }
+
+    def monthly_totals(self) -> Dict[str, Dict[str, float]]:
+        """Total revenue (credits) and expenses (debits) per YYYY-MM month"""
+        if len(self) == 0:
+            return {}
+        months = self.dates.astype("datetime64[M]")
+        unique_months, month_index = np.unique(months, return_inverse=True)
+        revenue = np.bincount(month_index, weights=np.where(self.amounts > 0, self.amounts, 0), minlength=len(unique_months))
+        expenses = np.bincount(month_index, weights=np.where(self.amounts < 0, -self.amounts, 0), minlength=len(unique_months))
+        return {
+            str(month): {
+                "expenses": round(float(expenses[i]), 2),
+                "revenue": round(float(revenue[i]), 2)
+            }
+            for i, month in enumerate(unique_months)
+        }
+
+    def monthly_closing_balances(self) -> Dict[str, Any]:
+        """Closing balance per month in the extract_monthly_closing_balances shape"""
+        balances, is_direct = self.running_balances()
+        entries = []
+        notes = []
+        if len(self):
+            months = self.dates.astype("datetime64[M]")
+            unique_months, first_index = np.unique(months, return_index=True)
+            last_index = np.r_[first_index[1:], len(self)] - 1
+
+            for i, month in enumerate(unique_months):
+                last = last_index[i]
+                closing_balance = float(balances[last])
+                verification = "Stated running balance" if is_direct[last] else "Calculated from all transactions"
+
+                # Cross-check against the opening balance implied by next month's first stated balance
+                if i + 1 < len(unique_months):
+                    first_next = first_index[i + 1]
+                    if is_direct[first_next]:
+                        next_opening = float(self.balances[first_next] - self.amounts[first_next])
+                        if abs(next_opening - closing_balance) <= BALANCE_TOLERANCE:
+                            verification = "Matches next month opening balance"
+                        else:
+                            notes.append(
+                                f"{month} closing balance {closing_balance:.2f} differs from "
+                                f"next month opening balance {next_opening:.2f}"
+                            )
+
+                entries.append({
+                    "month": str(month),
+                    "closing_date": str((month + 1).astype("datetime64[D]") - 1),
+                    "balance": round(closing_balance, 2),
+                    "balance_type": "direct" if is_direct[last] else "calculated",
+                    "source": "Ending Balance statement" if is_direct[last] else "Calculated from transactions",
+                    "verification": verification
+                })
+
+        direct_count = sum(1 for entry in entries if entry["balance_type"] == "direct")
+        return {
+            "monthly_closing_balances": entries,
+            "analysis": {
+                "months_covered": len(entries),
+                "direct_balances": direct_count,
+                "calculated_balances": len(entries) - direct_count,
+                "verification_notes": notes
+            }
+        }
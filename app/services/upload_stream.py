@@ -0,0 +1,126 @@
+import os
+import uuid
+import hashlib
+import logging
+from typing import Any, IO, List, Optional
+import PyPDF2
+from flask import Request, current_app
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.utils import secure_filename
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+PDF_MAGIC = b"%PDF-"
+# PDF readers accept the header anywhere in the first 1KB
+PDF_HEADER_WINDOW = 1024
+
+class UploadRejected(Exception):
+    """Raised when an uploaded file is not an acceptable PDF"""
+
+class HashingUploadWriter:
+    """
+    Writable file object that receives an uploaded file chunk by chunk from the
+    multipart parser and writes it straight to its final path, computing the content
+    hash and checking the PDF header on the way. Memory use is one chunk regardless
+    of file size; oversized files are rejected as soon as they cross max_bytes.
+    """
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.kept = False
+        self._digest = hashlib.sha256()
+        self._header = b""
+        self._file: IO[bytes] = open(path, "w+b")
+
+    def write(self, data: bytes) -> int:
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            self.discard()
+            raise RequestEntityTooLarge(f"File exceeds the per-file upload limit of {self.max_bytes} bytes")
+        if len(self._header) < PDF_HEADER_WINDOW:
+            self._header += data[:PDF_HEADER_WINDOW - len(self._header)]
+        self._digest.update(data)
+        return self._file.write(data)
+
+    @property
+    def content_hash(self) -> str:
+        return self._digest.hexdigest()
+
+    @property
+    def has_pdf_header(self) -> bool:
+        return PDF_MAGIC in self._header
+
+    def keep(self) -> None:
+        """Mark the file as accepted so it survives the end of the request"""
+        self.kept = True
+
+    def discard(self) -> None:
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+    def __getattr__(self, name: str) -> Any:
+        # read, seek, tell, flush, ... are served by the underlying file
+        return getattr(self._file, name)
+
+class StreamingUploadRequest(Request):
+    """
+    Request class that streams uploaded files directly into the upload folder through
+    HashingUploadWriter instead of spooling them to a temporary file first. Files the
+    handler does not keep are deleted when the request closes.
+    """
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.upload_writers: List[HashingUploadWriter] = []
+
+    def _get_file_stream(self, total_content_length: Optional[int], content_type: Optional[str],
+                         filename: Optional[str] = None, content_length: Optional[int] = None) -> IO[bytes]:
+        name = secure_filename(filename or "") or "upload"
+        path = os.path.join(current_app.config["UPLOAD_FOLDER"], f"{uuid.uuid4()}_{name}")
+        writer = HashingUploadWriter(path, Config.UPLOAD_MAX_FILE_BYTES)
+        self.upload_writers.append(writer)
+        return writer
+
+    def close(self) -> None:
+        super().close()
+        for writer in self.upload_writers:
+            if writer.kept:
+                writer.close()
+            else:
+                writer.discard()
+
+def validate_pdf(writer: HashingUploadWriter) -> int:
+    """
+    Check a streamed upload is a readable, unencrypted PDF within the page limit.
+    Returns the page count; raises UploadRejected otherwise.
+    """
+    if not writer.has_pdf_header:
+        raise UploadRejected("File is not a PDF (missing %PDF header)")
+    writer.flush()
+    try:
+        # Read from an open handle; given a path, PyPDF2 loads the whole file into memory
+        with open(writer.path, "rb") as file:
+            reader = PyPDF2.PdfReader(file)
+            if reader.is_encrypted:
+                raise UploadRejected("Encrypted PDFs are not supported")
+            page_count = len(reader.pages)
+    except UploadRejected:
+        raise
+    except Exception as e:
+        # Malformed PDFs surface as arbitrary errors from PyPDF2 (AttributeError on a broken
+        # xref, TypeError, RecursionError...); any of them means this file is rejected, not the batch
+        logger.warning(f"Rejecting unreadable PDF {writer.path}: {type(e).__name__}: {str(e)}")
+        raise UploadRejected(f"Unreadable PDF: {str(e)}")
+    if page_count == 0:
+        raise UploadRejected("PDF has no pages")
+    if page_count > Config.UPLOAD_MAX_PAGES:
+        raise UploadRejected(f"PDF has {page_count} pages; the limit is {Config.UPLOAD_MAX_PAGES}")
+    return page_count
@@ -180,9 +180,6 @@ document.addEventListener('DOMContentLoaded', function() {
                     processingSection.style.transform = 'translateY(0)';
                 }, 10);
                 
-                // Start SSE connection for status updates
-                connectToStatusEvents();
-                
                 // Continue with underwrite request
                 processUnderwrite(result, provider, debugMode);
             } else {
@@ -217,8 +214,8 @@ document.addEventListener('DOMContentLoaded', function() {
                 
                 console.log('Sending underwrite request:', requestData);
 
-            // Send the request to the underwrite endpoint
-                const response = await fetch('/underwrite', {
+            // Submit the underwriting job and poll until it finishes
+                const response = await fetch('/underwrite/jobs', {
                     method: 'POST',
                     headers: {
                         'Content-Type': 'application/json',
@@ -230,7 +227,13 @@ document.addEventListener('DOMContentLoaded', function() {
                     throw new Error(`Server responded with ${response.status}: ${response.statusText}`);
                 }
 
-                const result = await response.json();
+                const job = await response.json();
+                console.log('Underwrite job submitted:', job);
+                
+                // Start SSE connection for this job's status updates
+                connectToStatusEvents(job.events_url);
+                
+                const result = await pollUnderwriteJob(job.status_url);
                 console.log('Underwrite response:', result);
 
             // Close SSE connection
@@ -262,8 +265,28 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
     
+    // Poll an underwriting job until it completes, returning its result
+    async function pollUnderwriteJob(statusUrl, intervalMs = 2000) {
+        while (true) {
+            const response = await fetch(statusUrl);
+            if (!response.ok) {
+                throw new Error(`Server responded with ${response.status}: ${response.statusText}`);
+            }
+            
+            const job = await response.json();
+            if (job.status === 'complete') {
+                return job.result;
+            }
+            if (job.status === 'failed') {
+                throw new Error(job.error || 'Underwriting job failed');
+            }
+            
+            await new Promise(resolve => setTimeout(resolve, intervalMs));
+        }
+    }
+    
     // Connect to SSE status events
-    function connectToStatusEvents() {
+    function connectToStatusEvents(eventsUrl = '/status') {
         // Close any existing connection
         disconnectFromStatusEvents();
         
@@ -275,7 +298,7 @@ document.addEventListener('DOMContentLoaded', function() {
         document.getElementById('provider-display').textContent = document.getElementById('provider').value;
         
         // Connect to the status endpoint
-        eventSource = new EventSource('/status');
+        eventSource = new EventSource(eventsUrl);
         
         // Handle incoming messages
         eventSource.onmessage = function(event) {
@@ -285,15 +308,38 @@ document.addEventListener('DOMContentLoaded', function() {
                 
                 // Update status
                 updateStatus(data);
+                
+                // The job's final event; close so the browser does not reconnect to a finished stream
+                if (data.step === 'complete' || data.step === 'error') {
+                    disconnectFromStatusEvents();
+                }
             } catch (error) {
                 console.error('Error parsing status update:', error, event.data);
             }
         };
-        
-        // Handle errors
+
+        // Streamed analysis items arrive as "item" events; show a running count instead of a status line each
+        const itemCounts = {};
+        eventSource.addEventListener('item', function(event) {
+            try {
+                const data = JSON.parse(event.data);
+                const key = data.key || 'items';
+                itemCounts[key] = (itemCounts[key] || 0) + 1;
+                currentStatus.textContent = `Received ${itemCounts[key]} ${key.replace(/_/g, ' ')}`;
+            } catch (error) {
+                console.error('Error parsing streamed item:', error, event.data);
+            }
+        });
+
+        // Handle errors: the browser reconnects on its own, resuming after the last event ID,
+        // unless the server refused the stream (e.g. 404 for an unknown job)
         eventSource.onerror = function(error) {
-            console.error('SSE connection error:', error);
-            disconnectFromStatusEvents();
+            if (eventSource && eventSource.readyState === EventSource.CLOSED) {
+                console.error('SSE connection closed:', error);
+                disconnectFromStatusEvents();
+            } else {
+                console.warn('SSE connection lost, reconnecting...', error);
+            }
         };
     }
     
@@ -1,14 +1,29 @@
 import logging
-from typing import List, Dict, Tuple, Any
+from typing import List, Dict, Tuple, Any, Callable
 import json
 import traceback
-from app.services.llm_factory import LLMFactory
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from app.services.llm_factory import LLMFactory, ContextBudgetExceeded
+from app.config import Config
+from app.services.financial_statistics import compute_monthly_statistics
+from app.services.transaction_ledger import TransactionLedger, normalize_record
+from app.services.daily_balance_series import build_daily_balances_from_ledger, densify_daily_balances
+from app.services.token_estimator import estimate_tokens, estimate_json_tokens
+from app.services.incremental_json import IncrementalJsonParser
 
 logger = logging.getLogger(__name__)
 
 # Store single LLM instance at module level
 _llm = None
 
+class ChunkExtractionError(Exception):
+    """Raised when one chunk of a chunked extraction fails, so the other chunks' results are not taken as complete"""
+
+class TruncatedResponseError(ValueError):
+    """Raised when a JSON answer stops before the value is complete, usually at the output token limit"""
+
 def set_llm(llm: Any) -> None:
     """Set the LLM instance to be used by the tools.
     
@@ -18,11 +33,47 @@ def set_llm(llm: Any) -> None:
     global _llm
     _llm = llm
 
+def _is_json_response(text: str) -> bool:
+    """Whether a response holds a complete JSON object or array, possibly inside a code fence"""
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        return False
+    try:
+        json.JSONDecoder().raw_decode(text, min(starts))
+        return True
+    except json.JSONDecodeError:
+        return False
 
-
-
-def check_nsf(input_text: str) -> str:
+def _get_json_response(llm: Any, prompt: str) -> str:
+    """
+    Get a JSON response from the LLM. With STREAM_RESPONSES the answer is streamed through
+    an incremental parser, so completed array elements reach the LLM's item listener as they
+    arrive. A truncated answer raises TruncatedResponseError, so chunked extractions can
+    retry a smaller chunk. Only answers that parse as JSON are kept in the response cache.
+    """
+    if not Config.STREAM_RESPONSES:
+        response = llm.get_response(prompt=prompt, validate=_is_json_response)
+        parser = IncrementalJsonParser()
+        parser.feed(response or "")
+        if parser.started and not parser.complete:
+            raise TruncatedResponseError(f"Truncated JSON response after {len(response)} characters")
+        return response
+
+    parser = IncrementalJsonParser(on_item=llm.item_listener)
+    stream = llm.stream_response(prompt, validate=_is_json_response)
+    for delta in stream:
+        parser.feed(delta)
+    if stream.truncated or (parser.started and not parser.complete):
+        raise TruncatedResponseError(f"Truncated JSON response after {len(stream.text)} characters")
+    return stream.text
+
+
+def check_nsf(input_text: str, llm: Any = None, ledger: TransactionLedger = None) -> str:
     """Check for NSF (Non-Sufficient Funds) fees and incidents. Returns JSON response."""
+    if ledger is not None:
+        logger.info("🔧 Tool check_nsf computing from transaction ledger")
+        return json.dumps(ledger.nsf_summary())
+    llm = llm or _llm
     prompt = """You are a JSON-only response bot. Analyze ALL bank statements for NSF (Non-Sufficient Funds) fees across the ENTIRE date range. Do not consider any fees that are not NSF fees (like overdraft fees).
     
 You must ONLY return a valid JSON object in this exact format, with no additional text or explanation:
@@ -50,7 +101,7 @@ IMPORTANT:
 
     try:
         logger.info("🔧 Tool check_nsf called")
-        response = _llm.get_response(prompt=prompt)
+        response = _get_json_response(llm, prompt)
         
         logger.info("Raw response received:")
         logger.info("-" * 50)
@@ -114,11 +165,12 @@ IMPORTANT:
         })
 
 
-def check_statement_continuity(input_text: str) -> str:
+def check_statement_continuity(input_text: str, llm: Any = None) -> str:
     """
     Check if bank statements are contiguous (sequential months with no gaps).
     Returns JSON string with analysis results.
     """
+    llm = llm or _llm
     prompt = """You are a JSON-only response bot. THOROUGHLY analyze ALL bank statements to identify date ranges covered.
     
     You must ONLY return a valid JSON object in this exact format, with no additional text or explanation:
@@ -163,7 +215,7 @@ def check_statement_continuity(input_text: str) -> str:
 
     try:
         logger.info("🔧 Tool check_statement_continuity called")
-        response = _llm.get_response(prompt=prompt)
+        response = _get_json_response(llm, prompt)
         
         logger.info("Raw response received:")
         logger.info("-" * 50)
@@ -228,37 +280,45 @@ def check_statement_continuity(input_text: str) -> str:
         })
 
 
-def extract_daily_balances(input_text: str) -> str:
-    """Extract or calculate daily balances from bank statements. Returns JSON response."""
+def _chunk_periods(periods: List[Dict], chunk_size: int) -> List[Tuple[str, str]]:
+    """Group sorted statement periods into (start_date, end_date) chunks."""
+    chunk_size = max(1, chunk_size)
+    chunks = []
+    for i in range(0, len(periods), chunk_size):
+        chunk_periods = periods[i:i+chunk_size]
+        chunks.append((chunk_periods[0]['start_date'], chunk_periods[-1]['end_date']))
+    return chunks
+
+
+def _split_period(start_date: str, end_date: str) -> List[Tuple[str, str]]:
+    """Halve an inclusive date range; a single day cannot be split and yields an empty list"""
+    start, end = np.datetime64(start_date, "D"), np.datetime64(end_date, "D")
+    if end <= start:
+        return []
+    middle = start + (end - start) // 2
+    return [(str(start), str(middle)), (str(middle + 1), str(end))]
+
+
+def _map_chunks(llm: Any, extractions: List[Callable[[], List[Dict]]], max_concurrency: int, name: str) -> List[Dict]:
+    """
+    Run one extraction per chunk concurrently, bounded by the llm provider's concurrency,
+    and concatenate their results in chunk order. The first chunk error is raised.
+    """
+    max_workers = max(1, min(len(extractions), max_concurrency, Config.get_max_concurrency(llm.provider)))
+    logger.info(f"Extracting {name} for {len(extractions)} chunks with {max_workers} workers")
     
-    try:
-        # Parse input_text as JSON to get continuity data
-        input_data = json.loads(input_text) if input_text != "None" else {}
-        continuity_data = input_data.get("continuity_data", {})
-        
-        if not continuity_data:
-            logger.error("No continuity data provided")
-            return json.dumps({"daily_balances": []})
-        
-        periods = continuity_data.get("statement_periods", [])
-        if not periods:
-            logger.error("No statement periods found in continuity data")
-            return json.dumps({"daily_balances": []})
-        
-        # Sort periods to ensure chronological order
-        periods.sort(key=lambda x: x['start_date'])
-        
-        # Process statements in chunks of 2 months
-        all_balances = []
-        
-        for i in range(0, len(periods), 2):
-            chunk_periods = periods[i:i+2]
-            chunk_start = chunk_periods[0]['start_date']
-            chunk_end = chunk_periods[-1]['end_date']
-            
-            logger.info(f"Processing chunk from {chunk_start} to {chunk_end}")
-            
-            chunk_prompt = f"""You are a JSON-only response bot. Extract daily balances for the period from {chunk_start} to {chunk_end}.
+    results = []
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name) as executor:
+        for chunk_results in executor.map(lambda extract: extract(), extractions):
+            results.extend(chunk_results)
+    return results
+
+
+def _extract_daily_balance_chunk(llm: Any, chunk_start: str, chunk_end: str) -> List[Dict]:
+    """Extract daily balances for a single chunk of statement periods on an isolated context."""
+    logger.info(f"Processing chunk from {chunk_start} to {chunk_end}")
+    
+    chunk_prompt = f"""You are a JSON-only response bot. Extract daily balances for the period from {chunk_start} to {chunk_end}.
 
             CRITICAL RULES FOR BALANCE TYPES:
             1. "direct" balances:
@@ -291,28 +351,77 @@ def extract_daily_balances(input_text: str) -> str:
             - Extract ALL daily balances between {chunk_start} and {chunk_end}
             """
 
-            try:
-                chunk_response = _llm.get_response(prompt=chunk_prompt)
-                
-            
-                # Clean the response
-                cleaned_response = chunk_response.strip()
-                if "```json" in cleaned_response:
-                    cleaned_response = cleaned_response.split("```json")[1]
-                if "```" in cleaned_response:
-                    cleaned_response = cleaned_response.split("```")[0]
-                cleaned_response = cleaned_response.strip()
-                
-                logger.info("Cleaned chunk response:")
-                logger.info(cleaned_response)
-                
-                chunk_data = json.loads(cleaned_response)
-                all_balances.extend(chunk_data.get("daily_balances", []))
-                
-            except Exception as e:
-                logger.error(f"Error processing chunk {chunk_start} to {chunk_end}: {str(e)}")
-                logger.error(f"Raw response was: {chunk_response}")
-                logger.error(f"Full traceback:\n{traceback.format_exc()}")
+    chunk_response = None
+    try:
+        chunk_response = _get_json_response(llm.isolated(), chunk_prompt)
+        
+        # Clean the response
+        cleaned_response = chunk_response.strip()
+        if "```json" in cleaned_response:
+            cleaned_response = cleaned_response.split("```json")[1]
+        if "```" in cleaned_response:
+            cleaned_response = cleaned_response.split("```")[0]
+        cleaned_response = cleaned_response.strip()
+        
+        logger.info("Cleaned chunk response:")
+        logger.info(cleaned_response)
+        
+        chunk_data = json.loads(cleaned_response)
+        return chunk_data.get("daily_balances", [])
+        
+    except ContextBudgetExceeded:
+        raise
+    except TruncatedResponseError as e:
+        halves = _split_period(chunk_start, chunk_end)
+        if not halves:
+            raise ChunkExtractionError(f"Daily balance extraction failed for {chunk_start} to {chunk_end}: {str(e)}") from e
+        # A shorter period needs fewer output tokens; retry it as two halves
+        logger.warning(f"✂️ Daily balances for {chunk_start} to {chunk_end} truncated, splitting the period")
+        return [balance for start, end in halves for balance in _extract_daily_balance_chunk(llm, start, end)]
+    except Exception as e:
+        logger.error(f"Error processing chunk {chunk_start} to {chunk_end}: {str(e)}")
+        logger.error(f"Raw response was: {chunk_response}")
+        logger.error(f"Full traceback:\n{traceback.format_exc()}")
+        raise ChunkExtractionError(f"Daily balance extraction failed for {chunk_start} to {chunk_end}: {str(e)}") from e
+
+
+def extract_daily_balances(input_text: str, llm: Any = None, ledger: TransactionLedger = None) -> str:
+    """
+    Extract or calculate daily balances from bank statements. Returns JSON response; when any
+    chunk fails the balances are empty and "incomplete" is set rather than forward-filling
+    across the missing periods.
+    """
+    llm = llm or _llm
+    
+    try:
+        # Parse input_text as JSON to get continuity data
+        input_data = json.loads(input_text) if input_text != "None" else {}
+        continuity_data = input_data.get("continuity_data", {})
+        periods = continuity_data.get("statement_periods", [])
+        start_date = min((p['start_date'] for p in periods), default=None)
+        end_date = max((p['end_date'] for p in periods), default=None)
+        
+        if ledger is not None:
+            logger.info("🔧 Tool extract_daily_balances computing from transaction ledger")
+            return json.dumps(build_daily_balances_from_ledger(ledger, start_date, end_date))
+        
+        if not continuity_data:
+            logger.error("No continuity data provided")
+            return json.dumps({"daily_balances": []})
+        
+        if not periods:
+            logger.error("No statement periods found in continuity data")
+            return json.dumps({"daily_balances": []})
+        
+        # Sort periods to ensure chronological order
+        periods.sort(key=lambda x: x['start_date'])
+        
+        # Process statements in chunks of periods, each chunk on its own context
+        chunks = _chunk_periods(periods, Config.DAILY_BALANCE_CHUNK_PERIODS)
+        all_balances = _map_chunks(
+            llm, [partial(_extract_daily_balance_chunk, llm, start, end) for start, end in chunks],
+            Config.DAILY_BALANCE_MAX_CONCURRENCY, "daily_balances"
+        )
         
         # Sort all balances by date
         all_balances.sort(key=lambda x: x['date'])
@@ -325,48 +434,211 @@ def extract_daily_balances(input_text: str) -> str:
                 seen_dates.add(balance['date'])
                 unique_balances.append(balance)
         
-        return json.dumps({"daily_balances": unique_balances})
+        # Fill any calendar days the LLM skipped
+        return json.dumps({"daily_balances": densify_daily_balances(unique_balances, start_date, end_date)})
         
+    except (ChunkExtractionError, ContextBudgetExceeded) as e:
+        logger.error(f"Daily balances incomplete: {str(e)}")
+        return json.dumps({"daily_balances": [], "incomplete": True, "error": str(e)})
     except Exception as e:
         logger.error(f"Error in extract_daily_balances: {str(e)}")
         logger.error(f"Full traceback:\n{traceback.format_exc()}")
         return json.dumps({"daily_balances": []})
 
 
-def analyze_monthly_financials(input_str: str = "None") -> str:
+def _ledger_prompt(scope: str, scope_rule: str) -> str:
+    return f"""You are a JSON-only response bot. Extract EVERY transaction from the bank statements {scope}.
+
+            Return ONLY a valid JSON object in this exact format:
+            {{
+                "transactions": [
+                    {{
+                        "date": "YYYY-MM-DD",
+                        "description": "transaction description as printed",
+                        "amount": signed_amount,
+                        "running_balance": balance_or_null,
+                        "page": page_number
+                    }}
+                ]
+            }}
+
+            CRITICAL RULES:
+            1. Deposits/credits are POSITIVE amounts, withdrawals/debits/fees are NEGATIVE amounts
+            2. "running_balance" is the balance printed next to the transaction, or null if none is printed
+            3. Include each statement's "Beginning Balance" and "Ending Balance" as rows with amount 0
+               and the stated balance as running_balance
+            4. Include ALL fees (NSF, overdraft, service charges) as separate transactions
+            5. List transactions in the order they appear on the statement
+            6. All amounts must be numbers (not strings), rounded to 2 decimal places
+            7. {scope_rule}
+            """
+
+
+def _request_ledger(llm: Any, prompt: str, label: str) -> List[Dict]:
+    """Send a ledger extraction prompt and validate the returned transactions."""
+    chunk_response = None
+    try:
+        chunk_response = _get_json_response(llm, prompt)
+        
+        # Clean the response
+        cleaned_response = chunk_response.strip()
+        if "```json" in cleaned_response:
+            cleaned_response = cleaned_response.split("```json")[1]
+        if "```" in cleaned_response:
+            cleaned_response = cleaned_response.split("```")[0]
+        cleaned_response = cleaned_response.strip()
+        
+        chunk_data = json.loads(cleaned_response)
+        transactions = []
+        for transaction in chunk_data.get("transactions", []):
+            normalized = normalize_record(transaction)
+            if normalized is None:
+                logger.warning(f"Dropping transaction with unreadable date or amount for {label}: {transaction}")
+                continue
+            transactions.append(normalized)
+        return transactions
+        
+    except (ContextBudgetExceeded, TruncatedResponseError):
+        raise
+    except Exception as e:
+        logger.error(f"Error extracting transactions for {label}: {str(e)}")
+        logger.error(f"Raw response was: {chunk_response}")
+        logger.error(f"Full traceback:\n{traceback.format_exc()}")
+        raise ChunkExtractionError(f"Transaction extraction failed for {label}: {str(e)}") from e
+
+
+def _extract_ledger_chunk(llm: Any, chunk_start: str, chunk_end: str) -> List[Dict]:
+    """Extract the transaction ledger for a single chunk of statement periods on an isolated context."""
+    logger.info(f"Extracting transactions from {chunk_start} to {chunk_end}")
+    prompt = _ledger_prompt(
+        f"for the period from {chunk_start} to {chunk_end}",
+        f"Only include transactions dated between {chunk_start} and {chunk_end}"
+    )
+    label = f"{chunk_start} to {chunk_end}"
+    try:
+        return _request_ledger(llm.isolated(), prompt, label)
+    except TruncatedResponseError as e:
+        halves = _split_period(chunk_start, chunk_end)
+        if not halves:
+            raise ChunkExtractionError(f"Transaction extraction failed for {label}: {str(e)}") from e
+        logger.warning(f"✂️ Transactions for {label} truncated, splitting the period")
+        return [transaction for start, end in halves for transaction in _extract_ledger_chunk(llm, start, end)]
+
+
+def _extract_ledger_pages(llm: Any, pages: List[Dict]) -> List[Dict]:
+    """Extract the transaction ledger from a group of statement pages sent as text on a fresh context."""
+    label = f"pages {pages[0]['page']}-{pages[-1]['page']}"
+    logger.info(f"Extracting transactions from {label}")
+    page_llm = llm.fork(include_documents=False)
+    page_llm.add_json({"statement_pages": pages})
+    prompt = _ledger_prompt(
+        "in the statement_pages provided",
+        "Use the page number given with each page in statement_pages"
+    )
+    try:
+        return _request_ledger(page_llm, prompt, label)
+    except TruncatedResponseError as e:
+        if len(pages) == 1:
+            raise ChunkExtractionError(f"Transaction extraction failed for {label}: {str(e)}") from e
+        logger.warning(f"✂️ Transactions for {label} truncated, splitting the page group")
+        middle = len(pages) // 2
+        return _extract_ledger_pages(llm, pages[:middle]) + _extract_ledger_pages(llm, pages[middle:])
+
+
+def _page_chunks(llm: Any, prompt_tokens: int) -> List[List[Dict]]:
+    """Group the attached PDFs' pages so each group, the JSON context and the prompt fit one context window."""
+    json_tokens = sum(estimate_json_tokens(source) for source_type, source in llm.context_sources if source_type == "json")
+    budget = llm.context_limit - llm.model_config['max_tokens'] - prompt_tokens - json_tokens
+
+    chunks = []
+    group, group_tokens = [], 0
+    page_number = 0
+    for source_type, source in llm.context_sources:
+        if source_type != "documents":
+            continue
+        for text in source.get_pages():
+            page_number += 1
+            # Envelope of the page entry inside the statement_pages JSON
+            page = {"page": page_number, "text": text}
+            page_tokens = estimate_json_tokens(page)
+            if group and group_tokens + page_tokens > budget:
+                chunks.append(group)
+                group, group_tokens = [], 0
+            group.append(page)
+            group_tokens += page_tokens
+    if group:
+        chunks.append(group)
+    return chunks
+
+
+def extract_transaction_ledger(input_text: str, llm: Any = None) -> str:
+    """
+    Extract a normalized transaction ledger (date, description, amount, running balance, page)
+    in a single pass over the statements. Returns JSON response; when any chunk fails the
+    transactions are empty and "incomplete" is set, since a ledger with missing periods
+    would understate every analysis computed from it.
+    """
+    llm = llm or _llm
+    
+    try:
+        input_data = json.loads(input_text) if input_text != "None" else {}
+        periods = input_data.get("continuity_data", {}).get("statement_periods", [])
+        if not periods:
+            logger.error("No statement periods found in continuity data")
+            return json.dumps({"transactions": []})
+        
+        prompt_tokens = estimate_tokens(_ledger_prompt("", ""))
+        if llm.fits_context(prompt_tokens):
+            periods = sorted(periods, key=lambda x: x['start_date'])
+            chunks = _chunk_periods(periods, Config.LEDGER_CHUNK_PERIODS)
+            extractions = [partial(_extract_ledger_chunk, llm, start, end) for start, end in chunks]
+        else:
+            # The statements alone overflow the context window; send them as page groups instead
+            page_groups = _page_chunks(llm, prompt_tokens)
+            extractions = [partial(_extract_ledger_pages, llm, pages) for pages in page_groups]
+            logger.warning(f"Statements exceed the {llm.context_limit} token context; extracting {len(page_groups)} page groups")
+        
+        transactions = _map_chunks(
+            llm, extractions,
+            Config.LEDGER_MAX_CONCURRENCY, "transaction_ledger"
+        )
+        
+        logger.info(f"Extracted {len(transactions)} transactions")
+        return json.dumps({"transactions": transactions})
+        
+    except (ChunkExtractionError, ContextBudgetExceeded) as e:
+        logger.error(f"Transaction ledger incomplete: {str(e)}")
+        return json.dumps({"transactions": [], "incomplete": True, "error": str(e)})
+    except Exception as e:
+        logger.error(f"Error in extract_transaction_ledger: {str(e)}")
+        logger.error(f"Full traceback:\n{traceback.format_exc()}")
+        return json.dumps({"transactions": []})
+
+
+def analyze_monthly_financials(input_str: str = "None", llm: Any = None, ledger: TransactionLedger = None) -> str:
     """Analyzes monthly expenses and revenues from bank statements, providing statistical analysis."""
+    if ledger is not None:
+        logger.info("🔧 Tool analyze_monthly_financials computing from transaction ledger")
+        return json.dumps(compute_monthly_statistics(ledger.monthly_totals()), indent=2)
+    llm = llm or _llm
     try:
-        prompt = """You are a JSON-only response bot. Based on the bank statements, please provide:
-        1. Monthly breakdown of expenses, revenues, and cashflow
-        2. Statistical analysis including standard deviation and averages
+        prompt = """You are a JSON-only response bot. Based on the bank statements, please provide
+        the monthly breakdown of expenses and revenues. Statistics are computed separately,
+        so do NOT calculate averages, standard deviations or cashflow.
         
         Format your response as a JSON with this structure:
         {
             "monthly_data": {
                 "YYYY-MM": {
                     "expenses": total_expenses,
-                    "revenue": total_revenue,
-                    "cashflow": revenue_minus_expenses
-                }
-            },
-            "statistics": {
-                "revenue": {
-                    "average": avg_monthly_revenue,
-                    "std_deviation": revenue_std_dev
-                },
-                "expenses": {
-                    "average": avg_monthly_expenses,
-                    "std_deviation": expenses_std_dev
-                },
-                "cashflow": {
-                    "average": avg_monthly_cashflow,
-                    "std_deviation": cashflow_std_dev
+                    "revenue": total_revenue
                 }
             }
         }
         
         IMPORTANT:
-        - Calculate cashflow as (revenue - expenses) for each month
+        - Revenue is the total of all deposits/credits for the month
+        - Expenses are the total of all withdrawals/debits for the month
         - All amounts should be numbers (not strings)
         - Round all amounts to 2 decimal places
         - Include ALL months found in statements
@@ -375,7 +647,7 @@ def analyze_monthly_financials(input_str: str = "None") -> str:
         Include only the JSON in your response, no additional text."""
 
         logger.info("🔄 Calling LLM for monthly financials analysis")
-        response = _llm.get_response(prompt)
+        response = _get_json_response(llm, prompt)
         
         logger.info("Raw response from LLM:")
         logger.info("-" * 50)
@@ -400,19 +672,17 @@ def analyze_monthly_financials(input_str: str = "None") -> str:
             json_response = json.loads(cleaned_response)
             
             # Validate required fields and structure
-            if "monthly_data" not in json_response or "statistics" not in json_response:
+            if "monthly_data" not in json_response:
                 raise ValueError("Missing required top-level fields")
                 
             for month, data in json_response["monthly_data"].items():
-                if not all(k in data for k in ["expenses", "revenue", "cashflow"]):
+                if not all(k in data for k in ["expenses", "revenue"]):
                     raise ValueError(f"Missing required fields in monthly data for {month}")
-                    
-            for metric in ["revenue", "expenses", "cashflow"]:
-                if not all(k in json_response["statistics"][metric] for k in ["average", "std_deviation"]):
-                    raise ValueError(f"Missing required fields in statistics for {metric}")
             
             logger.info("✅ Successfully parsed and validated JSON response")
-            return json.dumps(json_response, indent=2)
+            
+            # Compute cashflow and statistics locally from the monthly totals
+            return json.dumps(compute_monthly_statistics(json_response["monthly_data"]), indent=2)
             
         except json.JSONDecodeError as e:
             logger.error(f"❌ JSON parsing error: {str(e)}")
@@ -437,8 +707,12 @@ def analyze_monthly_financials(input_str: str = "None") -> str:
         })
 
 
-def extract_monthly_closing_balances(input_str: str = "None") -> str:
+def extract_monthly_closing_balances(input_str: str = "None", llm: Any = None, ledger: TransactionLedger = None) -> str:
     """Extract closing balances for each month from bank statements."""
+    if ledger is not None:
+        logger.info("🔧 Tool extract_monthly_closing_balances computing from transaction ledger")
+        return json.dumps(ledger.monthly_closing_balances(), indent=2)
+    llm = llm or _llm
     try:
         prompt = """You are a JSON-only response bot. Extract the closing balance for each month from the bank statements.
 
@@ -508,7 +782,7 @@ def extract_monthly_closing_balances(input_str: str = "None") -> str:
         Include only the JSON in your response, no additional text."""
 
         logger.info("🔄 Calling LLM for monthly closing balances")
-        response = _llm.get_response(prompt)
+        response = _get_json_response(llm, prompt)
         
         logger.info("Raw response from LLM:")
         logger.info("-" * 50)
@@ -575,8 +849,9 @@ def extract_monthly_closing_balances(input_str: str = "None") -> str:
         })
 
 
-def analyze_credit_decision_term_loan(debug=False):
+def analyze_credit_decision_term_loan(debug=False, llm: Any = None):
     """Analyzes financial data to make a credit decision for a term loan. Returns JSON response."""
+    llm = llm or _llm
     try:
         prompt = """You are a **conservative commercial loan underwriter** analyzing detailed financial and bank statement data to decide whether a business qualifies for a term loan. Your objective is to produce a final JSON output **only**, following the exact structure below (no extra text or commentary). 
 
@@ -690,7 +965,7 @@ Return ONLY a valid JSON object in this exact format, with no additional text:
 }"""
 
         logger.info("🔄 Calling LLM for credit analysis")
-        response = _llm.get_response(prompt)
+        response = _get_json_response(llm, prompt)
         
         # Log the raw response for debugging
         logger.info("Raw LLM response:")
@@ -840,8 +1115,9 @@ Return ONLY a valid JSON object in this exact format, with no additional text:
         }
 
 
-def analyze_credit_decision_accounts_payable(debug=False):
+def analyze_credit_decision_accounts_payable(debug=False, llm: Any = None):
     """Analyzes financial data to make a credit decision for accounts payable financing. Returns JSON response."""
+    llm = llm or _llm
     try:
         prompt = """You are a **conservative commercial underwriter** analyzing detailed financial and bank statement data to decide whether a business qualifies for **accounts payable financing**. Under this program:
 
@@ -956,7 +1232,7 @@ Return ONLY a valid JSON object in this exact format, with no additional text:
         }"""
 
         logger.info("🔄 Calling LLM for accounts payable credit analysis")
-        response = _llm.get_response(prompt)
+        response = _get_json_response(llm, prompt)
         
         # Log the raw response for debugging
         logger.info("Raw LLM response:")
@@ -1105,14 +1381,19 @@ Return ONLY a valid JSON object in this exact format, with no additional text:
             }
         } 
 
-def classify_document_type() -> dict:
+def classify_document_type(llm: Any = None) -> dict:
     """
     Classifies a document as either a bank statement or tax return based on its content.
     The PDF content should already be loaded into the LLM's conversation history.
     
+    Args:
+        llm (Any): Optional LLM wrapper to use instead of the module-level instance,
+            so documents can be classified concurrently on isolated contexts
+    
     Returns:
         dict: Classification result with type and confidence score
     """
+    llm = llm or _llm
     classification_prompt = """You are a document classification expert. Analyze the provided document and determine if it's a bank statement or tax return.
     
     CRITICAL CHARACTERISTICS TO CHECK:
@@ -1189,7 +1470,7 @@ def classify_document_type() -> dict:
     
     try:
         logger.info("🔄 Calling LLM for document classification")
-        response = _llm.get_response(classification_prompt)
+        response = llm.get_response(classification_prompt)
         
         # Clean the response
         cleaned_response = response.strip()
@@ -0,0 +1,83 @@
+import random
+import calendar
+from datetime import date
+from typing import List
+
+LINES_PER_PAGE = 48
+LINE_HEIGHT = 14
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def write_pdf(path: str, pages: List[List[str]]) -> None:
+    """Write a minimal text-only PDF with one Helvetica text block per page"""
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [%s] /Count %d >>" % (" ".join(f"{4 + 2 * i} 0 R" for i in range(len(pages))), len(pages)),
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"
+    ]
+    for i, lines in enumerate(pages):
+        text = " ".join(f"({_escape(line)}) '" for line in lines)
+        content = f"BT /F1 9 Tf 40 760 Td {LINE_HEIGHT} TL {text} ET"
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>"
+        )
+        objects.append(f"<< /Length {len(content)} >>\nstream\n{content}\nendstream")
+
+    output = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref_offset = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        output += f"{offset:010d} 00000 n \n".encode()
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode()
+    with open(path, "wb") as file:
+        file.write(output)
+
+def statement_pages(months: int, pages: int, seed: int = 0, start_year: int = 2024) -> List[List[str]]:
+    """
+    Lines of a multi-month business bank statement spread over the given number of pages.
+    Each month opens with a statement header and balances; the remaining lines are
+    dated transactions, so page count scales the transaction volume.
+    """
+    rng = random.Random(seed)
+    pages = max(pages, months)
+    pages_per_month = [pages // months + (1 if i < pages % months else 0) for i in range(months)]
+    balance = round(rng.uniform(10000, 40000), 2)
+    result = []
+
+    for index, month_pages in enumerate(pages_per_month):
+        year, month = start_year + index // 12, index % 12 + 1
+        last_day = calendar.monthrange(year, month)[1]
+        header = [
+            "First Synthetic Bank - Business Checking Statement",
+            "Account Number: 000123456789    Routing Number: 021000021",
+            f"Statement Period: {month:02d}/01/{year} - {month:02d}/{last_day:02d}/{year}",
+            f"Beginning Balance: ${balance:,.2f}",
+            "Date        Description                              Amount       Balance"
+        ]
+        transaction_count = month_pages * LINES_PER_PAGE - len(header) - 1
+        days = sorted(rng.randint(1, last_day) for _ in range(transaction_count))
+        lines = list(header)
+        for day in days:
+            if rng.random() < 0.35:
+                amount, description = round(rng.uniform(300, 9000), 2), "ACH Deposit - Customer Payment"
+            elif rng.random() < 0.01:
+                amount, description = -35.0, "NSF Fee - Insufficient Funds"
+            else:
+                amount, description = -round(rng.uniform(15, 2500), 2), "Debit Card Purchase - Supplier"
+            balance = round(balance + amount, 2)
+            posted = date(year, month, day)
+            lines.append(f"{posted:%m/%d/%Y}  {description:<40} {amount:>12,.2f} {balance:>12,.2f}")
+        lines.append(f"Ending Balance: ${balance:,.2f}")
+        result += [lines[i:i + LINES_PER_PAGE] for i in range(0, len(lines), LINES_PER_PAGE)]
+    return result
+
+def write_statement(path: str, months: int, pages: int, seed: int = 0) -> str:
+    """Write a synthetic bank statement PDF and return its path"""
+    write_pdf(path, statement_pages(months, pages, seed))
+    return path
@@ -0,0 +1,257 @@
+"""
+End-to-end underwriting benchmark against the offline fake LLM provider.
+
+Drives /upload and /underwrite through the Flask test client with synthetic multi-month
+statement PDFs and reports per-stage latency percentiles, throughput, peak RSS and
+tokens per application. With --baseline it exits non-zero when a run regresses, so it
+can gate deployments:
+
+    python -m benchmarks.underwriting_benchmark --pages 6,24,60 --output baseline.json
+    python -m benchmarks.underwriting_benchmark --pages 6,24,60 --baseline baseline.json
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import logging
+import argparse
+import resource
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Status steps that bracket the pipeline rather than name a stage
+BOUNDARY_STEPS = ("start", "complete", "error")
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the underwriting pipeline with the fake LLM provider")
+    parser.add_argument("--pages", default="6,24,60", help="Comma-separated statement page counts")
+    parser.add_argument("--months", type=int, default=3, help="Statement months per application")
+    parser.add_argument("--applications", type=int, default=3, help="Applications per page count")
+    parser.add_argument("--concurrency", type=int, default=2, help="Applications processed at once")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency-distribution", default="lognormal", choices=["fixed", "uniform", "lognormal"])
+    parser.add_argument("--latency-mean", type=float, default=0.2, help="Mean fake provider latency in seconds")
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--rate-limit-probability", type=float, default=0.0)
+    parser.add_argument("--truncation-probability", type=float, default=0.0)
+    parser.add_argument("--use-cache", action="store_true", help="Let repeat requests hit the LLM response cache")
+    parser.add_argument("--output", help="Write the JSON report here (usable as a later --baseline)")
+    parser.add_argument("--baseline", help="Earlier JSON report to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.25,
+                        help="Allowed relative increase over the baseline before failing")
+    parser.add_argument("--verbose", action="store_true", help="Keep the application's INFO logging")
+    return parser.parse_args()
+
+def configure_environment(args: argparse.Namespace) -> None:
+    """Settings are read when the app is imported, so they are set before that"""
+    os.environ.update({
+        "FAKE_LLM_SEED": str(args.seed),
+        "FAKE_LLM_LATENCY_DISTRIBUTION": args.latency_distribution,
+        "FAKE_LLM_LATENCY_MEAN_SECONDS": str(args.latency_mean),
+        "FAKE_LLM_LATENCY_SIGMA": str(args.latency_sigma),
+        "FAKE_LLM_RATE_LIMIT_PROBABILITY": str(args.rate_limit_probability),
+        "FAKE_LLM_TRUNCATION_PROBABILITY": str(args.truncation_probability)
+    })
+
+def stage_durations(events: List[Dict[str, Any]]) -> Dict[str, float]:
+    """Seconds from each step's first status event to the next step's first event"""
+    first_seen: Dict[str, float] = {}
+    for message in events:
+        first_seen.setdefault(message["step"], message["timestamp"])
+    starts = sorted(first_seen.items(), key=lambda item: item[1])
+    durations = {}
+    for (step, started), (_, ended) in zip(starts, starts[1:]):
+        if step not in BOUNDARY_STEPS:
+            durations[step] = ended - started
+    return durations
+
+def run_application(main: Any, pdf_path: str, pages: int, use_cache: bool) -> Dict[str, Any]:
+    client = main.app.test_client()
+    result = {"pages": pages, "stages": {}, "ok": False, "degraded": False}
+
+    started = time.perf_counter()
+    with open(pdf_path, "rb") as file:
+        response = client.post(
+            "/upload",
+            data={"provider": "fake", "files": (file, os.path.basename(pdf_path))},
+            content_type="multipart/form-data"
+        )
+    result["stages"]["upload"] = time.perf_counter() - started
+    if response.status_code != 200:
+        result["error"] = response.get_json()
+        return result
+    upload = response.get_json()
+
+    session_id = str(uuid.uuid4())
+    started = time.perf_counter()
+    response = client.post("/underwrite", json={
+        "provider": "fake",
+        "file_paths": upload["original_files"],
+        "merged_files": upload["merged_files"],
+        "session_id": session_id,
+        "bypass_cache": not use_cache
+    })
+    result["stages"]["underwrite"] = time.perf_counter() - started
+
+    events = []
+    for event in main.status_broker.subscribe(session_id, 0, heartbeat_seconds=0.01):
+        if event is None:
+            break
+        if event[0] is not None:
+            events.append(event[1])
+    main.status_broker.close(session_id)
+    result["stages"].update(stage_durations(events))
+
+    if response.status_code != 200:
+        result["error"] = response.get_json()
+        return result
+    underwriting = response.get_json()
+    result["ok"] = True
+    result["degraded"] = bool(underwriting["analysis"]["bank_statements"].get("error")) or any(
+        recommendation.get("approval_decision") == "ERROR"
+        for recommendation in underwriting.get("loan_recommendations", [])
+    )
+    return result
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(values),
+        "mean": round(float(np.mean(values)), 4),
+        "p50": round(float(np.percentile(values, 50)), 4),
+        "p95": round(float(np.percentile(values, 95)), 4),
+        "p99": round(float(np.percentile(values, 99)), 4)
+    }
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def build_report(args: argparse.Namespace, results: List[Dict[str, Any]], wall_seconds: float,
+                 llm_requests: int, llm_tokens: int) -> Dict[str, Any]:
+    stage_values: Dict[str, List[float]] = {}
+    for result in results:
+        for stage, seconds in result["stages"].items():
+            stage_values.setdefault(stage, []).append(seconds)
+    by_pages: Dict[int, List[float]] = {}
+    for result in results:
+        if "underwrite" in result["stages"]:
+            by_pages.setdefault(result["pages"], []).append(result["stages"]["underwrite"] + result["stages"]["upload"])
+
+    return {
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "applications": len(results),
+        "failures": sum(1 for result in results if not result["ok"]),
+        "degraded": sum(1 for result in results if result["degraded"]),
+        "wall_seconds": round(wall_seconds, 2),
+        "stages": {stage: percentiles(values) for stage, values in stage_values.items()},
+        "end_to_end_by_pages": {str(pages): percentiles(values) for pages, values in sorted(by_pages.items())},
+        "throughput": {
+            "applications_per_minute": round(len(results) / wall_seconds * 60, 2),
+            "llm_requests_per_minute": round(llm_requests / wall_seconds * 60, 2)
+        },
+        "llm_requests_per_application": round(llm_requests / len(results), 2),
+        "tokens_per_application": round(llm_tokens / len(results)),
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"\n{report['applications']} applications in {report['wall_seconds']}s "
+          f"({report['failures']} failed, {report['degraded']} degraded)")
+    print(f"{'stage':<20}{'count':>7}{'p50 s':>10}{'p95 s':>10}{'p99 s':>10}")
+    for stage, stats in report["stages"].items():
+        print(f"{stage:<20}{stats['count']:>7}{stats['p50']:>10.3f}{stats['p95']:>10.3f}{stats['p99']:>10.3f}")
+    for pages, stats in report["end_to_end_by_pages"].items():
+        print(f"{pages + ' pages':<20}{stats['count']:>7}{stats['p50']:>10.3f}{stats['p95']:>10.3f}{stats['p99']:>10.3f}")
+    print(f"applications/min: {report['throughput']['applications_per_minute']}")
+    print(f"LLM requests/min: {report['throughput']['llm_requests_per_minute']} "
+          f"({report['llm_requests_per_application']} per application)")
+    print(f"tokens/application: {report['tokens_per_application']}")
+    print(f"peak RSS: {report['peak_rss_mb']} MB")
+
+def find_regressions(report: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """Metrics that grew by more than max_regression relative to the baseline"""
+    limit = 1 + max_regression
+    checks = [
+        (f"{stage} p95", report["stages"].get(stage, {}).get("p95"), stats["p95"])
+        for stage, stats in baseline["stages"].items()
+    ]
+    checks += [
+        ("tokens/application", report["tokens_per_application"], baseline["tokens_per_application"]),
+        ("peak RSS MB", report["peak_rss_mb"], baseline["peak_rss_mb"])
+    ]
+    regressions = [
+        f"{name}: {current} vs baseline {previous}"
+        for name, current, previous in checks
+        if current is not None and previous and current > previous * limit
+    ]
+    if report["failures"] > baseline["failures"]:
+        regressions.append(f"failures: {report['failures']} vs baseline {baseline['failures']}")
+    return regressions
+
+def main() -> int:
+    args = parse_args()
+    configure_environment(args)
+    baseline = None
+    if args.baseline:
+        with open(os.path.abspath(args.baseline), "r") as file:
+            baseline = json.load(file)
+    output = os.path.abspath(args.output) if args.output else None
+
+    # Uploads and caches are written relative to the working directory
+    workdir = tempfile.mkdtemp(prefix="underwriting_benchmark_")
+    original_cwd = os.getcwd()
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_ROOT)
+    try:
+        import main as underwriting_app
+        from app.config import LLMProvider
+        from app.services.provider_clients import get_provider_client
+        from benchmarks.synthetic_statements import write_statement
+        if not args.verbose:
+            logging.getLogger().setLevel(logging.WARNING)
+
+        page_counts = [int(pages) for pages in args.pages.split(",")]
+        jobs = []
+        for pages in page_counts:
+            for i in range(args.applications):
+                path = os.path.join(workdir, f"statement_{pages}p_{i}.pdf")
+                jobs.append((write_statement(path, args.months, pages, seed=args.seed + i), pages))
+
+        fake_client = get_provider_client(LLMProvider.FAKE)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix="benchmark") as executor:
+            results = list(executor.map(
+                lambda job: run_application(underwriting_app, job[0], job[1], args.use_cache), jobs
+            ))
+        wall_seconds = time.perf_counter() - started
+
+        report = build_report(args, results, wall_seconds, fake_client.requests, fake_client.total_tokens)
+    finally:
+        os.chdir(original_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(report)
+    if output:
+        with open(output, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"Report written to {output}")
+
+    if baseline:
+        regressions = find_regressions(report, baseline, args.max_regression)
+        if regressions:
+            print("\nRegressions beyond the allowed threshold:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            return 1
+        print("\nNo regressions against the baseline")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,16 +2,22 @@ from flask import Flask, request, jsonify, Response, render_template,stream_with
 import os
 import traceback
 from app.services.content_service import ContentService
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Optional, Tuple
 import logging
 from app.services.content_service import ContentService
-from app.tools.analysis_tools import  check_nsf, set_llm,check_statement_continuity,extract_daily_balances,extract_monthly_closing_balances,analyze_credit_decision_term_loan,analyze_monthly_financials, analyze_credit_decision_accounts_payable
+from app.tools.analysis_tools import  check_nsf, check_statement_continuity,extract_daily_balances,extract_monthly_closing_balances,analyze_credit_decision_term_loan,analyze_monthly_financials, analyze_credit_decision_accounts_payable, extract_transaction_ledger
+from app.services.transaction_ledger import TransactionLedger
+from app.services.job_manager import JobManager
+from app.services.status_broker import StatusBroker, GLOBAL_CHANNEL
 from app.services.llm_factory import LLMFactory
-from app.config import  LLMProvider, ModelType
+from app.services.response_cache import RESPONSE_CACHE
+from app.services.document_set import DocumentSet
+from app.services.upload_stream import StreamingUploadRequest, UploadRejected, validate_pdf
+from app.config import  Config, LLMProvider, ModelType
 import json
 import uuid
-from werkzeug.utils import secure_filename
-from queue import Queue
+from werkzeug.exceptions import RequestEntityTooLarge
+from concurrent.futures import ThreadPoolExecutor
 import time
 
 # Configure logging
@@ -28,8 +34,17 @@ logger = logging.getLogger(__name__)
 # Add near the top of the file, after other imports
 content_service = ContentService()
 
-# Create a queue for status messages
-status_queue = Queue()
+# Background worker pool for asynchronous underwriting jobs
+job_manager = JobManager(
+    max_workers=Config.UNDERWRITING_WORKERS,
+    retention_seconds=Config.JOB_RETENTION_SECONDS
+)
+
+# Status events fanned out per job/session to SSE subscribers
+status_broker = StatusBroker(
+    history_size=Config.STATUS_HISTORY_SIZE,
+    channel_ttl_seconds=Config.STATUS_CHANNEL_TTL_SECONDS
+)
 
 
 # Create upload directory if it doesn't exist
@@ -43,6 +58,12 @@ app = Flask(__name__,
 )
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max upload size
+# Stream uploaded files straight to the upload folder, hashing them as they arrive
+app.request_class = StreamingUploadRequest
+
+@app.errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+    return jsonify({"error": "Upload too large", "details": e.description}), 413
 
 @app.route('/')
 def index():
@@ -63,22 +84,29 @@ def upload_files():
     if not files or files[0].filename == '':
         return jsonify({"error": "No files selected"}), 400
     
+    file_paths = []
     try:
-        file_paths = []
+        content_hashes = {}
+        rejected_files = []
         
-        # Save uploaded files with unique names
+        # Files were streamed to unique paths while the request was parsed; keep the valid PDFs
         for file in files:
             if file and file.filename.endswith('.pdf'):
-                filename = secure_filename(file.filename)
-                unique_filename = f"{uuid.uuid4()}_{filename}"
-                file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
+                try:
+                    page_count = validate_pdf(file.stream)
+                except UploadRejected as e:
+                    logger.warning(f"Rejected uploaded file {file.filename}: {str(e)}")
+                    rejected_files.append({"file": file.filename, "reason": str(e)})
+                    continue
                 
-                logger.info(f"Saving uploaded file: {filename} as {unique_filename}")
-                file.save(file_path)
-                file_paths.append(file_path)
+                file.stream.keep()
+                logger.info(f"Saved uploaded file: {file.filename} as {file.stream.path} "
+                            f"({file.stream.size} bytes, {page_count} pages)")
+                file_paths.append(file.stream.path)
+                content_hashes[file.stream.path] = file.stream.content_hash
         
         if not file_paths:
-            return jsonify({"error": "No valid PDF files uploaded"}), 400
+            return jsonify({"error": "No valid PDF files uploaded", "rejected_files": rejected_files}), 400
             
         # Convert provider string to enum and pass it to merge_pdfs_by_type
         if provider:
@@ -88,9 +116,10 @@ def upload_files():
             logger.warning("No provider specified in upload request, using default")
             provider_enum = Config.DEFAULT_PROVIDER
         
-        # Classify and merge files by type
-        logger.info("Classifying and merging uploaded files")
-        merged_files = content_service.merge_pdfs_by_type(file_paths, provider=provider_enum)
+        # Classify and group files by type; document sets reference the uploads rather than merged copies
+        logger.info("Classifying and grouping uploaded files")
+        document_sets = content_service.merge_pdfs_by_type(file_paths, provider=provider_enum, content_hashes=content_hashes)
+        merged_files = {doc_type: documents.to_dict() for doc_type, documents in document_sets.items()}
         
         # Prepare response with document counts
         response = {
@@ -101,6 +130,7 @@ def upload_files():
                 "tax_returns": "tax_returns" in merged_files
             },
             "original_files": file_paths,
+            "rejected_files": rejected_files,
             "provider": provider  # Include provider in response for verification
         }
         
@@ -125,292 +155,387 @@ def upload_files():
             "details": str(e)
         }), 500
 
-@app.route('/underwrite', methods=['POST'])
-def underwrite():
-    logger.info("📥 Received underwrite request")
-    send_status("start", "Processing", "Received underwrite request")
+def validate_underwrite_request(request_data: Dict[str, Any]) -> str:
+    """Return an error message for an invalid underwrite request, or None if it is valid"""
+    if not request_data or not request_data.get('file_paths'):
+        logger.error("No file paths provided")
+        return "No file paths provided"
     
-    debug_mode = request.json.get('debug', False)
-    file_paths = request.json.get('file_paths', [])
-    merged_files = request.json.get('merged_files', {})  # New parameter from upload
-    provider = request.json.get('provider')
-    document_types = request.json.get('document_types', {})
+    provider = request_data.get('provider')
+    if provider:
+        try:
+            LLMProvider(provider.lower())
+        except ValueError as e:
+            logger.error(f"Invalid configuration error: {str(e)}")
+            return f"Invalid configuration. Valid providers: {[p.value for p in LLMProvider]}"
+    return None
+
+def run_underwriting(request_data: Dict[str, Any], channel: str = GLOBAL_CHANNEL) -> Dict[str, Any]:
+    """
+    Run the full underwriting pipeline for an uploaded application.
+    
+    Args:
+        request_data: Underwrite request with file_paths, merged_files (document sets from
+            /upload, or single PDF paths) and provider; bypass_cache forces fresh LLM
+            responses instead of cached ones
+        channel: Status channel that progress events are published to
+        
+    Returns:
+        The master response with analyses and loan recommendations
+    """
+    send_status("start", "Processing", "Received underwrite request", channel=channel)
+    
+    debug_mode = request_data.get('debug', False)
+    file_paths = request_data.get('file_paths', [])
+    merged_files = request_data.get('merged_files', {})  # New parameter from upload
+    provider = request_data.get('provider')
+    document_types = request_data.get('document_types', {})
+    use_cache = not request_data.get('bypass_cache', False)
 
     logger.info(f"Debug mode: {debug_mode}")
     logger.info(f"File paths: {file_paths}")
     logger.info(f"Merged files: {merged_files}")
     logger.info(f"Provider: {provider}")
     
-    if not file_paths:
-        logger.error("No file paths provided")
-        return jsonify({"error": "No file paths provided"}), 400
+    # Initialize LLM
+    send_status("llm_setup", "Processing", f"Initializing {provider} LLM", channel=channel)
+    provider_enum = LLMProvider(provider.lower()) if provider else Config.DEFAULT_PROVIDER
+    analysis_llm = LLMFactory.create_llm(
+        provider=provider_enum,
+        model_type=None,  # Use default model type
+        stateless=True,
+        use_cache=use_cache
+    )
+    
+    # Store string version in master_response
+    master_response = {
+        "provider": provider_enum.value,  # Store string value, not enum
+        "metrics": {},
+        "analysis": {
+            "bank_statements": {},
+            "tax_returns": {}
+        },
+        "document_types": {
+            "has_bank_statements": False,
+            "has_tax_returns": False
+        },
+        "loan_recommendations": []
+    }
+    
+    send_status("llm_setup", "Complete", "LLM initialized successfully", channel=channel)
 
-    try:
-        # Initialize LLM
-        send_status("llm_setup", "Processing", f"Initializing {provider} LLM")
-        if provider:
-            try:
-                provider_value = provider.lower()
-                provider_enum = LLMProvider(provider_value)  # Keep enum version for LLM creation
-                
-                # Pass the provider to merge_pdfs_by_type
-               # merged_files = content_service.merge_pdfs_by_type(file_paths, provider=provider_enum)
-                
-                analysis_llm = LLMFactory.create_llm(
-                    provider=provider_enum,
-                    model_type=None  # Use default model type
-                )
-                
-                # Store string version in master_response
-                master_response = {
-                    "provider": provider_value,  # Store string value, not enum
-                    "metrics": {},
-                    "analysis": {
-                        "bank_statements": {},
-                        "tax_returns": {}
-                    },
-                    "document_types": {
-                        "has_bank_statements": False,
-                        "has_tax_returns": False
-                    },
-                    "loan_recommendations": []
-                }
-                
-            except ValueError as e:
-                logger.error(f"Invalid configuration error: {str(e)}")
-                return jsonify({
-                    "error": f"Invalid configuration. Valid providers: {[p.value for p in LLMProvider]}"
-                }), 400
-        else:
-            analysis_llm = LLMFactory.create_llm()
-            master_response = {
-                "provider": Config.DEFAULT_PROVIDER.value,  # Store string value of default provider
-                "metrics": {},
-                "analysis": {
-                    "bank_statements": {},
-                    "tax_returns": {}
-                },
-                "document_types": {
-                    "has_bank_statements": False,
-                    "has_tax_returns": False
-                },
-                "loan_recommendations": []
-            }
+    # Process bank statements if present
+    if "bank_statements" in merged_files:
+        send_status("bank_analysis", "Processing", "Analyzing bank statements", channel=channel)
+        bank_statements = DocumentSet.from_value(merged_files["bank_statements"])
         
-        set_llm(analysis_llm)
-        send_status("llm_setup", "Complete", "LLM initialized successfully")
-
-        # Process bank statements if present
-        if "bank_statements" in merged_files:
-            send_status("bank_analysis", "Processing", "Analyzing bank statements")
-            bank_statement_path = merged_files["bank_statements"]
-            
-            # Update document type flag
-            master_response["document_types"]["has_bank_statements"] = True
+        # Update document type flag
+        master_response["document_types"]["has_bank_statements"] = True
+        
+        # Add bank statements to LLM context
+        analysis_llm.add_documents(bank_statements)
+        
+        try:
+            # Run bank statement analysis pipeline
+            continuity_json = check_statement_continuity("None", llm=analysis_llm)
+            continuity_data = json.loads(continuity_json)
             
-            # Add bank statements to LLM context
-            analysis_llm.add_pdf(bank_statement_path)
+            # Store in bank statements section
+            master_response["analysis"]["bank_statements"]["continuity"] = continuity_data
             
-            try:
-                # Run bank statement analysis pipeline
-                continuity_json = check_statement_continuity("None")
-                continuity_data = json.loads(continuity_json)
+            # Only add to metrics if continuity check passes
+            is_contiguous = continuity_data.get("analysis", {}).get("is_contiguous", False)
+            if is_contiguous:
+                master_response["metrics"]["statement_continuity"] = continuity_data
                 
-                # Store in bank statements section
-                master_response["analysis"]["bank_statements"]["continuity"] = continuity_data
+                # Continue with other bank statement analyses in parallel
+                master_response["analysis"]["bank_statements"].update(
+                    run_bank_statement_analyses(provider_enum, bank_statements, continuity_data, channel, use_cache)
+                )
                 
-                # Only add to metrics if continuity check passes
-                is_contiguous = continuity_data.get("analysis", {}).get("is_contiguous", False)
-                if is_contiguous:
-                    master_response["metrics"]["statement_continuity"] = continuity_data
-                    
-                    # Continue with other bank statement analyses
-                    input_data = json.dumps({"continuity_data": continuity_data})
-                    balances_json = extract_daily_balances(input_data)
-                    master_response["analysis"]["bank_statements"]["daily_balances"] = json.loads(balances_json)
-                    
-                    nsf_json = check_nsf("None")
-                    master_response["analysis"]["bank_statements"]["nsf_information"] = json.loads(nsf_json)
-                    
-                    closing_balances_json = extract_monthly_closing_balances("None")
-                    master_response["analysis"]["bank_statements"]["closing_balances"] = json.loads(closing_balances_json)
-                    
-                    monthly_financials_json = analyze_monthly_financials("None")
-                    master_response["analysis"]["bank_statements"]["monthly_financials"] = json.loads(monthly_financials_json)
-                    
-                    # Copy key metrics to top level for backward compatibility
-                    master_response["metrics"].update({
-                        "daily_balances": master_response["analysis"]["bank_statements"]["daily_balances"],
-                        "nsf_information": master_response["analysis"]["bank_statements"]["nsf_information"],
-                        "closing_balances": master_response["analysis"]["bank_statements"]["closing_balances"],
-                        "monthly_financials": master_response["analysis"]["bank_statements"]["monthly_financials"]
-                    })
-                    
-                else:
-                    # Handle non-contiguous statements
-                    explanation = continuity_data.get("analysis", {}).get("explanation", "No explanation provided")
-                    gap_details = continuity_data.get("analysis", {}).get("gap_details", [])
-                    master_response["analysis"]["bank_statements"]["error"] = {
-                        "type": "continuity_error",
-                        "explanation": explanation,
-                        "gap_details": gap_details
-                    }
-                    
-            except Exception as e:
-                logger.error(f"Error during bank statement analysis: {str(e)}")
+                # Copy key metrics to top level for backward compatibility
+                master_response["metrics"].update({
+                    "daily_balances": master_response["analysis"]["bank_statements"]["daily_balances"],
+                    "nsf_information": master_response["analysis"]["bank_statements"]["nsf_information"],
+                    "closing_balances": master_response["analysis"]["bank_statements"]["closing_balances"],
+                    "monthly_financials": master_response["analysis"]["bank_statements"]["monthly_financials"]
+                })
+                
+            else:
+                # Handle non-contiguous statements
+                explanation = continuity_data.get("analysis", {}).get("explanation", "No explanation provided")
+                gap_details = continuity_data.get("analysis", {}).get("gap_details", [])
                 master_response["analysis"]["bank_statements"]["error"] = {
-                    "type": "analysis_error",
-                    "message": str(e)
+                    "type": "continuity_error",
+                    "explanation": explanation,
+                    "gap_details": gap_details
                 }
-
-        # Process tax returns if present
-        if "tax_returns" in merged_files:
-            send_status("tax_analysis", "Processing", "Analyzing tax returns")
-            tax_return_path = merged_files["tax_returns"]
-            
-            # Add tax returns to LLM context
-            analysis_llm.add_pdf(tax_return_path)
-            
-            # TODO: Add tax return analysis functions here
-            # This will be implemented in the next step
-            master_response["analysis"]["tax_returns"] = {
-                "status": "pending",
-                "message": "Tax return analysis to be implemented"
+                
+        except Exception as e:
+            logger.error(f"Error during bank statement analysis: {str(e)}")
+            master_response["analysis"]["bank_statements"]["error"] = {
+                "type": "analysis_error",
+                "message": str(e)
             }
-            
-            send_status("tax_analysis", "Complete", "Tax return analysis complete")
 
-        # Perform credit analysis for any available documents
-        send_status("credit_analysis", "Processing", "Performing credit analysis")
+    # Process tax returns if present
+    if "tax_returns" in merged_files:
+        send_status("tax_analysis", "Processing", "Analyzing tax returns", channel=channel)
+        tax_returns = DocumentSet.from_value(merged_files["tax_returns"])
         
-        # Switch to reasoning LLM for credit analysis
-        try:
-            reasoning_llm = LLMFactory.create_llm(
-                provider=provider_enum,
-                model_type=ModelType.REASONING
-            )
-            set_llm(reasoning_llm)
-            
-            # Add document availability to master response
-            master_response["document_types"] = {
-                "has_bank_statements": "bank_statements" in merged_files,
-                "has_tax_returns": "tax_returns" in merged_files
-            }
-            
-            # Add context about available documents
-            context_message = {
-                "analysis_context": {
-                    "available_documents": master_response["document_types"],
-                    "analysis_summary": {
-                        "bank_statements": master_response["analysis"]["bank_statements"] if "bank_statements" in merged_files else None,
-                        "tax_returns": master_response["analysis"]["tax_returns"] if "tax_returns" in merged_files else None
-                    }
+        # Add tax returns to LLM context
+        analysis_llm.add_documents(tax_returns)
+        
+        # TODO: Add tax return analysis functions here
+        # This will be implemented in the next step
+        master_response["analysis"]["tax_returns"] = {
+            "status": "pending",
+            "message": "Tax return analysis to be implemented"
+        }
+        
+        send_status("tax_analysis", "Complete", "Tax return analysis complete", channel=channel)
+
+    # Perform credit analysis for any available documents
+    send_status("credit_analysis", "Processing", "Performing credit analysis", channel=channel)
+    
+    # Switch to reasoning LLM for credit analysis
+    try:
+        reasoning_llm = LLMFactory.create_llm(
+            provider=provider_enum,
+            model_type=ModelType.REASONING,
+            stateless=True,
+            use_cache=use_cache
+        )
+        reasoning_llm.set_item_listener(stream_items_to_status("credit_analysis", channel))
+        
+        # Add document availability to master response
+        master_response["document_types"] = {
+            "has_bank_statements": "bank_statements" in merged_files,
+            "has_tax_returns": "tax_returns" in merged_files
+        }
+        
+        # Add context about available documents
+        context_message = {
+            "analysis_context": {
+                "available_documents": master_response["document_types"],
+                "analysis_summary": {
+                    "bank_statements": master_response["analysis"]["bank_statements"] if "bank_statements" in merged_files else None,
+                    "tax_returns": master_response["analysis"]["tax_returns"] if "tax_returns" in merged_files else None
                 }
             }
-            
-            # Add context first, then full response
-            reasoning_llm.add_json(context_message)
-            reasoning_llm.add_json(master_response)
-            
-            # Perform credit analysis for both products
-            term_loan_analysis = analyze_credit_decision_term_loan("None")
-            term_loan_recommendation = term_loan_analysis.get("credit_analysis", {}).get("loan_recommendation", {})
-            
-            # Add document source information to recommendation
-            term_loan_recommendation["analysis_based_on"] = {
-                "used_bank_statements": "bank_statements" in merged_files,
-                "used_tax_returns": "tax_returns" in merged_files
-            }
-            
-            accounts_payable_analysis = analyze_credit_decision_accounts_payable("None")
-            accounts_payable_recommendation = accounts_payable_analysis.get("credit_analysis", {}).get("loan_recommendation", {})
-            
-            # Add document source information to recommendation
-            accounts_payable_recommendation["analysis_based_on"] = {
-                "used_bank_statements": "bank_statements" in merged_files,
-                "used_tax_returns": "tax_returns" in merged_files
-            }
-            
-            master_response["loan_recommendations"] = [
-                term_loan_recommendation,
-                accounts_payable_recommendation
-            ]
-            
-            # Add summary of data sources used
-            master_response["analysis_metadata"] = {
-                "data_sources_used": {
-                    "bank_statements": "bank_statements" in merged_files,
-                    "tax_returns": "tax_returns" in merged_files
+        }
+        
+        # Add context first, then full response
+        reasoning_llm.add_json(context_message)
+        reasoning_llm.add_json(master_response)
+        
+        # Perform credit analysis for both products; the stateless context lets them run concurrently
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="credit_decision") as executor:
+            term_loan_future = executor.submit(analyze_credit_decision_term_loan, "None", llm=reasoning_llm)
+            accounts_payable_future = executor.submit(analyze_credit_decision_accounts_payable, "None", llm=reasoning_llm)
+            term_loan_analysis = term_loan_future.result()
+            accounts_payable_analysis = accounts_payable_future.result()
+        
+        term_loan_recommendation = term_loan_analysis.get("credit_analysis", {}).get("loan_recommendation", {})
+        
+        # Add document source information to recommendation
+        term_loan_recommendation["analysis_based_on"] = {
+            "used_bank_statements": "bank_statements" in merged_files,
+            "used_tax_returns": "tax_returns" in merged_files
+        }
+        
+        accounts_payable_recommendation = accounts_payable_analysis.get("credit_analysis", {}).get("loan_recommendation", {})
+        
+        # Add document source information to recommendation
+        accounts_payable_recommendation["analysis_based_on"] = {
+            "used_bank_statements": "bank_statements" in merged_files,
+            "used_tax_returns": "tax_returns" in merged_files
+        }
+        
+        master_response["loan_recommendations"] = [
+            term_loan_recommendation,
+            accounts_payable_recommendation
+        ]
+        
+        # Add summary of data sources used
+        master_response["analysis_metadata"] = {
+            "data_sources_used": {
+                "bank_statements": "bank_statements" in merged_files,
+                "tax_returns": "tax_returns" in merged_files
+            },
+            "analysis_timestamp": time.time(),
+            "provider_used": provider
+        }
+        
+        send_status("credit_analysis", "Complete", "Credit analysis complete", channel=channel)
+        
+    except Exception as e:
+        logger.error(f"Error during credit analysis: {str(e)}")
+        send_status("credit_analysis", "Error", f"Credit analysis failed: {str(e)}", channel=channel)
+        master_response["loan_recommendations"] = [
+            {
+                "product_type": "term_loan",
+                "product_name": "Term Loan",
+                "approval_decision": "ERROR",
+                "confidence_score": 0,
+                "max_loan_amount": 0,
+                "max_monthly_payment_amount": 0,
+                "detailed_analysis": f"Credit analysis failed: {str(e)}",
+                "mitigating_factors": [],
+                "risk_factors": ["Analysis error occurred"],
+                "conditions_if_approved": [],
+                "key_metrics": {
+                    "payment_coverage_ratio": 0,
+                    "average_daily_balance_trend": "N/A",
+                    "lowest_monthly_balance": 0,
+                    "highest_nsf_month_count": 0
                 },
-                "analysis_timestamp": time.time(),
-                "provider_used": provider
-            }
-            
-            send_status("credit_analysis", "Complete", "Credit analysis complete")
-            
-        except Exception as e:
-            logger.error(f"Error during credit analysis: {str(e)}")
-            send_status("credit_analysis", "Error", f"Credit analysis failed: {str(e)}")
-            master_response["loan_recommendations"] = [
-                {
-                    "product_type": "term_loan",
-                    "product_name": "Term Loan",
-                    "approval_decision": "ERROR",
-                    "confidence_score": 0,
-                    "max_loan_amount": 0,
-                    "max_monthly_payment_amount": 0,
-                    "detailed_analysis": f"Credit analysis failed: {str(e)}",
-                    "mitigating_factors": [],
-                    "risk_factors": ["Analysis error occurred"],
-                    "conditions_if_approved": [],
-                    "key_metrics": {
-                        "payment_coverage_ratio": 0,
-                        "average_daily_balance_trend": "N/A",
-                        "lowest_monthly_balance": 0,
-                        "highest_nsf_month_count": 0
-                    },
-                    "analysis_based_on": {
-                        "used_bank_statements": "bank_statements" in merged_files,
-                        "used_tax_returns": "tax_returns" in merged_files
-                    }
+                "analysis_based_on": {
+                    "used_bank_statements": "bank_statements" in merged_files,
+                    "used_tax_returns": "tax_returns" in merged_files
+                }
+            },
+            {
+                "product_type": "accounts_payable",
+                "product_name": "Accounts Payable Financing",
+                "approval_decision": "ERROR",
+                "confidence_score": 0,
+                "max_loan_amount": 0,
+                "max_monthly_payment_amount": 0,
+                "detailed_analysis": f"Credit analysis failed: {str(e)}",
+                "mitigating_factors": [],
+                "risk_factors": ["Analysis error occurred"],
+                "conditions_if_approved": [],
+                "key_metrics": {
+                    "payment_coverage_ratio": 0,
+                    "average_daily_balance_trend": "N/A",
+                    "lowest_monthly_balance": 0,
+                    "highest_nsf_month_count": 0
                 },
-                {
-                    "product_type": "accounts_payable",
-                    "product_name": "Accounts Payable Financing",
-                    "approval_decision": "ERROR",
-                    "confidence_score": 0,
-                    "max_loan_amount": 0,
-                    "max_monthly_payment_amount": 0,
-                    "detailed_analysis": f"Credit analysis failed: {str(e)}",
-                    "mitigating_factors": [],
-                    "risk_factors": ["Analysis error occurred"],
-                    "conditions_if_approved": [],
-                    "key_metrics": {
-                        "payment_coverage_ratio": 0,
-                        "average_daily_balance_trend": "N/A",
-                        "lowest_monthly_balance": 0,
-                        "highest_nsf_month_count": 0
-                    },
-                    "analysis_based_on": {
-                        "used_bank_statements": "bank_statements" in merged_files,
-                        "used_tax_returns": "tax_returns" in merged_files
-                    }
+                "analysis_based_on": {
+                    "used_bank_statements": "bank_statements" in merged_files,
+                    "used_tax_returns": "tax_returns" in merged_files
                 }
-            ]
+            }
+        ]
 
-        send_status("complete", "Success", "All analyses complete")
-        logger.info("Master response:")
-        logger.info("-" * 50)
-        logger.info(json.dumps(master_response, indent=2))
-        logger.info("-" * 50)
-        return jsonify(master_response)
+    logger.info(f"LLM response cache stats: {RESPONSE_CACHE.stats()}")
+    send_status("complete", "Success", "All analyses complete", channel=channel)
+    logger.info("Master response:")
+    logger.info("-" * 50)
+    logger.info(json.dumps(master_response, indent=2))
+    logger.info("-" * 50)
+    return master_response
 
+def run_underwriting_job(request_data: Dict[str, Any], channel: str) -> Dict[str, Any]:
+    """Background job entry point that reports pipeline failures on the job's status channel"""
+    try:
+        return run_underwriting(request_data, channel=channel)
+    except Exception as e:
+        send_status("error", "Error", f"Unexpected error: {str(e)}", channel=channel)
+        raise
+    finally:
+        status_broker.close(channel)
+
+@app.route('/underwrite', methods=['POST'])
+def underwrite():
+    logger.info("📥 Received underwrite request")
+    
+    error = validate_underwrite_request(request.json)
+    if error:
+        return jsonify({"error": error}), 400
+
+    channel = request.json.get('session_id') or GLOBAL_CHANNEL
+    try:
+        return jsonify(run_underwriting(request.json, channel=channel))
     except Exception as e:
         logger.error(f"Error in underwrite: {str(e)}")
         logger.error(traceback.format_exc())
-        send_status("error", "Error", f"Unexpected error: {str(e)}")
+        send_status("error", "Error", f"Unexpected error: {str(e)}", channel=channel)
         return jsonify({"error": str(e)}), 500
 
+@app.route('/underwrite/jobs', methods=['POST'])
+def submit_underwrite_job():
+    logger.info("📥 Received underwrite job request")
+    
+    error = validate_underwrite_request(request.json)
+    if error:
+        return jsonify({"error": error}), 400
+    
+    job_id = str(uuid.uuid4())
+    job_manager.submit(run_underwriting_job, request.json, job_id, job_id=job_id)
+    return jsonify({
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/underwrite/jobs/{job_id}",
+        "events_url": f"/status?job_id={job_id}"
+    }), 202
+
+@app.route('/underwrite/jobs/<job_id>', methods=['GET'])
+def get_underwrite_job(job_id):
+    job = job_manager.get(job_id)
+    if not job:
+        return jsonify({"error": f"Job not found: {job_id}"}), 404
+    return jsonify(job)
+
+def run_bank_statement_analyses(provider: LLMProvider, bank_statements: DocumentSet, continuity_data: Dict[str, Any],
+                                channel: str = GLOBAL_CHANNEL, use_cache: bool = True) -> Dict[str, Any]:
+    """
+    Run the bank statement analyses. When the transaction ledger is enabled, the
+    statements are read once and every analysis is computed locally from the ledger.
+    Otherwise the independent analyses run concurrently against one stateless LLM
+    context holding the document.
+    
+    Returns:
+        Dict mapping bank statement analysis keys to parsed results
+    """
+    input_data = json.dumps({"continuity_data": continuity_data})
+    
+    if Config.USE_TRANSACTION_LEDGER:
+        send_status("bank_analysis", "Processing", "Extracting transaction ledger", channel=channel)
+        ledger_llm = LLMFactory.create_llm(provider=provider, stateless=True, use_cache=use_cache)
+        ledger_llm.set_item_listener(stream_items_to_status("bank_analysis", channel))
+        ledger_llm.add_documents(bank_statements)
+        ledger_result = json.loads(extract_transaction_ledger(input_data, llm=ledger_llm))
+        transactions = ledger_result["transactions"]
+        if ledger_result.get("incomplete"):
+            logger.warning(f"Transaction ledger is incomplete ({ledger_result.get('error')}); not computing analyses from it")
+        ledger = None
+        if transactions:
+            try:
+                ledger = TransactionLedger.from_records(transactions)
+            except (KeyError, TypeError, ValueError) as e:
+                logger.error(f"Could not build the transaction ledger: {str(e)}")
+        if ledger is not None:
+            logger.info(f"Computing bank statement analyses from {len(ledger)} ledger transactions")
+            return {
+                "daily_balances": json.loads(extract_daily_balances(input_data, ledger=ledger)),
+                "nsf_information": json.loads(check_nsf("None", ledger=ledger)),
+                "closing_balances": json.loads(extract_monthly_closing_balances("None", ledger=ledger)),
+                "monthly_financials": json.loads(analyze_monthly_financials("None", ledger=ledger))
+            }
+        logger.warning("No usable transaction ledger, falling back to per-analysis LLM calls")
+    
+    analyses = {
+        "daily_balances": lambda llm: extract_daily_balances(input_data, llm=llm),
+        "nsf_information": lambda llm: check_nsf("None", llm=llm),
+        "closing_balances": lambda llm: extract_monthly_closing_balances("None", llm=llm),
+        "monthly_financials": lambda llm: analyze_monthly_financials("None", llm=llm)
+    }
+    
+    llm = LLMFactory.create_llm(provider=provider, stateless=True, use_cache=use_cache)
+    llm.set_item_listener(stream_items_to_status("bank_analysis", channel))
+    llm.add_documents(bank_statements)
+    
+    def run_analysis(key: str) -> Tuple[str, Dict[str, Any]]:
+        result = json.loads(analyses[key](llm))
+        send_status("bank_analysis", "Processing", f"Completed {key.replace('_', ' ')} analysis", channel=channel)
+        return key, result
+    
+    max_workers = min(len(analyses), Config.get_max_concurrency(provider))
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bank_analysis") as executor:
+        return dict(executor.map(run_analysis, analyses))
+
 @app.route('/clear-uploads', methods=['POST'])
 def clear_uploads():
     try:
@@ -431,26 +556,48 @@ def clear_uploads():
 # Add new route for SSE
 @app.route('/status')
 def status_stream():
+    job_id = request.args.get('job_id')
+    # Subscribing creates the channel, so only known jobs may open one
+    if job_id and job_manager.get(job_id) is None:
+        return jsonify({"error": f"Job not found: {job_id}"}), 404
+    channel = job_id or request.args.get('session_id') or GLOBAL_CHANNEL
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    last_event_id = int(last_event_id) if last_event_id.isdigit() else 0
+    
     def event_stream():
-        while True:
-            # Get message from queue
-            if not status_queue.empty():
-                message = status_queue.get()
-                yield f"data: {json.dumps(message)}\n\n"
-            time.sleep(0.5)  # Small delay to prevent CPU overuse
+        for event in status_broker.subscribe(channel, last_event_id, Config.STATUS_HEARTBEAT_SECONDS):
+            if event is None:
+                # Comment line keeps proxies from closing an idle stream
+                yield ": heartbeat\n\n"
+                continue
+            event_id, message = event
+            if event_id is None:
+                # Streamed items use their own event type and carry no ID, so they are not resumed
+                yield f"event: item\ndata: {json.dumps(message)}\n\n"
+                continue
+            yield f"id: {event_id}\ndata: {json.dumps(message)}\n\n"
     
     return Response(stream_with_context(event_stream()), 
                    mimetype='text/event-stream')
 
 # Helper function to send status updates
-def send_status(step: str, status: str, details: str = None):
+def send_status(step: str, status: str, details: str = None, channel: str = GLOBAL_CHANNEL):
     status_message = {
         "step": step,
         "status": status,
         "details": details,
         "timestamp": time.time()
     }
-    status_queue.put(status_message)
+    status_broker.publish(channel, status_message)
+
+def stream_items_to_status(step: str, channel: str = GLOBAL_CHANNEL):
+    """
+    LLM item listener that sends each streamed JSON array element to connected status
+    subscribers as a live "item" event, kept out of the replayed status history
+    """
+    def on_item(key: Optional[str], item: Any) -> None:
+        status_broker.publish_live(channel, {"step": step, "key": key, "item": item, "timestamp": time.time()})
+    return on_item
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 8080))
@@ -0,0 +1,48 @@
+import pytest
+from app.config import Config
+from app.services.concurrency_controller import AdaptiveConcurrencyController
+
+
+@pytest.fixture(autouse=True)
+def latency_config(monkeypatch):
+    monkeypatch.setattr(Config, "ADAPTIVE_LATENCY_CONTROL", True)
+    monkeypatch.setattr(Config, "ADAPTIVE_LATENCY_WINDOW", 10)
+    monkeypatch.setattr(Config, "ADAPTIVE_LATENCY_TOLERANCE", 3.0)
+    monkeypatch.setattr(Config, "ADAPTIVE_DECREASE_FACTOR", 0.5)
+    monkeypatch.setattr(Config, "ADAPTIVE_DECREASE_COOLDOWN_SECONDS", 0)
+
+
+def _controller():
+    return AdaptiveConcurrencyController("test", initial_limit=8, min_limit=1, max_limit=8)
+
+
+def test_mixed_request_classes_do_not_lower_the_limit():
+    controller = _controller()
+    for _ in range(30):
+        controller.on_success(0.2, "model:12")
+        controller.on_success(20.0, "model:17")
+    assert controller.limit == 8
+
+
+def test_latency_drift_within_a_class_lowers_the_limit():
+    controller = _controller()
+    for _ in range(10):
+        controller.on_success(1.0, "model:12")
+    assert controller.limit == 8
+    controller.on_success(10.0, "model:12")
+    assert controller.limit == 4
+
+
+def test_latency_control_can_be_disabled(monkeypatch):
+    monkeypatch.setattr(Config, "ADAPTIVE_LATENCY_CONTROL", False)
+    controller = _controller()
+    for latency in [1.0] * 10 + [10.0] * 10:
+        controller.on_success(latency, "model:12")
+    assert controller.limit == 8
+
+
+def test_rate_limit_lowers_the_limit():
+    controller = _controller()
+    controller.on_rate_limited()
+    assert controller.limit == 4
+    assert controller.stats()["rate_limited"] == 1
@@ -0,0 +1,24 @@
+from app.services import content_service
+from app.services.content_service import ContentService
+
+RESULT = {"document_type": "bank_statement", "confidence_score": 0.95}
+
+
+class BrokenCache:
+    def get(self, content_hash, provider_key):
+        raise OSError("database is locked")
+
+    def put(self, content_hash, provider_key, result):
+        raise OSError("disk I/O error")
+
+
+class StubPdfCache:
+    def get_pages(self, path, content_hash):
+        return ["Statement period Beginning balance Ending balance"]
+
+
+def test_classification_cache_errors_do_not_fail_classification(monkeypatch):
+    monkeypatch.setattr(content_service, "CLASSIFICATION_CACHE", BrokenCache())
+    monkeypatch.setattr(content_service, "PDF_TEXT_CACHE", StubPdfCache())
+    monkeypatch.setattr(content_service, "classify_by_heuristics", lambda pages: RESULT)
+    assert ContentService()._classify_file("statement.pdf", content_hash="abc") == RESULT
@@ -0,0 +1,66 @@
+from app.config import Config
+from app.services.heuristic_classifier import classify_by_heuristics
+
+# Text as PyPDF2 extracts it from the first two pages of a filled-in 2023 Form 1040
+FORM_1040_PAGES = [
+    """Form 1040 Department of the Treasury—Internal Revenue Service
+U.S. Individual Income Tax Return 2023 OMB No. 1545-0074 IRS Use Only—Do not write or staple in this space.
+For the year Jan. 1–Dec. 31, 2023, or other tax year beginning , 2023, ending , 20 See separate instructions.
+Your first name and middle initial Last name Your social security number
+JANE A DOE 123-45-6789
+Home address (number and street). If you have a P.O. box, see instructions. Apt. no.
+Filing Status Single Married filing jointly (even if only one had income) Married filing separately (MFS)
+Head of household (HOH) Qualifying surviving spouse (QSS)
+Digital Assets At any time during 2023, did you: (a) receive (as a reward, award, or payment for property or services); or (b) sell,
+exchange, or otherwise dispose of a digital asset (or a financial interest in a digital asset)? Yes No
+Dependents (see instructions): (2) Social security number (3) Relationship to you
+Income 1a Total amount from Form(s) W-2, box 1 (see instructions) 1a 84,250
+2a Tax-exempt interest 2a b Taxable interest 2b 312
+8 Additional income from Schedule 1, line 10 8 12,400
+9 Add lines 1z, 2b, 3b, 4b, 5b, 6b, 7, and 8. This is your total income 9 96,962
+11 Subtract line 10 from line 9. This is your adjusted gross income 11 96,962
+12 Standard deduction or itemized deductions (from Schedule A) 12 13,850
+15 Subtract line 14 from line 11. If zero or less, enter -0-. This is your taxable income 15 83,112
+For Disclosure, Privacy Act, and Paperwork Reduction Act Notice, see separate instructions. Cat. No. 11320B Form 1040 (2023)""",
+    """Form 1040 (2023) Page 2
+Tax and Credits 16 Tax (see instructions). Check if any from Form(s): 1 8814 2 4972 3 16 13,468
+19 Child tax credit or credit for other dependents from Schedule 8812 19
+23 Other taxes, including self-employment tax, from Schedule 2, line 21 23 1,752
+24 Add lines 22 and 23. This is your total tax 24 15,220
+Payments 25 Federal income tax withheld from: a Form(s) W-2 25a 14,100
+33 Add lines 25d, 26, and 32. These are your total payments 33 16,900
+Refund 34 If line 33 is more than line 24, subtract line 24 from line 33. This is the amount you overpaid 34 1,680
+35a Amount of line 34 you want refunded to you. If Form 8888 is attached, check here 35a 1,680
+Direct deposit? See instructions. b Routing number 021000021 c Type: Checking Savings
+d Account number 000123456789
+Sign Here Under penalties of perjury, I declare that I have examined this return and accompanying schedules and statements,
+and to the best of my knowledge and belief, they are true, correct, and complete.
+Your signature Date Your occupation If the IRS sent you an Identity Protection PIN, enter it here
+Paid Preparer Use Only Preparer's name Preparer's signature Date PTIN Check if: Self-employed
+Firm's name Phone no. Firm's address Firm's EIN Go to www.irs.gov/Form1040 for instructions and the latest information. Form 1040 (2023)"""
+]
+
+BANK_STATEMENT_PAGES = [
+    """First National Bank Business Checking Statement
+Account Number: 000123456789 Routing Number: 021000021
+Statement Period: 01/01/2024 - 01/31/2024
+Beginning Balance $24,310.55 Deposits and Other Credits $41,200.00 Withdrawals and Other Debits $38,975.12
+Ending Balance $26,535.43
+01/03 ACH Deposit - Customer Payment 4,200.00
+01/05 Debit Card Purchase - Supplier -312.40
+01/31 Monthly Maintenance Fee -15.00"""
+]
+
+def test_form_1040_is_classified_locally():
+    result = classify_by_heuristics(FORM_1040_PAGES)
+    assert result["document_type"] == "tax_return"
+    assert result["confidence_score"] >= Config.HEURISTIC_CLASSIFIER_MIN_CONFIDENCE
+
+def test_refund_routing_fields_do_not_count_toward_bank_statement():
+    result = classify_by_heuristics(FORM_1040_PAGES)
+    assert "bank statement: 0.0" in result["explanation"]
+
+def test_bank_statement_is_classified_locally():
+    result = classify_by_heuristics(BANK_STATEMENT_PAGES)
+    assert result["document_type"] == "bank_statement"
+    assert result["confidence_score"] >= Config.HEURISTIC_CLASSIFIER_MIN_CONFIDENCE
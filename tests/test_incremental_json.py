@@ -0,0 +1,68 @@
+import json
+from app.services.incremental_json import IncrementalJsonParser
+
+DAILY_BALANCES = {
+    "daily_balances": [
+        {"date": "2024-01-01", "balance": 1000.0, "note": "Opening, per statement]"},
+        {"date": "2024-01-02", "balance": 950.5, "note": "Check #101, \"rent\" {paid}"},
+        {"date": "2024-01-03", "balance": 975.25, "tags": [["atm", "deposit"], []]}
+    ],
+    "summary": {"days": 3, "months": ["2024-01"]}
+}
+
+
+def _parse(chunks):
+    items = []
+    parser = IncrementalJsonParser(on_item=lambda key, item: items.append((key, item)))
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser, items
+
+
+def _split(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def test_emits_array_elements_in_order_for_any_chunking():
+    text = json.dumps(DAILY_BALANCES, indent=2)
+    for size in (1, 3, 16, len(text)):
+        parser, items = _parse(_split(text, size))
+        assert parser.complete
+        # Only arrays directly under the top-level object are tracked, not summary.months
+        assert items == [("daily_balances", balance) for balance in DAILY_BALANCES["daily_balances"]]
+        assert parser.items_emitted == 3
+
+
+def test_brackets_and_commas_inside_strings_do_not_split_elements():
+    parser, items = _parse(['{"transactions": ["a, b", "c]", "d\\"]"', ', "{e}"]}'])
+    assert parser.complete
+    assert [item for _, item in items] == ["a, b", "c]", 'd"]', "{e}"]
+
+
+def test_nested_arrays_are_emitted_whole():
+    parser, items = _parse(['[[1, [2, 3]], [], {"a": [4]}]'])
+    assert parser.complete
+    assert items == [(None, [1, [2, 3]]), (None, []), (None, {"a": [4]})]
+
+
+def test_code_fence_and_preamble_are_ignored():
+    text = 'Here is the JSON:\n```json\n{"nsf_incidents": [{"date": "2024-01-10", "amount": 35}]}\n```'
+    parser, items = _parse(_split(text, 5))
+    assert parser.started
+    assert parser.complete
+    assert items == [("nsf_incidents", {"date": "2024-01-10", "amount": 35})]
+
+
+def test_truncated_response_is_not_complete():
+    text = json.dumps(DAILY_BALANCES)
+    parser, items = _parse([text[:text.index("2024-01-03") + 20]])
+    assert parser.started
+    assert not parser.complete
+    assert [item["date"] for _, item in items] == ["2024-01-01", "2024-01-02"]
+
+
+def test_text_without_json_never_starts():
+    parser, items = _parse(["I could not read ", "the statements."])
+    assert not parser.started
+    assert not parser.complete
+    assert items == []
@@ -0,0 +1,27 @@
+from types import SimpleNamespace
+from app.services.llm_factory import MistralWrapper
+
+
+class ProviderError(Exception):
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _is_missing_file(error, uploads=("file-123",)):
+    return MistralWrapper._is_missing_file(SimpleNamespace(_uploads=list(uploads)), error)
+
+
+def test_file_specific_error_is_a_missing_upload():
+    assert _is_missing_file(ProviderError('Status 404. Body: {"message": "File with id file-123 not found"}', 404))
+    assert _is_missing_file(ProviderError('Status 400. Body: {"code": "file_not_found"}', 400))
+
+
+def test_bare_404_is_not_a_missing_upload():
+    assert not _is_missing_file(ProviderError('Status 404. Body: {"detail": "Not Found"}', 404))
+    assert not _is_missing_file(ProviderError('Status 404. Body: {"message": "Invalid model: mistral-x"}', 404))
+
+
+def test_server_errors_and_requests_without_uploads_are_not_missing_uploads():
+    assert not _is_missing_file(ProviderError("Status 500. Body: file storage not found", 500))
+    assert not _is_missing_file(ProviderError("File with id file-123 not found", 404), uploads=())
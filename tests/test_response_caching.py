@@ -0,0 +1,86 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from app.config import Config, LLMProvider
+from app.services import llm_factory
+from app.services.llm_factory import LLMFactory
+from app.services.response_cache import ResponseCache
+from app.tools.analysis_tools import _is_json_response
+
+PROMPT = 'Return JSON with "statement_periods" for the statements.'
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path / "responses.db"), max_bytes=10_000_000, max_entries=1000)
+    monkeypatch.setattr(llm_factory, "RESPONSE_CACHE", cache)
+    monkeypatch.setattr(Config, "FAKE_LLM_LATENCY_MEAN_SECONDS", 0)
+    monkeypatch.setattr(Config, "FAKE_LLM_RATE_LIMIT_PROBABILITY", 0)
+    monkeypatch.setattr(Config, "FAKE_LLM_TRUNCATION_PROBABILITY", 0)
+    return cache
+
+
+def _llm():
+    llm = LLMFactory.create_llm(provider=LLMProvider.FAKE, stateless=True, use_cache=True)
+    llm.add_json({"statement": "January 2024"})
+    return llm
+
+
+def _cached(llm):
+    return llm_factory.RESPONSE_CACHE.get(llm._cache_key(PROMPT))
+
+
+def test_valid_response_is_cached(cache):
+    llm = _llm()
+    response = llm.get_response(PROMPT, validate=_is_json_response)
+    assert json.loads(response)
+    assert _cached(llm) == response
+
+
+def test_truncated_response_is_not_cached(cache, monkeypatch):
+    monkeypatch.setattr(Config, "FAKE_LLM_TRUNCATION_PROBABILITY", 1)
+    llm = _llm()
+    assert not _is_json_response(llm.get_response(PROMPT, validate=_is_json_response))
+    assert _cached(llm) is None
+    assert not _is_json_response(llm.stream_response(PROMPT, validate=_is_json_response).read())
+    assert _cached(llm) is None
+
+
+def test_response_failing_validation_is_not_cached(cache):
+    llm = _llm()
+    llm.get_response(PROMPT, validate=lambda text: False)
+    assert _cached(llm) is None
+
+
+def test_cached_response_failing_validation_is_refetched(cache):
+    llm = _llm()
+    cache.put(llm._cache_key(PROMPT), llm.provider.value, llm.model_config['name'], '{"statement_periods": [')
+    response = llm.get_response(PROMPT, validate=_is_json_response)
+    assert _is_json_response(response)
+    assert _cached(llm) == response
+
+
+def test_is_json_response_accepts_code_fences():
+    assert _is_json_response('```json\n{"a": [1, 2]}\n```')
+    assert _is_json_response('Here you go: [{"a": "]"}]')
+    assert not _is_json_response('{"a": [1, 2')
+    assert not _is_json_response("No statements found.")
+
+
+def test_concurrent_overflow_creates_one_delegate(cache, monkeypatch):
+    llm = _llm()
+    llm.model_config = dict(llm.model_config, context_limit=llm.context_tokens + 10)
+    created = []
+
+    def larger_context_llm(input_tokens):
+        time.sleep(0.05)
+        delegate = LLMFactory.create_llm(provider=LLMProvider.FAKE, stateless=True)
+        created.append(delegate)
+        return delegate
+
+    monkeypatch.setattr(llm, "_larger_context_llm", larger_context_llm)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        delegates = list(executor.map(lambda _: llm._budget_request(PROMPT), range(8)))
+    assert len(created) == 1
+    assert all(delegate is created[0] for delegate in delegates)
@@ -0,0 +1,241 @@
+import json
+from app.config import Config
+from app.services.transaction_ledger import TransactionLedger, normalize_record, parse_amount, parse_date
+from app.services.daily_balance_series import build_daily_balances_from_ledger
+from app.services.financial_statistics import compute_monthly_statistics
+from app.services.llm_factory import ContextBudgetExceeded
+from app.tools.analysis_tools import check_nsf, extract_daily_balances, extract_transaction_ledger
+
+# Two monthly statements as the ledger prompt asks for them: beginning/ending balances as
+# zero-amount rows, only some transactions with a printed running balance
+TRANSACTIONS = [
+    {"date": "2024-01-01", "description": "Beginning Balance", "amount": 0, "running_balance": 1000.00, "page": 1},
+    {"date": "2024-01-05", "description": "ACH Deposit ACME CORP", "amount": 500.00, "running_balance": None, "page": 1},
+    {"date": "2024-01-10", "description": "NSF Fee - Insufficient Funds", "amount": -35.00, "running_balance": None, "page": 1},
+    {"date": "2024-01-12", "description": "Overdraft Fee", "amount": -25.00, "running_balance": None, "page": 2},
+    {"date": "2024-01-31", "description": "Ending Balance", "amount": 0, "running_balance": 1440.00, "page": 2},
+    {"date": "2024-02-01", "description": "Beginning Balance", "amount": 0, "running_balance": 1440.00, "page": 3},
+    {"date": "2024-02-03", "description": "Debit Card Purchase", "amount": -200.00, "running_balance": 1240.00, "page": 3},
+    {"date": "2024-02-29", "description": "Ending Balance", "amount": 0, "running_balance": 1240.00, "page": 3},
+]
+
+CONTINUITY_INPUT = json.dumps({
+    "continuity_data": {
+        "statement_periods": [
+            {"start_date": "2024-01-01", "end_date": "2024-01-31"},
+            {"start_date": "2024-02-01", "end_date": "2024-02-29"}
+        ]
+    }
+})
+
+
+class StubLLM:
+    """Answers chunk prompts from a dict of period prefix (e.g. "2024-02-01" or "2024-02-01 to 2024-02-15") to response text"""
+    provider = None
+
+    def __init__(self, responses):
+        self.responses = responses
+
+    def fits_context(self, prompt_tokens):
+        return True
+
+    def isolated(self):
+        return self
+
+    def get_response(self, prompt, validate=None):
+        for start_date, response in self.responses.items():
+            if f"from {start_date}" in prompt:
+                return response
+        raise AssertionError(f"Unexpected prompt: {prompt[:80]}")
+
+
+def _ledger():
+    return TransactionLedger.from_records(TRANSACTIONS)
+
+
+def test_parse_date_formats():
+    assert parse_date("2024-01-05") == "2024-01-05"
+    assert parse_date("01/05/2024") == "2024-01-05"
+    assert parse_date("01/05/24") == "2024-01-05"
+    assert parse_date("2024-02-30") is None
+    assert parse_date("Jan 5") is None
+    assert parse_date(None) is None
+
+
+def test_parse_amount_formats():
+    assert parse_amount(1200) == 1200.0
+    assert parse_amount("-35.00") == -35.0
+    assert parse_amount("$1,200.00") == 1200.0
+    assert parse_amount("(1,200.00)") == -1200.0
+    assert parse_amount("n/a") is None
+    assert parse_amount(float("nan")) is None
+    assert parse_amount(True) is None
+
+
+def test_normalize_record_coerces_fields():
+    record = normalize_record({
+        "date": "01/05/2024",
+        "description": "Deposit",
+        "amount": "$1,200.00",
+        "running_balance": "(35.00)",
+        "page": "2"
+    })
+    assert record == {
+        "date": "2024-01-05",
+        "description": "Deposit",
+        "amount": 1200.0,
+        "running_balance": -35.0,
+        "page": 2
+    }
+
+
+def test_normalize_record_drops_unreadable_optional_fields():
+    record = normalize_record({"date": "2024-01-05", "amount": -10, "running_balance": "see above", "page": "ii"})
+    assert record["running_balance"] is None
+    assert record["page"] == 0
+    assert record["description"] == ""
+
+
+def test_normalize_record_rejects_rows_without_date_or_amount():
+    assert normalize_record({"date": "2024-13-01", "amount": 10}) is None
+    assert normalize_record({"date": "2024-01-05", "amount": None}) is None
+    assert normalize_record({"date": "2024-01-05"}) is None
+    assert normalize_record(["2024-01-05", 10]) is None
+
+
+def test_running_balances_anchor_on_stated_balances():
+    balances, is_direct = _ledger().running_balances()
+    assert balances.tolist() == [1000.0, 1500.0, 1465.0, 1440.0, 1440.0, 1440.0, 1240.0, 1240.0]
+    assert is_direct.tolist() == [True, False, False, False, True, True, True, True]
+
+
+def test_nsf_summary_excludes_overdraft_fees():
+    summary = _ledger().nsf_summary()
+    assert summary == {
+        "nsf_incidents": [{"date": "2024-01-10", "amount": 35.0}],
+        "total_fees": 35.0,
+        "incident_count": 1
+    }
+    assert json.loads(check_nsf("None", ledger=_ledger())) == summary
+
+
+def test_monthly_totals_and_statistics():
+    totals = _ledger().monthly_totals()
+    assert totals == {
+        "2024-01": {"expenses": 60.0, "revenue": 500.0},
+        "2024-02": {"expenses": 200.0, "revenue": 0.0}
+    }
+    statistics = compute_monthly_statistics(totals)
+    assert statistics["monthly_data"]["2024-01"]["cashflow"] == 440.0
+    assert statistics["statistics"]["revenue"]["average"] == 250.0
+    assert statistics["statistics"]["expenses"]["trend_slope"] == 140.0
+
+
+def test_monthly_closing_balances_cross_check_next_opening():
+    result = _ledger().monthly_closing_balances()
+    january, february = result["monthly_closing_balances"]
+    assert january["closing_date"] == "2024-01-31"
+    assert january["balance"] == 1440.0
+    assert january["balance_type"] == "direct"
+    assert january["verification"] == "Matches next month opening balance"
+    assert february["closing_date"] == "2024-02-29"
+    assert february["balance"] == 1240.0
+    assert result["analysis"]["direct_balances"] == 2
+    assert result["analysis"]["verification_notes"] == []
+
+
+def test_daily_balances_from_ledger_fill_every_day():
+    result = build_daily_balances_from_ledger(_ledger(), "2024-01-01", "2024-02-29")
+    daily = {entry["date"]: entry for entry in result["daily_balances"]}
+    assert len(daily) == 60
+    assert daily["2024-01-01"]["balance_type"] == "direct"
+    assert daily["2024-01-11"]["balance"] == 1465.0
+    assert daily["2024-01-11"]["balance_type"] == "calculated"
+    assert daily["2024-02-15"]["balance"] == 1240.0
+    assert result["reconciliation"] == {"is_reconciled": True, "discrepancies": []}
+
+
+def test_daily_balances_from_ledger_flag_unreconciled_closing_balance():
+    records = [dict(record) for record in TRANSACTIONS]
+    records[4]["running_balance"] = 1400.00
+    result = build_daily_balances_from_ledger(TransactionLedger.from_records(records))
+    assert result["reconciliation"]["discrepancies"] == [{
+        "date": "2024-01-31",
+        "stated_balance": 1400.0,
+        "calculated_balance": 1440.0,
+        "difference": -40.0
+    }]
+
+
+def test_extract_transaction_ledger_normalizes_chunks(monkeypatch):
+    monkeypatch.setattr(Config, "STREAM_RESPONSES", False)
+    llm = StubLLM({
+        "2024-01-01": json.dumps({"transactions": TRANSACTIONS[:5]}),
+        "2024-02-01": "```json\n" + json.dumps({"transactions": TRANSACTIONS[5:] + [{"date": "", "amount": 1}]}) + "\n```"
+    })
+    result = json.loads(extract_transaction_ledger(CONTINUITY_INPUT, llm=llm))
+    assert "incomplete" not in result
+    assert [t["date"] for t in result["transactions"]] == [t["date"] for t in TRANSACTIONS]
+
+
+def test_extract_transaction_ledger_marks_failed_chunk_incomplete(monkeypatch):
+    monkeypatch.setattr(Config, "STREAM_RESPONSES", False)
+    llm = StubLLM({
+        "2024-01-01": json.dumps({"transactions": TRANSACTIONS[:5]}),
+        "2024-02-01": "I could not find any transactions for February."
+    })
+    result = json.loads(extract_transaction_ledger(CONTINUITY_INPUT, llm=llm))
+    assert result["transactions"] == []
+    assert result["incomplete"] is True
+    assert "2024-02-01 to 2024-02-29" in result["error"]
+
+
+def test_extract_transaction_ledger_splits_truncated_period(monkeypatch):
+    monkeypatch.setattr(Config, "STREAM_RESPONSES", False)
+    february = json.dumps({"transactions": TRANSACTIONS[5:]})
+    llm = StubLLM({
+        "2024-01-01": json.dumps({"transactions": TRANSACTIONS[:5]}),
+        "2024-02-01 to 2024-02-29": february[:len(february) // 2],
+        "2024-02-01 to 2024-02-15": json.dumps({"transactions": TRANSACTIONS[5:7]}),
+        "2024-02-16 to 2024-02-29": json.dumps({"transactions": TRANSACTIONS[7:]})
+    })
+    result = json.loads(extract_transaction_ledger(CONTINUITY_INPUT, llm=llm))
+    assert "incomplete" not in result
+    assert [t["date"] for t in result["transactions"]] == [t["date"] for t in TRANSACTIONS]
+
+
+def test_extract_transaction_ledger_gives_up_on_truncated_single_day(monkeypatch):
+    monkeypatch.setattr(Config, "STREAM_RESPONSES", False)
+    continuity = json.dumps({"continuity_data": {"statement_periods": [{"start_date": "2024-02-01", "end_date": "2024-02-02"}]}})
+    llm = StubLLM({"2024-02-0": '{"transactions": [{"date": "2024-02-01"'})
+    result = json.loads(extract_transaction_ledger(continuity, llm=llm))
+    assert result["incomplete"] is True
+    assert "2024-02-01 to 2024-02-01" in result["error"]
+
+
+def test_extract_daily_balances_marks_failed_chunk_incomplete(monkeypatch):
+    monkeypatch.setattr(Config, "STREAM_RESPONSES", False)
+    monkeypatch.setattr(Config, "DAILY_BALANCE_CHUNK_PERIODS", 1)
+    llm = StubLLM({
+        "2024-01-01": json.dumps({"daily_balances": [{"date": "2024-01-01", "balance": 1000, "balance_type": "direct"}]}),
+        "2024-02-01": "I could not read the February statement."
+    })
+    result = json.loads(extract_daily_balances(CONTINUITY_INPUT, llm=llm))
+    assert result["daily_balances"] == []
+    assert result["incomplete"] is True
+
+
+def test_extract_transaction_ledger_marks_context_overflow_incomplete(monkeypatch):
+    monkeypatch.setattr(Config, "STREAM_RESPONSES", False)
+
+    class OverflowLLM(StubLLM):
+        def get_response(self, prompt, validate=None):
+            if "from 2024-02-01" in prompt:
+                raise ContextBudgetExceeded(300000, 200000)
+            return super().get_response(prompt, validate)
+
+    llm = OverflowLLM({"2024-01-01": json.dumps({"transactions": TRANSACTIONS[:5]})})
+    result = json.loads(extract_transaction_ledger(CONTINUITY_INPUT, llm=llm))
+    assert result["transactions"] == []
+    assert result["incomplete"] is True
+    assert "context window" in result["error"]